@@ -0,0 +1,35 @@
+"""Add price retention
+
+Single row table recording up to when raw price rows were pruned by
+app.commands.prune_prices.
+
+Revision ID: 0b7e4c2f9a63
+Revises: f2c8d5a3b716
+Create Date: 2025-08-14 18:02:11.350946
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7e4c2f9a63'
+down_revision: Union[str, None] = 'f2c8d5a3b716'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('price_retention',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pruned_before', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('price_retention')
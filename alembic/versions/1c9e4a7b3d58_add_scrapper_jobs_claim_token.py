@@ -0,0 +1,33 @@
+"""Add scrapper jobs claim token
+
+Adds scrapper_jobs.claim_token, set on every claim and checked by the
+worker's heartbeats and writes, so a worker whose job was reclaimed stops
+instead of recording progress for it.
+
+Revision ID: 1c9e4a7b3d58
+Revises: 6f3b8d2e9a14
+Create Date: 2025-08-26 09:41:15.208337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c9e4a7b3d58'
+down_revision: Union[str, None] = '6f3b8d2e9a14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('scrapper_jobs', sa.Column('claim_token', sqlmodel.sql.sqltypes.AutoString(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('scrapper_jobs', 'claim_token')
@@ -0,0 +1,49 @@
+"""Add store ratings
+
+Adds stores.rating_count and stores.rating_sum, backfilled from reviews,
+and makes (store_id, user) unique on reviews, keeping the latest review
+of any duplicated pair. The unique index replaces ix_reviews_store_id.
+
+Revision ID: 3a6f0d8b2c17
+Revises: 7c1d9e3a5b42
+Create Date: 2025-08-18 10:12:37.614205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a6f0d8b2c17'
+down_revision: Union[str, None] = '7c1d9e3a5b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        DELETE FROM reviews WHERE id NOT IN (
+            SELECT max(id) FROM reviews GROUP BY store_id, "user"
+        )
+    """)
+    op.create_index('ux_reviews_store_id_user', 'reviews', ['store_id', 'user'], unique=True)
+    op.drop_index(op.f('ix_reviews_store_id'), table_name='reviews')
+
+    op.add_column('stores', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('stores', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+        UPDATE stores SET
+            rating_count = (SELECT count(*) FROM reviews WHERE reviews.store_id = stores.id),
+            rating_sum = (SELECT coalesce(sum(rating), 0) FROM reviews WHERE reviews.store_id = stores.id)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('stores', 'rating_sum')
+    op.drop_column('stores', 'rating_count')
+    op.create_index(op.f('ix_reviews_store_id'), 'reviews', ['store_id'], unique=False)
+    op.drop_index('ux_reviews_store_id_user', table_name='reviews')
@@ -0,0 +1,36 @@
+"""Add prices observation key
+
+Adds prices.observation_key with a unique index. Scrapper jobs key every
+price row by job, chunk and item, so a chunk processed again after a lost
+claim or a crash doesn't append its prices twice. Existing rows keep a NULL
+key.
+
+Revision ID: 3d7e9b2a5c61
+Revises: 8a2f5c1e7b46
+Create Date: 2025-08-28 10:05:37.641209
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d7e9b2a5c61'
+down_revision: Union[str, None] = '8a2f5c1e7b46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('prices', sa.Column('observation_key', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True))
+    op.create_index('ux_prices_observation_key', 'prices', ['observation_key'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_prices_observation_key', table_name='prices')
+    op.drop_column('prices', 'observation_key')
@@ -0,0 +1,104 @@
+"""Add products match key
+
+Adds products.match_key (game and product type plus the canonical name and
+edition tokens) with a non-unique index, used by scrapper ingestion to
+recognise the same product across stores. Existing products are keyed in
+id-ordered batches.
+
+Revision ID: 4e8a1c6d2f93
+Revises: b5c1e8f3a920
+Create Date: 2025-08-22 11:07:42.590381
+
+"""
+import re
+import unicodedata
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8a1c6d2f93'
+down_revision: Union[str, None] = 'b5c1e8f3a920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+# Frozen copy of app.utils.parsing.make_match_key at this revision
+GAME_MATCH_TOKENS = {
+    "pokemon": {"pokemon", "ptcg"},
+    "yu-gi-oh": {"yu", "gi", "oh", "yugioh"},
+    "magic-the-gathering": {"magic", "gathering", "mtg"},
+}
+MATCH_STOPWORDS = {"tcg", "the", "of", "and", "y", "de", "del", "el", "la", "en"}
+MATCH_ABBREVIATIONS = {"etb": ("elite", "trainer", "box"), "boxes": ("box",)}
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize('NFD', text or '')
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn').lower()
+    return ' '.join(re.findall(r'[^\W_]+', text))
+
+
+def match_token(token: str) -> str:
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and not token[-2].isdigit():
+        return token[:-1]
+    return token
+
+
+def make_match_key(name: str, game: str, product_type: str, edition: Optional[str] = None) -> str:
+    skipped = MATCH_STOPWORDS | GAME_MATCH_TOKENS.get(game, set())
+    tokens = set()
+    for text in (name, edition):
+        for token in normalize_text(text).split():
+            for part in MATCH_ABBREVIATIONS.get(token, (token,)):
+                if part not in skipped:
+                    tokens.add(match_token(part))
+    return f"{game}/{product_type}:{' '.join(sorted(tokens))}"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('match_key', sa.String(length=300), nullable=True))
+
+    bind = op.get_bind()
+    products = sa.table(
+        'products',
+        sa.column('id'),
+        sa.column('name'),
+        sa.column('game'),
+        sa.column('edition'),
+        sa.column('product_type'),
+        sa.column('match_key')
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(products.c.id, products.c.name, products.c.game, products.c.product_type, products.c.edition)
+            .where(products.c.id > last_id)
+            .order_by(products.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            products.update()
+            .where(products.c.id == sa.bindparam('product_id'))
+            .values(match_key=sa.bindparam('key')),
+            [
+                {'product_id': product_id, 'key': make_match_key(name, game, product_type, edition)}
+                for product_id, name, game, product_type, edition in rows
+            ]
+        )
+        last_id = rows[-1].id
+
+    op.create_index('ix_products_match_key', 'products', ['match_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_match_key', table_name='products')
+    op.drop_column('products', 'match_key')
@@ -0,0 +1,50 @@
+"""Add current prices
+
+Denormalized latest price row per (product, store) pair, backfilled from
+the price history.
+
+Revision ID: 5e2b7c9d3f18
+Revises: c3f8a2d41b96
+Create Date: 2025-08-05 16:21:03.448120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2b7c9d3f18'
+down_revision: Union[str, None] = 'c3f8a2d41b96'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('current_prices',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('store_id', sa.Integer(), nullable=False),
+    sa.Column('price_id', sa.Integer(), nullable=False),
+    sa.Column('price', sa.Integer(), nullable=False),
+    sa.Column('url', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+    sa.Column('scrapped_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_seen_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['price_id'], ['prices.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'store_id')
+    )
+    op.execute("""
+        INSERT INTO current_prices (product_id, store_id, price_id, price, url, scrapped_at, last_seen_at)
+        SELECT prices.product_id, prices.store_id, prices.id, prices.price, prices.url, prices.scrapped_at, prices.last_seen_at
+        FROM prices
+        JOIN (SELECT max(id) AS id FROM prices GROUP BY product_id, store_id) AS latest ON prices.id = latest.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('current_prices')
@@ -0,0 +1,116 @@
+"""Add product match candidates
+
+Adds product_match_candidates, the near-duplicate products ingestion keeps
+apart and lists for review, and recomputes products.match_key, which now
+starts with the product type and keeps packaging words.
+
+Revision ID: 6f3b8d2e9a14
+Revises: 4e8a1c6d2f93
+Create Date: 2025-08-25 15:12:08.734190
+
+"""
+import re
+import unicodedata
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f3b8d2e9a14'
+down_revision: Union[str, None] = '4e8a1c6d2f93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+# Frozen copy of app.utils.parsing.make_match_key at this revision
+GAME_MATCH_TOKENS = {
+    "pokemon": {"pokemon", "ptcg"},
+    "yu-gi-oh": {"yu", "gi", "oh", "yugioh"},
+    "magic-the-gathering": {"magic", "gathering", "mtg"},
+}
+MATCH_STOPWORDS = {"tcg", "the", "of", "and", "y", "de", "del", "el", "la", "en"}
+MATCH_ABBREVIATIONS = {"etb": ("elite", "trainer", "box"), "boxes": ("box",)}
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize('NFD', text or '')
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn').lower()
+    return ' '.join(re.findall(r'[^\W_]+', text))
+
+
+def match_token(token: str) -> str:
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and not token[-2].isdigit():
+        return token[:-1]
+    return token
+
+
+def make_match_key(name: str, game: str, product_type: str, edition: Optional[str] = None) -> str:
+    skipped = MATCH_STOPWORDS | GAME_MATCH_TOKENS.get(game, set())
+    tokens = set()
+    for text in (name, edition):
+        for token in normalize_text(text).split():
+            for part in MATCH_ABBREVIATIONS.get(token, (token,)):
+                if part not in skipped:
+                    tokens.add(match_token(part))
+    return f"{game}/{product_type}:{' '.join(sorted(tokens))}"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('product_match_candidates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('candidate_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['candidate_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ux_product_match_candidates_pair',
+        'product_match_candidates',
+        ['product_id', 'candidate_id'],
+        unique=True
+    )
+
+    bind = op.get_bind()
+    products = sa.table(
+        'products',
+        sa.column('id'),
+        sa.column('name'),
+        sa.column('game'),
+        sa.column('edition'),
+        sa.column('product_type'),
+        sa.column('match_key')
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(products.c.id, products.c.name, products.c.game, products.c.product_type, products.c.edition)
+            .where(products.c.id > last_id)
+            .order_by(products.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            products.update()
+            .where(products.c.id == sa.bindparam('product_id'))
+            .values(match_key=sa.bindparam('key')),
+            [
+                {'product_id': product_id, 'key': make_match_key(name, game, product_type, edition)}
+                for product_id, name, game, product_type, edition in rows
+            ]
+        )
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_product_match_candidates_pair', table_name='product_match_candidates')
+    op.drop_table('product_match_candidates')
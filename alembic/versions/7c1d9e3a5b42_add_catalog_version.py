@@ -0,0 +1,36 @@
+"""Add catalog version
+
+Single row counter bumped by every write that changes the product
+listings; the listing ETags are derived from it.
+
+Revision ID: 7c1d9e3a5b42
+Revises: 0b7e4c2f9a63
+Create Date: 2025-08-16 11:26:48.902317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d9e3a5b42'
+down_revision: Union[str, None] = '0b7e4c2f9a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO catalog_version (id, version) VALUES (1, 0)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('catalog_version')
@@ -0,0 +1,89 @@
+"""Product key product type and edition
+
+Recomputes products.product_key, which now starts with the game and the
+product type and ends with the edition, if any, so a booster and a bundle
+with the same name, or two editions of it, are different products. As before, products are keyed in id order and later duplicates of a key keep
+a NULL key.
+
+Revision ID: 8a2f5c1e7b46
+Revises: 1c9e4a7b3d58
+Create Date: 2025-08-27 11:20:43.517902
+
+"""
+import re
+import unicodedata
+from typing import Callable, Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a2f5c1e7b46'
+down_revision: Union[str, None] = '1c9e4a7b3d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+# Frozen copies of app.utils.parsing.normalize_text and make_product_key at this revision
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize('NFD', text or '')
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn').lower()
+    return ' '.join(re.findall(r'[^\W_]+', text))
+
+
+def make_product_key(name: str, game: str, product_type: str, edition: Optional[str]) -> str:
+    key = f"{game}/{product_type}:{normalize_text(name)}"
+    edition = normalize_text(edition)
+    return f"{key}|{edition}" if edition else key
+
+
+def recompute_product_keys(make_key: Callable[[str, str, str, Optional[str]], str]) -> None:
+    bind = op.get_bind()
+    products = sa.table(
+        'products',
+        sa.column('id'),
+        sa.column('name'),
+        sa.column('game'),
+        sa.column('product_type'),
+        sa.column('edition'),
+        sa.column('product_key')
+    )
+    seen = set()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(products.c.id, products.c.name, products.c.game, products.c.product_type, products.c.edition)
+            .where(products.c.id > last_id)
+            .order_by(products.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        keys = []
+        for product_id, name, game, product_type, edition in rows:
+            key = make_key(name, game, product_type, edition)
+            if key in seen:
+                key = None
+            else:
+                seen.add(key)
+            keys.append({'product_id': product_id, 'key': key})
+        bind.execute(
+            products.update()
+            .where(products.c.id == sa.bindparam('product_id'))
+            .values(product_key=sa.bindparam('key')),
+            keys
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    recompute_product_keys(make_product_key)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    recompute_product_keys(lambda name, game, product_type, edition: f"{game}:{normalize_text(name)}")
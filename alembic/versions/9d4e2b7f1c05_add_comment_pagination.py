@@ -0,0 +1,47 @@
+"""Add comment pagination
+
+Adds products.comment_count, backfilled from comments, and replaces
+ix_comments_product_id with (product_id, date DESC, id DESC) for the
+newest-first keyset pages. Comments without a date get the current time.
+
+Revision ID: 9d4e2b7f1c05
+Revises: 3a6f0d8b2c17
+Create Date: 2025-08-19 16:41:05.273918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e2b7f1c05'
+down_revision: Union[str, None] = '3a6f0d8b2c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("UPDATE comments SET date = CURRENT_TIMESTAMP WHERE date IS NULL")
+    op.create_index(
+        'ix_comments_product_id_date',
+        'comments',
+        ['product_id', sa.text('date DESC'), sa.text('id DESC')],
+        unique=False
+    )
+    op.drop_index(op.f('ix_comments_product_id'), table_name='comments')
+
+    op.add_column('products', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+        UPDATE products SET
+            comment_count = (SELECT count(*) FROM comments WHERE comments.product_id = products.id)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('products', 'comment_count')
+    op.create_index(op.f('ix_comments_product_id'), 'comments', ['product_id'], unique=False)
+    op.drop_index('ix_comments_product_id_date', table_name='comments')
@@ -0,0 +1,63 @@
+"""Change-only prices
+
+Adds prices.last_seen_at and compacts the price history so that consecutive
+observations of the same price and url for a (product, store) pair collapse
+into one row spanning scrapped_at..last_seen_at.
+
+Revision ID: a91c3e5f7d24
+Revises: 4b2d9e7c1a30
+Create Date: 2025-07-27 12:05:44.871203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a91c3e5f7d24'
+down_revision: Union[str, None] = '4b2d9e7c1a30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('prices', sa.Column('last_seen_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE prices SET last_seen_at = scrapped_at")
+
+    # Number the runs of identical consecutive observations per pair, then keep
+    # the first row of every run and stretch it to the last observation.
+    op.execute("""
+        CREATE TEMPORARY TABLE price_runs AS
+        WITH changes AS (
+            SELECT id, product_id, store_id, scrapped_at,
+                   CASE WHEN price = LAG(price) OVER w AND url = LAG(url) OVER w THEN 0 ELSE 1 END AS is_change
+            FROM prices
+            WINDOW w AS (PARTITION BY product_id, store_id ORDER BY scrapped_at, id)
+        ),
+        runs AS (
+            SELECT id, product_id, store_id, scrapped_at,
+                   SUM(is_change) OVER (PARTITION BY product_id, store_id ORDER BY scrapped_at, id) AS run
+            FROM changes
+        )
+        SELECT id,
+               MIN(id) OVER (PARTITION BY product_id, store_id, run) AS keep_id,
+               MAX(scrapped_at) OVER (PARTITION BY product_id, store_id, run) AS run_last_seen_at
+        FROM runs
+    """)
+    op.execute("""
+        UPDATE prices SET last_seen_at = (
+            SELECT run_last_seen_at FROM price_runs WHERE price_runs.id = prices.id
+        )
+        WHERE id IN (SELECT keep_id FROM price_runs WHERE id <> keep_id)
+    """)
+    op.execute("DELETE FROM prices WHERE id IN (SELECT id FROM price_runs WHERE id <> keep_id)")
+    op.execute("DROP TABLE price_runs")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The collapsed observations are not restored
+    op.drop_column('prices', 'last_seen_at')
@@ -0,0 +1,76 @@
+"""Add products product key
+
+Adds products.product_key (game plus normalized name) with a unique index,
+the conflict target of the bulk product upserts. Existing products are
+keyed in id order; later duplicates of a key keep a NULL key, so they are
+left alone by upserts instead of failing the migration.
+
+Revision ID: b5c1e8f3a920
+Revises: 9d4e2b7f1c05
+Create Date: 2025-08-21 09:54:30.118427
+
+"""
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5c1e8f3a920'
+down_revision: Union[str, None] = '9d4e2b7f1c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+# Frozen copy of app.utils.parsing.make_product_key at this revision
+def make_product_key(name: str, game: str) -> str:
+    text = unicodedata.normalize('NFD', name or '')
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn').lower()
+    normalized = ' '.join(re.findall(r'[^\W_]+', text))
+    return f"{game}:{normalized}"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('product_key', sa.String(length=300), nullable=True))
+
+    bind = op.get_bind()
+    products = sa.table('products', sa.column('id'), sa.column('name'), sa.column('game'), sa.column('product_key'))
+    seen = set()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(products.c.id, products.c.name, products.c.game)
+            .where(products.c.id > last_id)
+            .order_by(products.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        keys = []
+        for product_id, name, game in rows:
+            key = make_product_key(name, game)
+            if key not in seen:
+                seen.add(key)
+                keys.append({'product_id': product_id, 'key': key})
+        if keys:
+            bind.execute(
+                products.update()
+                .where(products.c.id == sa.bindparam('product_id'))
+                .values(product_key=sa.bindparam('key')),
+                keys
+            )
+        last_id = rows[-1].id
+
+    op.create_index('ux_products_product_key', 'products', ['product_key'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_products_product_key', table_name='products')
+    op.drop_column('products', 'product_key')
@@ -0,0 +1,62 @@
+"""Add hot path indexes
+
+Indexes for the ingestion lookups (products.name, stores.name), the
+latest price per store and price history reads, the product search and the
+comments/reviews listings. On Postgres the name search gets a pg_trgm GIN
+index so ilike('%name%') stops scanning the whole table.
+
+Revision ID: c3f8a2d41b96
+Revises: a91c3e5f7d24
+Create Date: 2025-08-02 10:14:37.209511
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a2d41b96'
+down_revision: Union[str, None] = 'a91c3e5f7d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_prices_product_id_store_id_scrapped_at',
+        'prices',
+        ['product_id', 'store_id', sa.text('scrapped_at DESC')],
+        unique=False,
+        postgresql_include=['id', 'price']
+    )
+    op.create_index(op.f('ix_products_name'), 'products', ['name'], unique=False)
+    op.create_index(op.f('ix_products_min_price'), 'products', ['min_price'], unique=False)
+    op.create_index(op.f('ix_stores_name'), 'stores', ['name'], unique=False)
+    op.create_index(op.f('ix_comments_product_id'), 'comments', ['product_id'], unique=False)
+    op.create_index(op.f('ix_reviews_store_id'), 'reviews', ['store_id'], unique=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            'ix_products_name_trgm',
+            'products',
+            ['name'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'}
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_products_name_trgm', table_name='products')
+    op.drop_index(op.f('ix_reviews_store_id'), table_name='reviews')
+    op.drop_index(op.f('ix_comments_product_id'), table_name='comments')
+    op.drop_index(op.f('ix_stores_name'), table_name='stores')
+    op.drop_index(op.f('ix_products_min_price'), table_name='products')
+    op.drop_index(op.f('ix_products_name'), table_name='products')
+    op.drop_index('ix_prices_product_id_store_id_scrapped_at', table_name='prices')
@@ -0,0 +1,50 @@
+"""Add products offer count
+
+Adds products.offer_count and recomputes min_price and offer_count from
+current_prices, replacing minimums that were only ever lowered. Offers not
+seen for OFFER_MAX_AGE_DAYS are left out, as refresh_product_offers does.
+
+Revision ID: d7a4e1f09c52
+Revises: 5e2b7c9d3f18
+Create Date: 2025-08-08 09:37:52.160384
+
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a4e1f09c52'
+down_revision: Union[str, None] = '5e2b7c9d3f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Read like app.cruds.product_crud.OFFER_MAX_AGE_DAYS at this revision
+OFFER_MAX_AGE_DAYS = int(os.getenv("OFFER_MAX_AGE_DAYS", "14"))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('offer_count', sa.Integer(), server_default='0', nullable=False))
+    offers = "current_prices.product_id = products.id"
+    cutoff = None
+    if OFFER_MAX_AGE_DAYS:
+        offers += " AND current_prices.last_seen_at >= :cutoff"
+        cutoff = datetime.now(timezone.utc) - timedelta(days=OFFER_MAX_AGE_DAYS)
+    stmt = sa.text(f"""
+        UPDATE products SET
+            min_price = (SELECT min(price) FROM current_prices WHERE {offers}),
+            offer_count = (SELECT count(*) FROM current_prices WHERE {offers})
+    """)
+    if cutoff is not None:
+        stmt = stmt.bindparams(sa.bindparam('cutoff', cutoff, type_=sa.DateTime(timezone=True)))
+    op.get_bind().execute(stmt)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('products', 'offer_count')
@@ -0,0 +1,60 @@
+"""Product sort indexes
+
+Adds products.updated_at and one (key, id) index per product sort mode so
+keyset pages cost the same at any depth. The single-column name and
+min_price indexes are replaced by their composite versions.
+
+Revision ID: e9b1c6a8f240
+Revises: d7a4e1f09c52
+Create Date: 2025-08-11 14:52:18.903377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b1c6a8f240'
+down_revision: Union[str, None] = 'd7a4e1f09c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE products SET updated_at = CURRENT_TIMESTAMP")
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+    op.drop_index(op.f('ix_products_name'), table_name='products')
+    op.drop_index(op.f('ix_products_min_price'), table_name='products')
+    op.create_index('ix_products_name_id', 'products', ['name', 'id'], unique=False)
+    op.create_index('ix_products_min_price_id', 'products', ['min_price', 'id'], unique=False)
+    op.create_index(
+        'ix_products_updated_at_id',
+        'products',
+        [sa.text('updated_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index(
+            'ix_products_min_price_desc_id',
+            'products',
+            [sa.text('min_price DESC NULLS LAST'), sa.text('id DESC')],
+            unique=False
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_products_min_price_desc_id', table_name='products')
+    op.drop_index('ix_products_updated_at_id', table_name='products')
+    op.drop_index('ix_products_min_price_id', table_name='products')
+    op.drop_index('ix_products_name_id', table_name='products')
+    op.create_index(op.f('ix_products_min_price'), 'products', ['min_price'], unique=False)
+    op.create_index(op.f('ix_products_name'), 'products', ['name'], unique=False)
+    op.drop_column('products', 'updated_at')
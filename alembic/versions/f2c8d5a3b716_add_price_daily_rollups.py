@@ -0,0 +1,44 @@
+"""Add price daily rollups
+
+Per day min/max/time-weighted average/last price of every (product, store)
+pair, filled by app.commands.rollup_prices and read by the price history
+endpoint for day and week buckets.
+
+Revision ID: f2c8d5a3b716
+Revises: e9b1c6a8f240
+Create Date: 2025-08-12 09:37:52.614027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8d5a3b716'
+down_revision: Union[str, None] = 'e9b1c6a8f240'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('price_daily_rollups',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('store_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('min_price', sa.Integer(), nullable=False),
+    sa.Column('max_price', sa.Integer(), nullable=False),
+    sa.Column('avg_price', sa.Float(), nullable=False),
+    sa.Column('last_price', sa.Integer(), nullable=False),
+    sa.Column('weight_seconds', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'store_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('price_daily_rollups')
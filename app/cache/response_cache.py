@@ -0,0 +1,318 @@
+import json
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlencode
+
+from fastapi import Response
+
+from app.utils.fast_json import FastJSONResponse
+
+# Seconds a response stays cached; 0 disables the cache
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+# redis://host:6379/0 to share the cache between workers, in-process LRU otherwise
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+
+# Every cached response
+CATALOG_TAG = "catalog"
+# Every listing page
+LISTINGS_TAG = "listings"
+# Listing pages whose filter or order depends on min_price or updated_at
+PRICE_LISTINGS_TAG = "listings:prices"
+
+
+def product_tag(product_id: int) -> str:
+    """
+    Detail responses of a product
+    """
+    return f"product:{product_id}"
+
+def listed_tag(product_id: int) -> str:
+    """
+    Listing pages that include a product
+    """
+    return f"listed:{product_id}"
+
+def cache_key(endpoint: str, /, **params: Any) -> str:
+    """
+    Cache key of a response from the endpoint name and its parsed parameters
+    """
+    items = sorted((key, getattr(value, "value", value)) for key, value in params.items() if value is not None)
+    return f"{endpoint}?{urlencode(items)}"
+
+
+class CacheBackend(ABC):
+    """
+    Storage interface of the response cache
+
+    Entries are JSON-serializable dicts that expire after their TTL. Counters
+    hold the tag versions; they never expire and must not be evicted, or an
+    invalidation could be forgotten.
+    """
+
+    name = "backend"
+    # Whether every process sees the same entries and counters, so an
+    # invalidation from a command or another worker reaches them all
+    shared = False
+
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, entry: Dict[str, Any], ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def get_counters(self, keys: List[str]) -> List[int]:
+        ...
+
+    @abstractmethod
+    def incr(self, keys: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    name = "memory"
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        """
+        In-process LRU, only consistent within one worker process
+
+        Args:
+            max_entries: Maximum number of entries; the least recently used are evicted
+        """
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.counters: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        now = time.monotonic()
+        found = []
+        with self.lock:
+            for key in keys:
+                cached = self.entries.get(key)
+                if cached is None:
+                    found.append(None)
+                elif cached[0] <= now:
+                    del self.entries[key]
+                    found.append(None)
+                else:
+                    self.entries.move_to_end(key)
+                    found.append(cached[1])
+        return found
+
+    def set(self, key: str, entry: Dict[str, Any], ttl: float) -> None:
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_counters(self, keys: List[str]) -> List[int]:
+        with self.lock:
+            return [self.counters.get(key, 0) for key in keys]
+
+    def incr(self, keys: List[str]) -> None:
+        with self.lock:
+            for key in keys:
+                self.counters[key] = self.counters.get(key, 0) + 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.counters.clear()
+
+
+class RedisCacheBackend(CacheBackend):
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str):
+        """
+        Cache shared by every worker and process through Redis
+
+        Run Redis with maxmemory-policy volatile-lru: entries carry a TTL and
+        get evicted, the tag counters don't and are kept.
+
+        Args:
+            url: Redis url, e.g. redis://localhost:6379/0
+        """
+        # Only needed when RESPONSE_CACHE_URL is set
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        return [json.loads(value) if value is not None else None for value in self.client.mget(keys)]
+
+    def set(self, key: str, entry: Dict[str, Any], ttl: float) -> None:
+        self.client.set(key, json.dumps(entry), px=int(ttl * 1000))
+
+    def get_counters(self, keys: List[str]) -> List[int]:
+        return [int(value) if value is not None else 0 for value in self.client.mget(keys)]
+
+    def incr(self, keys: List[str]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.incr(key)
+        pipeline.execute()
+
+    def clear(self) -> None:
+        for pattern in ("response:*", "tag:*"):
+            for key in self.client.scan_iter(pattern):
+                self.client.delete(key)
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, ttl: float = RESPONSE_CACHE_TTL):
+        """
+        Cache of rendered JSON responses with TTL and tag-based invalidation
+
+        Each entry stores the version of every tag it depends on when it was
+        computed; invalidating a tag bumps its version, so stale entries stop
+        matching without being looked up or deleted one by one. Take the
+        snapshot before reading the database so a write landing during the
+        read invalidates the entry being computed.
+
+        Args:
+            backend: Where entries and tag versions are stored
+            ttl: Seconds an entry is served; 0 disables the cache
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.shared
+
+    def _count(self, counts: Dict[str, int], key: str) -> None:
+        name = key.split("?", 1)[0]
+        with self.lock:
+            counts[name] = counts.get(name, 0) + 1
+
+    def _versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        tags = list(dict.fromkeys(tags))
+        return dict(zip(tags, self.backend.get_counters([f"tag:{tag}" for tag in tags])))
+
+    def snapshot(self, *tags: str) -> Dict[str, int]:
+        """
+        Current versions of the tags a response depends on, plus the catalog tag
+        """
+        if not self.enabled:
+            return {}
+        return self._versions([CATALOG_TAG, *tags])
+
+    def get(self, key: str) -> Optional[Response]:
+        """
+        Cached response for the key, None when missing, expired or invalidated
+        """
+        if not self.enabled:
+            return None
+        entry = self.backend.get_many([f"response:{key}"])[0]
+        if entry is None or self._versions(entry["tags"]) != entry["tags"]:
+            self._count(self.misses, key)
+            return None
+        self._count(self.hits, key)
+        return Response(
+            content=entry["body"],
+            media_type="application/json",
+            headers={**entry["headers"], "X-Cache": "HIT"}
+        )
+
+    def put(self, key: str, content: Any, versions: Dict[str, int], headers: Optional[Dict[str, str]] = None) -> Response:
+        """
+        Renders content as JSON, caches it and returns the response
+
+        Args:
+            key: Key from cache_key
+            content: Response content (dicts from rows, models or JSON-able values)
+            versions: Tag versions from snapshot(), taken before the content was read
+            headers: Headers cached and sent with the response
+        """
+        headers = dict(headers or {})
+        response = FastJSONResponse(content, headers={**headers, "X-Cache": "MISS"})
+        if self.enabled:
+            entry = {"body": response.body.decode(), "headers": headers, "tags": versions}
+            self.backend.set(f"response:{key}", entry, self.ttl)
+        return response
+
+    def invalidate(self, *tags: str) -> None:
+        if self.enabled and tags:
+            self.backend.incr([f"tag:{tag}" for tag in dict.fromkeys(tags)])
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit and miss counts of this process, in total and per endpoint
+        """
+        with self.lock:
+            names = sorted(set(self.hits) | set(self.misses))
+            endpoints = {
+                name: _rates(self.hits.get(name, 0), self.misses.get(name, 0)) for name in names
+            }
+        return {
+            "backend": self.backend.name,
+            "ttl": self.ttl,
+            **_rates(sum(stats["hits"] for stats in endpoints.values()),
+                     sum(stats["misses"] for stats in endpoints.values())),
+            "endpoints": endpoints,
+        }
+
+
+def _rates(hits: int, misses: int) -> Dict[str, Any]:
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else 0.0}
+
+
+@lru_cache
+def get_response_cache() -> ResponseCache:
+    if RESPONSE_CACHE_URL:
+        return ResponseCache(RedisCacheBackend(RESPONSE_CACHE_URL))
+    return ResponseCache(MemoryCacheBackend())
+
+
+def invalidate_products(product_ids: Iterable[int], listed: bool = False, prices: bool = False) -> None:
+    """
+    Drops the cached details of the products
+
+    Args:
+        product_ids: Changed products
+        listed: Also drop the listing pages that show them
+        prices: Also drop the listings ordered or filtered by price or update time
+    """
+    product_ids = list(product_ids)
+    tags = [product_tag(product_id) for product_id in product_ids]
+    if listed:
+        tags += [listed_tag(product_id) for product_id in product_ids]
+    if prices:
+        tags.append(PRICE_LISTINGS_TAG)
+    get_response_cache().invalidate(*tags)
+
+def invalidate_listings() -> None:
+    """
+    Drops every cached listing page, needed when products are created
+    """
+    get_response_cache().invalidate(LISTINGS_TAG)
+
+def invalidate_catalog() -> None:
+    get_response_cache().invalidate(CATALOG_TAG)
@@ -0,0 +1,34 @@
+"""Deletes raw price rows older than the retention window
+
+Days are rolled up into price_daily_rollups first, so the history endpoint
+keeps serving them from the rollups. Rows are deleted in short batches and
+the command can be interrupted and run again at any point.
+
+    python -m app.commands.prune_prices
+    python -m app.commands.prune_prices --retention-days 180 --batch-size 2000 --pause 0.1
+"""
+import argparse
+from datetime import timedelta
+
+from app.cruds.price_history_crud import PRICE_RETENTION_DAYS, PRUNE_BATCH_SIZE, day_start, prune_price_rows
+from app.database import SessionLocal
+from app.utils.dates import utcnow
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--retention-days", type=int, default=PRICE_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=PRUNE_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=0, help="seconds to sleep between batches")
+    args = parser.parse_args()
+    if args.retention_days < 1:
+        parser.error("--retention-days must be at least 1")
+
+    cutoff = day_start(utcnow().date() - timedelta(days=args.retention_days))
+    with SessionLocal() as db:
+        count = prune_price_rows(db, cutoff, batch_size=args.batch_size, pause=args.pause)
+    print(f"prices: {count} rows last seen before {cutoff.date()} deleted")
+
+
+if __name__ == "__main__":
+    main()
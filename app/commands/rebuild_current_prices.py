@@ -0,0 +1,34 @@
+"""Rebuilds current_prices from the price history
+
+Bumps the catalog version, so clients revalidating with an ETag get the new
+offers. A shared cache (RESPONSE_CACHE_URL) is invalidated from here; the
+API checks what an in-process cache serves against the catalog and product
+versions, so it stops serving the old offers too.
+
+    python -m app.commands.rebuild_current_prices
+    python -m app.commands.rebuild_current_prices --product-id 12 --product-id 40
+"""
+import argparse
+
+from app.cache.response_cache import invalidate_catalog
+from app.cruds.price_crud import rebuild_current_prices
+from app.cruds.product_crud import bump_catalog_version
+from app.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--product-id", type=int, action="append", dest="product_ids",
+                        help="only rebuild this product (repeatable)")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        count = rebuild_current_prices(db, product_ids=args.product_ids)
+        bump_catalog_version(db)
+        db.commit()
+    invalidate_catalog()
+    print(f"current_prices: {count} rows written")
+
+
+if __name__ == "__main__":
+    main()
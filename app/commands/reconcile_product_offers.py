@@ -0,0 +1,30 @@
+"""Recomputes min_price and offer_count of every product from current_prices
+
+Meant to run periodically: it fixes drift and expires offers not seen for
+OFFER_MAX_AGE_DAYS, in one set-based UPDATE. The catalog version is bumped
+when a product changes. A shared cache (RESPONSE_CACHE_URL) is invalidated
+from here; the API checks what an in-process cache serves against the
+catalog and product versions, so it stops serving the old values too.
+
+    python -m app.commands.reconcile_product_offers
+"""
+import argparse
+
+from app.cache.response_cache import invalidate_catalog
+from app.cruds.product_crud import refresh_product_offers
+from app.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    with SessionLocal() as db:
+        count = refresh_product_offers(db)
+        db.commit()
+    invalidate_catalog()
+    print(f"products: {count} rows corrected")
+
+
+if __name__ == "__main__":
+    main()
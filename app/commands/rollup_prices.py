@@ -0,0 +1,43 @@
+"""Rolls raw price rows up into price_daily_rollups
+
+Only completed UTC days are rolled up. By default it continues from the day
+after the last rolled up one, so it can run from cron and catch up after a
+missed run; --since re-rolls older days (rows are replaced, not added) as
+long as their raw rows were not pruned.
+
+    python -m app.commands.rollup_prices
+    python -m app.commands.rollup_prices --since 2025-07-01 --until 2025-07-31
+"""
+import argparse
+from datetime import date, timedelta
+
+from app.cruds.price_history_crud import ROLLUP_BATCH_SIZE, next_rollup_day, rollup_daily_prices
+from app.database import SessionLocal
+from app.utils.dates import utcnow
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, default=None, help="last day, defaults to yesterday (UTC)")
+    parser.add_argument("--batch-size", type=int, default=ROLLUP_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        until = args.until or utcnow().date() - timedelta(days=1)
+        since = args.since or next_rollup_day(db)
+        if since is None:
+            print("price_daily_rollups: no prices to roll up")
+            return
+        if since > until:
+            print(f"price_daily_rollups: up to date ({until})")
+            return
+        try:
+            count = rollup_daily_prices(db, since, until, batch_size=args.batch_size)
+        except ValueError as error:
+            parser.error(str(error))
+    print(f"price_daily_rollups: {count} rows written for {since} to {until}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
+from datetime import datetime
+from sqlalchemy import Row, select, tuple_, update
 from sqlalchemy.orm import Session
+from typing import Any, Optional, Union
+from app.cache.response_cache import invalidate_products
 from app.models.models import Comments, Products
+from app.utils.pagination import decode_cursor, encode_cursor
+
+COMMENTS_CURSOR = "comments"
 
 def create_comment(db: Session, user: str, product_id: int, text: str) -> Comments:
     db_comment = Comments(
@@ -8,9 +15,55 @@ def create_comment(db: Session, user: str, product_id: int, text: str) -> Commen
         text=text
     )
     db.add(db_comment)
+    db.execute(
+        update(Products)
+        .where(Products.id == product_id)
+        .values(comment_count=Products.comment_count + 1)
+    )
     db.commit()
+    invalidate_products([product_id])
     db.refresh(db_comment)
     return db_comment
 
-def get_all_comments_by_product_id(db: Session, product_id: int) -> list[Comments]:
-    return db.query(Comments).filter(Comments.product_id == product_id).all()
\ No newline at end of file
+def comment_cursor(comment: Union[Comments, Row]) -> str:
+    """
+    Cursor for the page of older comments that follows this one
+    """
+    return encode_cursor(COMMENTS_CURSOR, [comment.date.isoformat(), comment.id])
+
+def decode_comment_cursor(cursor: str) -> list[Any]:
+    values = decode_cursor(cursor, COMMENTS_CURSOR)
+    if len(values) != 2 or not isinstance(values[1], int):
+        raise ValueError("Invalid cursor")
+    try:
+        values[0] = datetime.fromisoformat(values[0])
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    return values
+
+def get_comments_by_product_id(
+    db: Session,
+    product_id: int,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    as_rows: bool = False
+) -> list[Comments]:
+    """
+    A page of the comments of a product, newest first.
+
+    Args:
+        limit: Maximum number of comments returned
+        cursor: Cursor from comment_cursor of the last comment of the previous page
+        as_rows: Return rows with the CommentResponse columns instead of Comments objects
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    columns = (Comments.id, Comments.user, Comments.product_id, Comments.text, Comments.date)
+    query = select(*columns) if as_rows else select(Comments)
+    query = query.where(Comments.product_id == product_id)
+    if cursor is not None:
+        query = query.where(tuple_(Comments.date, Comments.id) < tuple_(*decode_comment_cursor(cursor)))
+    query = query.order_by(Comments.date.desc(), Comments.id.desc()).limit(limit)
+    result = db.execute(query)
+    return result.all() if as_rows else result.scalars().all()
\ No newline at end of file
@@ -1,7 +1,242 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Row, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from app.models.models import Prices, Products
+from app.cache.response_cache import invalidate_products
+from app.cruds.product_crud import OFFER_MAX_AGE_DAYS, refresh_product_offers
+from app.models.models import CurrentPrices, Prices, Stores
+
+APPEND = "append"
+CHANGE_ONLY = "change_only"
+
+# change_only: an observation with the same price and url as the current row
+# of its (product, store) pair only moves that row's last_seen_at forward.
+# A store is tracked as one listing per product, like current_prices: when a
+# batch has several listings of a product in the same store (different urls),
+# only the last one is compared and recorded.
+PRICE_STORAGE_MODE = os.getenv("PRICE_STORAGE_MODE", CHANGE_ONLY)
+
+CURRENT_PRICE_COLUMNS = ("product_id", "store_id", "price_id", "price", "url", "scrapped_at", "last_seen_at")
+
+def get_latest_prices_by_product(db: Session, product_id: int, store_id: Optional[int] = None) -> List[Tuple[CurrentPrices, Stores]]:
+    query = (
+        db.query(CurrentPrices, Stores)
+        .join(Stores, CurrentPrices.store_id == Stores.id)
+        .filter(CurrentPrices.product_id == product_id)
+    )
+    if store_id:
+        query = query.filter(CurrentPrices.store_id == store_id)
+    return query.order_by(CurrentPrices.store_id).all()
+
+def get_prices_with_stores(db: Session, product_id: int, store_id: Optional[int] = None) -> List[Tuple[Prices, Stores]]:
+    query = (
+        db.query(Prices, Stores)
+        .join(Stores, Prices.store_id == Stores.id)
+        .filter(Prices.product_id == product_id)
+    )
+    if store_id:
+        query = query.filter(Prices.store_id == store_id)
+    return query.order_by(Prices.scrapped_at.desc()).all()
+
+def get_price_rows_with_stores(
+    db: Session,
+    product_id: int,
+    store_id: Optional[int] = None,
+    latest_only: bool = False
+) -> List[Row]:
+    """
+    Prices of a product as flat rows, in the order of get_latest_prices_by_product
+    (latest_only) or get_prices_with_stores.
+
+    Rows have id, price, url, scrapped_at, last_seen_at, store_id, store_name
+    and store_website_url; no ORM objects are built. Like min_price and
+    offer_count, latest_only leaves out offers not seen for OFFER_MAX_AGE_DAYS.
+    """
+    table = CurrentPrices if latest_only else Prices
+    query = (
+        select(
+            (CurrentPrices.price_id if latest_only else Prices.id).label("id"),
+            table.price,
+            table.url,
+            table.scrapped_at,
+            table.last_seen_at,
+            Stores.id.label("store_id"),
+            Stores.name.label("store_name"),
+            Stores.website_url.label("store_website_url"),
+        )
+        .join(Stores, table.store_id == Stores.id)
+        .where(table.product_id == product_id)
+    )
+    if store_id:
+        query = query.where(table.store_id == store_id)
+    if latest_only and OFFER_MAX_AGE_DAYS:
+        query = query.where(
+            CurrentPrices.last_seen_at >= datetime.now(timezone.utc) - timedelta(days=OFFER_MAX_AGE_DAYS)
+        )
+    order_by = CurrentPrices.store_id if latest_only else Prices.scrapped_at.desc()
+    return db.execute(query.order_by(order_by)).all()
+
+def get_current_price(db: Session, product_id: int, store_id: int) -> Optional[Prices]:
+    return (
+        db.query(Prices)
+        .join(CurrentPrices, CurrentPrices.price_id == Prices.id)
+        .filter(CurrentPrices.product_id == product_id, CurrentPrices.store_id == store_id)
+        .first()
+    )
+
+def get_current_prices(db: Session, product_ids: List[int]) -> Dict[Tuple[int, int], Row]:
+    if not product_ids:
+        return {}
+    rows = db.execute(
+        select(
+            CurrentPrices.price_id.label("id"),
+            CurrentPrices.product_id,
+            CurrentPrices.store_id,
+            CurrentPrices.price,
+            CurrentPrices.url
+        )
+        .where(CurrentPrices.product_id.in_(product_ids))
+    ).all()
+    return {(row.product_id, row.store_id): row for row in rows}
+
+def upsert_current_prices(db: Session, rows: List[dict]) -> None:
+    """
+    Points current_prices at freshly inserted price rows, without committing.
+
+    Args:
+        db: Database session
+        rows: Dicts with CURRENT_PRICE_COLUMNS; for repeated pairs the last one wins
+    """
+    latest_by_pair = {}
+    for row in rows:
+        latest_by_pair[(row["product_id"], row["store_id"])] = {column: row[column] for column in CURRENT_PRICE_COLUMNS}
+    if not latest_by_pair:
+        return
+
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(CurrentPrices).values(list(latest_by_pair.values()))
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CurrentPrices.product_id, CurrentPrices.store_id],
+            set_={column: stmt.excluded[column] for column in CURRENT_PRICE_COLUMNS[2:]}
+        )
+    )
+
+def rebuild_current_prices(db: Session, product_ids: Optional[List[int]] = None) -> int:
+    """
+    Recomputes current_prices from the price history, without committing.
+
+    Args:
+        db: Database session
+        product_ids: Only rebuild these products; all of them when None
+
+    Returns:
+        Number of current price rows written
+    """
+    latest = select(func.max(Prices.id).label("id")).group_by(Prices.product_id, Prices.store_id)
+    clear = delete(CurrentPrices)
+    if product_ids is not None:
+        latest = latest.where(Prices.product_id.in_(product_ids))
+        clear = clear.where(CurrentPrices.product_id.in_(product_ids))
+    latest = latest.subquery()
+
+    db.execute(clear)
+    return db.execute(
+        insert(CurrentPrices).from_select(
+            list(CURRENT_PRICE_COLUMNS),
+            select(
+                Prices.product_id,
+                Prices.store_id,
+                Prices.id,
+                Prices.price,
+                Prices.url,
+                Prices.scrapped_at,
+                Prices.last_seen_at
+            ).join(latest, Prices.id == latest.c.id)
+        )
+    ).rowcount
+
+def record_price_observations(db: Session, observations: List[dict]) -> List[dict]:
+    """
+    Stores a batch of price observations without committing.
+
+    Args:
+        db: Database session
+        observations: Dicts with product_id, store_id, price and url, plus
+            an optional observation_key; an observation whose key was already
+            written is skipped. In change_only mode only the last observation
+            of each (product, store) pair is kept, whatever its url
+
+    Returns:
+        The observations that were written as new rows
+    """
+    if PRICE_STORAGE_MODE != CHANGE_ONLY:
+        new_prices = observations
+    else:
+        latest_by_pair = {}
+        # Keyed like current_prices, so other listings of the pair in this batch are dropped
+        for observation in observations:
+            latest_by_pair[(observation["product_id"], observation["store_id"])] = observation
+
+        current = get_current_prices(db, list({product_id for product_id, _ in latest_by_pair}))
+        unchanged_ids = []
+        new_prices = []
+        for pair, observation in latest_by_pair.items():
+            row = current.get(pair)
+            if row and row.price == observation["price"] and row.url == observation["url"]:
+                unchanged_ids.append(row.id)
+            else:
+                new_prices.append(observation)
+
+        if unchanged_ids:
+            db.execute(
+                update(Prices).where(Prices.id.in_(unchanged_ids)).values(last_seen_at=func.now())
+            )
+            db.execute(
+                update(CurrentPrices).where(CurrentPrices.price_id.in_(unchanged_ids)).values(last_seen_at=func.now())
+            )
+
+    if not new_prices:
+        return []
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    inserted = db.execute(
+        dialect_insert(Prices)
+        .values([{**observation, "observation_key": observation.get("observation_key")} for observation in new_prices])
+        .on_conflict_do_nothing(index_elements=[Prices.observation_key])
+        .returning(
+            Prices.id.label("price_id"),
+            Prices.product_id,
+            Prices.store_id,
+            Prices.price,
+            Prices.url,
+            Prices.scrapped_at,
+            Prices.last_seen_at,
+            Prices.observation_key
+        )
+    ).mappings().all()
+    upsert_current_prices(db, sorted(inserted, key=lambda row: row["price_id"]))
+    written_keys = {row["observation_key"] for row in inserted}
+    return [
+        observation for observation in new_prices
+        if observation.get("observation_key") is None or observation["observation_key"] in written_keys
+    ]
 
 def create_price(db: Session, product_id: int, store_id: int, price: int, url: str) -> Prices:
+    if PRICE_STORAGE_MODE == CHANGE_ONLY:
+        current = get_current_price(db, product_id, store_id)
+        if current and current.price == price and current.url == url:
+            current.last_seen_at = func.now()
+            db.execute(
+                update(CurrentPrices).where(CurrentPrices.price_id == current.id).values(last_seen_at=func.now())
+            )
+            refresh_product_offers(db, [product_id])
+            db.commit()
+            invalidate_products([product_id], listed=True, prices=True)
+            db.refresh(current)
+            return current
+
     db_price = Prices(
         product_id=product_id,
         store_id=store_id,
@@ -9,13 +244,11 @@ def create_price(db: Session, product_id: int, store_id: int, price: int, url: s
         url=url
     )
     db.add(db_price)
+    db.flush()
+    db.refresh(db_price)
+    upsert_current_prices(db, [{**db_price.model_dump(), "price_id": db_price.id}])
+    refresh_product_offers(db, [product_id])
     db.commit()
+    invalidate_products([product_id], listed=True, prices=True)
     db.refresh(db_price)
-
-    product = db.query(Products).filter(Products.id == product_id).first()
-    if product and (product.min_price is None or price < product.min_price):
-        product.min_price = price
-        db.commit()
-        db.refresh(product)
-
     return db_price
@@ -0,0 +1,384 @@
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import DateTime, and_, case, delete, exists, func, insert, literal, literal_column, select, type_coerce
+from sqlalchemy.orm import Session
+
+from app.models.models import CurrentPrices, PriceBucketEnum, PriceDailyRollups, PriceRetention, Prices
+from app.utils.dates import as_utc
+
+BUCKET_STEPS = {
+    PriceBucketEnum.HOUR: timedelta(hours=1),
+    PriceBucketEnum.DAY: timedelta(days=1),
+    PriceBucketEnum.WEEK: timedelta(weeks=1),
+}
+ROLLUP_BATCH_SIZE = 500
+PRUNE_BATCH_SIZE = 5000
+# Raw price rows are kept this many days, older ones only survive as daily rollups
+PRICE_RETENTION_DAYS = int(os.getenv("PRICE_RETENTION_DAYS", "90"))
+
+# Bucket stats are dicts with min, max, weighted_sum, weight, last and last_at;
+# averages are weighted by the seconds each price row was current in the bucket.
+BucketStats = Dict[Tuple[int, datetime], dict]
+
+
+def floor_bucket(moment: datetime, bucket: PriceBucketEnum) -> datetime:
+    moment = as_utc(moment)
+    if bucket == PriceBucketEnum.HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == PriceBucketEnum.DAY:
+        return day
+    return day - timedelta(days=day.weekday())
+
+def day_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+def _merge(stats: BucketStats, key: Tuple[int, datetime], low: int, high: int,
+           weighted_sum: float, weight: float, last: int, last_at: datetime) -> None:
+    current = stats.get(key)
+    if current is None:
+        stats[key] = {
+            "min": low, "max": high, "weighted_sum": weighted_sum, "weight": weight, "last": last, "last_at": last_at
+        }
+        return
+    current["min"] = min(current["min"], low)
+    current["max"] = max(current["max"], high)
+    current["weighted_sum"] += weighted_sum
+    current["weight"] += weight
+    if last_at >= current["last_at"]:
+        current["last"] = last
+        current["last_at"] = last_at
+
+def _bucket_after(dialect: str, at: Any, bucket: PriceBucketEnum) -> Any:
+    seconds = int(BUCKET_STEPS[bucket].total_seconds())
+    if dialect == "postgresql":
+        # Seconds rather than days, so the session time zone's DST changes don't matter
+        return at + literal_column(f"interval '{seconds} seconds'")
+    # In the format SQLAlchemy stores datetimes in, so they compare as strings
+    return type_coerce(func.strftime("%Y-%m-%d %H:%M:%S.000000", at, f"+{seconds} seconds"), DateTime(timezone=True))
+
+def _seconds_between(dialect: str, later: Any, earlier: Any) -> Any:
+    if dialect == "postgresql":
+        return func.extract("epoch", later - earlier)
+    return func.round((func.julianday(later) - func.julianday(earlier)) * 86400.0, 3)
+
+def _least(dialect: str, *values: Any) -> Any:
+    # SQLite's min() and max() with several arguments are scalar functions
+    return func.least(*values) if dialect == "postgresql" else func.min(*values)
+
+def _greatest(dialect: str, *values: Any) -> Any:
+    return func.greatest(*values) if dialect == "postgresql" else func.max(*values)
+
+def get_bucket_stats(
+    db: Session,
+    product_ids: List[int],
+    bucket: PriceBucketEnum,
+    start: datetime,
+    end: datetime,
+    store_id: Optional[int] = None
+) -> Dict[Tuple[int, int, datetime], dict]:
+    """
+    Spreads the raw price rows over the buckets they were current in and
+    aggregates them, in one GROUP BY query.
+
+    A row is current from scrapped_at to last_seen_at, so one change-only row
+    can cover many buckets: the rows are joined to a recursive CTE of the
+    bucket starts in [start, end) and grouped by product, store and bucket start.
+
+    Args:
+        db: Database session
+        product_ids: Products to aggregate
+        bucket: Bucket size
+        start: Start of the range (inclusive), aligned to the bucket
+        end: End of the range (exclusive)
+        store_id: Only this store when given
+
+    Returns:
+        Stats keyed by (product_id, store_id, bucket start)
+    """
+    dialect = db.get_bind().dialect.name
+    buckets = select(literal(start, DateTime(timezone=True)).label("at")).cte("buckets", recursive=True)
+    following = _bucket_after(dialect, buckets.c.at, bucket)
+    buckets = buckets.union_all(select(following).where(following < end))
+
+    started = Prices.scrapped_at
+    ended = func.coalesce(Prices.last_seen_at, Prices.scrapped_at)
+    following = _bucket_after(dialect, buckets.c.at, bucket)
+    # Clipped to the range end too, so a partial last bucket only weighs the time in range
+    overlap = _seconds_between(
+        dialect,
+        _least(dialect, ended, following, literal(end, DateTime(timezone=True))),
+        _greatest(dialect, started, buckets.c.at)
+    )
+    spans = (
+        select(
+            Prices.product_id,
+            Prices.store_id,
+            buckets.c.at,
+            Prices.price,
+            started.label("started"),
+            # A single observation still counts, with a nominal one second weight
+            _greatest(dialect, overlap, 1.0).label("weight"),
+            func.row_number().over(
+                partition_by=(Prices.product_id, Prices.store_id, buckets.c.at),
+                order_by=(started.desc(), Prices.id.desc())
+            ).label("newest")
+        )
+        .select_from(Prices)
+        .join(buckets, and_(buckets.c.at <= ended, following > started))
+        .where(Prices.product_id.in_(product_ids), started < end, ended >= start)
+    )
+    if store_id:
+        spans = spans.where(Prices.store_id == store_id)
+    spans = spans.subquery()
+
+    rows = db.execute(
+        select(
+            spans.c.product_id,
+            spans.c.store_id,
+            spans.c.at,
+            func.min(spans.c.price).label("min"),
+            func.max(spans.c.price).label("max"),
+            func.sum(spans.c.price * spans.c.weight).label("weighted_sum"),
+            func.sum(spans.c.weight).label("weight"),
+            func.max(case((spans.c.newest == 1, spans.c.price))).label("last"),
+            func.max(spans.c.started).label("last_at")
+        ).group_by(spans.c.product_id, spans.c.store_id, spans.c.at)
+    ).all()
+    return {
+        (row.product_id, row.store_id, as_utc(row.at)): {
+            "min": row.min,
+            "max": row.max,
+            "weighted_sum": float(row.weighted_sum),
+            "weight": float(row.weight),
+            "last": row.last,
+            "last_at": as_utc(row.last_at),
+        }
+        for row in rows
+    }
+
+def get_rollup_watermark(db: Session) -> Optional[date]:
+    """
+    Last day covered by the daily rollups, None before the first rollup run
+    """
+    return db.execute(select(func.max(PriceDailyRollups.day))).scalar()
+
+def get_pruned_before(db: Session) -> Optional[datetime]:
+    """
+    Raw price rows that stopped being current before this moment were pruned, None if never pruned
+    """
+    pruned_before = db.execute(select(PriceRetention.pruned_before)).scalar()
+    return as_utc(pruned_before) if pruned_before else None
+
+def next_rollup_day(db: Session) -> Optional[date]:
+    """
+    First day not rolled up yet: the day after the watermark, or the day of the
+    oldest price row before the first rollup. None when there are no prices.
+    """
+    watermark = get_rollup_watermark(db)
+    if watermark is not None:
+        return watermark + timedelta(days=1)
+    first_scrapped_at = db.execute(select(func.min(Prices.scrapped_at))).scalar()
+    return as_utc(first_scrapped_at).date() if first_scrapped_at else None
+
+def get_price_history(
+    db: Session,
+    product_id: int,
+    bucket: PriceBucketEnum,
+    start: datetime,
+    end: datetime,
+    store_id: Optional[int] = None
+) -> BucketStats:
+    """
+    Per store price stats of a product, one entry per bucket.
+
+    The range start is aligned down to its bucket. Day and week buckets read
+    the whole days of the range already rolled up from price_daily_rollups
+    and only compute the remaining days, and a partial last day, from the
+    raw price rows.
+
+    Args:
+        db: Database session
+        product_id: Product id
+        bucket: Bucket size
+        start: Start of the range (inclusive)
+        end: End of the range (exclusive)
+        store_id: Only this store when given
+
+    Returns:
+        Stats keyed by (store_id, bucket start)
+
+    Raises:
+        ValueError: Hour buckets, or a partial last day, requested before the pruned raw rows
+    """
+    start, end = floor_bucket(start, bucket), as_utc(end)
+    pruned_before = get_pruned_before(db)
+    if bucket == PriceBucketEnum.HOUR:
+        if pruned_before and start < pruned_before:
+            raise ValueError(f"Hourly history starts at {pruned_before.isoformat()}")
+        return {
+            (stats_store_id, at): stats
+            for (_, stats_store_id, at), stats in get_bucket_stats(db, [product_id], bucket, start, end, store_id).items()
+        }
+
+    days: BucketStats = {}
+    raw_start = start
+    watermark = get_rollup_watermark(db)
+    # Only the days that end by `end`: a rollup of the day `end` falls in covers data after it
+    last_whole_day = floor_bucket(end, PriceBucketEnum.DAY).date() - timedelta(days=1)
+    if watermark is not None and min(watermark, last_whole_day) >= start.date():
+        last_rolled_day = min(watermark, last_whole_day)
+        query = select(PriceDailyRollups).where(
+            PriceDailyRollups.product_id == product_id,
+            PriceDailyRollups.day >= start.date(),
+            PriceDailyRollups.day <= last_rolled_day
+        )
+        if store_id:
+            query = query.where(PriceDailyRollups.store_id == store_id)
+        for rollup in db.execute(query.order_by(PriceDailyRollups.day)).scalars():
+            at = day_start(rollup.day)
+            days[(rollup.store_id, at)] = {
+                "min": rollup.min_price,
+                "max": rollup.max_price,
+                "weighted_sum": rollup.avg_price * rollup.weight_seconds,
+                "weight": rollup.weight_seconds,
+                "last": rollup.last_price,
+                "last_at": at,
+            }
+        raw_start = max(start, day_start(last_rolled_day + timedelta(days=1)))
+
+    if raw_start < end:
+        if pruned_before and raw_start < pruned_before:
+            raise ValueError(f"History before {pruned_before.isoformat()} only has whole days")
+        days.update(
+            ((stats_store_id, at), stats)
+            for (_, stats_store_id, at), stats in get_bucket_stats(
+                db, [product_id], PriceBucketEnum.DAY, raw_start, end, store_id
+            ).items()
+        )
+
+    if bucket == PriceBucketEnum.DAY:
+        return days
+
+    weeks: BucketStats = {}
+    for (day_store_id, at), day in sorted(days.items(), key=lambda item: item[0][1]):
+        _merge(weeks, (day_store_id, floor_bucket(at, bucket)), day["min"], day["max"],
+               day["weighted_sum"], day["weight"], day["last"], day["last_at"])
+    return weeks
+
+def rollup_daily_prices(db: Session, first_day: date, last_day: date, batch_size: int = ROLLUP_BATCH_SIZE) -> int:
+    """
+    Recomputes price_daily_rollups for a range of days, committing once per batch of products.
+
+    Args:
+        db: Database session
+        first_day: First UTC day to roll up
+        last_day: Last UTC day to roll up (inclusive)
+        batch_size: Number of products per transaction
+
+    Returns:
+        Number of rollup rows written
+
+    Raises:
+        ValueError: The range includes days whose raw rows were pruned
+    """
+    pruned_before = get_pruned_before(db)
+    if pruned_before and first_day < pruned_before.date():
+        raise ValueError(f"Raw prices before {pruned_before.date()} were pruned, those days can't be rolled up again")
+    start, end = day_start(first_day), day_start(last_day + timedelta(days=1))
+    written = 0
+    last_product_id = 0
+    while True:
+        product_ids = db.execute(
+            select(Prices.product_id)
+            .where(Prices.product_id > last_product_id)
+            .group_by(Prices.product_id)
+            .order_by(Prices.product_id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not product_ids:
+            return written
+
+        stats = get_bucket_stats(db, product_ids, PriceBucketEnum.DAY, start, end)
+        db.execute(
+            delete(PriceDailyRollups).where(
+                PriceDailyRollups.product_id.in_(product_ids),
+                PriceDailyRollups.day >= first_day,
+                PriceDailyRollups.day <= last_day
+            )
+        )
+        if stats:
+            db.execute(insert(PriceDailyRollups), [
+                {
+                    "product_id": product_id,
+                    "store_id": store_id,
+                    "day": at.date(),
+                    "min_price": day["min"],
+                    "max_price": day["max"],
+                    "avg_price": day["weighted_sum"] / day["weight"],
+                    "last_price": day["last"],
+                    "weight_seconds": day["weight"],
+                }
+                for (product_id, store_id, at), day in stats.items()
+            ])
+        db.commit()
+        written += len(stats)
+        last_product_id = product_ids[-1]
+
+def prune_price_rows(db: Session, cutoff: datetime, batch_size: int = PRUNE_BATCH_SIZE, pause: float = 0) -> int:
+    """
+    Deletes the raw price rows that stopped being current before cutoff,
+    after making sure the daily rollups cover those days.
+
+    Every batch is its own short transaction, so locks are held briefly and
+    an interrupted run is resumed by running it again. The cutoff is recorded
+    before deleting anything, which keeps later rollup runs away from the
+    pruned days. Rows still referenced by current_prices are kept.
+
+    Args:
+        db: Database session
+        cutoff: Start of a UTC day; rows last seen before it are deleted
+        batch_size: Number of rows deleted per transaction
+        pause: Seconds to sleep between batches
+
+    Returns:
+        Number of price rows deleted
+    """
+    cutoff = as_utc(cutoff)
+    last_day = cutoff.date() - timedelta(days=1)
+    first_day = next_rollup_day(db)
+    if first_day is not None and first_day <= last_day:
+        rollup_daily_prices(db, first_day, last_day)
+
+    retention = db.get(PriceRetention, 1)
+    if retention is None:
+        db.add(PriceRetention(id=1, pruned_before=cutoff))
+    elif as_utc(retention.pruned_before) < cutoff:
+        retention.pruned_before = cutoff
+    else:
+        cutoff = as_utc(retention.pruned_before)
+    db.commit()
+
+    deleted = 0
+    last_id = 0
+    while True:
+        price_ids = db.execute(
+            select(Prices.id)
+            .where(
+                Prices.id > last_id,
+                func.coalesce(Prices.last_seen_at, Prices.scrapped_at) < cutoff,
+                ~exists().where(CurrentPrices.price_id == Prices.id)
+            )
+            .order_by(Prices.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not price_ids:
+            return deleted
+        db.execute(delete(Prices).where(Prices.id.in_(price_ids)))
+        db.commit()
+        deleted += len(price_ids)
+        last_id = price_ids[-1]
+        if pause:
+            time.sleep(pause)
@@ -1,7 +1,81 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Optional
-from app.models.models import Products, GameEnum, ProductTypeEnum
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Query, Session
+from sqlalchemy import and_, case, func, or_, select, tuple_, update
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from app.cache.response_cache import invalidate_listings, invalidate_products
+from app.models.models import CatalogVersion, CurrentPrices, Products, GameEnum, ProductTypeEnum, ProductSortEnum
+from app.search.index import get_search_index
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.parsing import make_match_key, make_product_key
+
+# Offers not seen by the scrapper for this many days count as dropped by the
+# store (0 keeps them forever)
+OFFER_MAX_AGE_DAYS = int(os.getenv("OFFER_MAX_AGE_DAYS", "14"))
+# Products per INSERT ... RETURNING statement and transaction of create_products_bulk
+PRODUCT_BULK_CHUNK_SIZE = int(os.getenv("PRODUCT_BULK_CHUNK_SIZE", "1000"))
+# Columns a bulk upsert overwrites on an existing product; min_price and
+# offer_count belong to the offers
+PRODUCT_UPSERT_COLUMNS = ("name", "match_key", "game", "edition", "language", "description", "condition", "product_type")
+
+# Key columns of every sort mode (id last as tie-breaker) and whether it is descending
+PRODUCT_SORTS = {
+    ProductSortEnum.ID: ((Products.id,), False),
+    ProductSortEnum.PRICE_ASC: ((Products.min_price, Products.id), False),
+    ProductSortEnum.PRICE_DESC: ((Products.min_price, Products.id), True),
+    ProductSortEnum.NAME: ((Products.name, Products.id), False),
+    ProductSortEnum.UPDATED: ((Products.updated_at, Products.id), True),
+}
+# Sorts on min_price list the products without a price last
+PRICE_SORTS = {ProductSortEnum.PRICE_ASC, ProductSortEnum.PRICE_DESC}
+# Types a cursor value may have, per sort key column (updated_at as an ISO string)
+CURSOR_VALUE_TYPES = {
+    "id": (int,),
+    "min_price": (int, type(None)),
+    "name": (str,),
+    "updated_at": (str,),
+}
+# Columns read instead of whole Products objects when listing as rows; they
+# cover ProductResponse plus the keys of every sort mode
+PRODUCT_ROW_COLUMNS = (
+    Products.id,
+    Products.name,
+    Products.img_url,
+    Products.min_price,
+    Products.offer_count,
+    Products.game,
+    Products.edition,
+    Products.language,
+    Products.description,
+    Products.condition,
+    Products.product_type,
+    Products.updated_at,
+)
+
+def product_cursor(product: Products, sort: ProductSortEnum = ProductSortEnum.ID) -> str:
+    """
+    Cursor for the page that follows this product in the given sort mode
+    """
+    columns, _ = PRODUCT_SORTS[sort]
+    return encode_cursor(sort.value, [getattr(product, column.key) for column in columns])
+
+def decode_product_cursor(cursor: str, sort: ProductSortEnum) -> List[Any]:
+    columns, _ = PRODUCT_SORTS[sort]
+    values = decode_cursor(cursor, sort.value)
+    if len(values) != len(columns):
+        raise ValueError("Invalid cursor")
+    for column, value in zip(columns, values):
+        if isinstance(value, bool) or not isinstance(value, CURSOR_VALUE_TYPES[column.key]):
+            raise ValueError("Invalid cursor")
+    if sort == ProductSortEnum.UPDATED:
+        try:
+            values[0] = datetime.fromisoformat(values[0])
+        except (TypeError, ValueError) as e:
+            raise ValueError("Invalid cursor") from e
+    return values
 
 def get_products(
     db: Session,
@@ -11,9 +85,24 @@ def get_products(
     game: Optional[GameEnum] = None,
     product_type: Optional[ProductTypeEnum] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    sort: ProductSortEnum = ProductSortEnum.ID,
+    cursor: Optional[str] = None,
+    as_rows: bool = False
 ) -> List[Products]:
-    query = db.query(Products)
+    """
+    Lists products in a stable order, by offset or by keyset cursor.
+
+    Args:
+        skip: Offset, only used when no cursor is given
+        sort: Sort mode; each one is served by a matching index
+        cursor: Cursor from product_cursor of the last product of the previous page
+        as_rows: Return rows with the PRODUCT_ROW_COLUMNS instead of Products objects
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another sort mode
+    """
+    query = db.query(*PRODUCT_ROW_COLUMNS) if as_rows else db.query(Products)
 
     filters = []
 
@@ -35,11 +124,64 @@ def get_products(
     if filters:
         query = query.filter(and_(*filters))
 
-    return query.offset(skip).limit(limit).all()
+    columns, descending = PRODUCT_SORTS[sort]
+    order_by = [column.desc() if descending else column.asc() for column in columns]
+    if sort in PRICE_SORTS:
+        order_by[0] = order_by[0].nulls_last()
+
+    if cursor is None:
+        return query.order_by(*order_by).offset(skip).limit(limit).all()
+
+    after = decode_product_cursor(cursor, sort)
+    if sort in PRICE_SORTS and after[0] is None:
+        return _get_unpriced_products(query, after[-1], descending, limit)
+
+    keyset = tuple_(*columns) < tuple_(*after) if descending else tuple_(*columns) > tuple_(*after)
+    if sort not in PRICE_SORTS:
+        return query.filter(keyset).order_by(*order_by).limit(limit).all()
+
+    products = query.filter(Products.min_price.isnot(None), keyset).order_by(*order_by).limit(limit).all()
+    if len(products) < limit:
+        products += _get_unpriced_products(query, None, descending, limit - len(products))
+    return products
+
+def _get_unpriced_products(query: Query, after_id: Optional[int], descending: bool, limit: int) -> List[Products]:
+    query = query.filter(Products.min_price.is_(None))
+    if after_id is not None:
+        query = query.filter(Products.id < after_id if descending else Products.id > after_id)
+    return query.order_by(Products.id.desc() if descending else Products.id.asc()).limit(limit).all()
 
 def get_product_by_id(db: Session, product_id: int) -> Optional[Products]:
     return db.query(Products).filter(Products.id == product_id).first()
 
+def search_products(db: Session, query: str, limit: int = 20, as_rows: bool = False) -> List[Products]:
+    """
+    Ranked, typo and accent tolerant search over name, edition and description.
+
+    Args:
+        db: Database session
+        query: Free text query
+        limit: Maximum number of products returned
+        as_rows: Return rows with the PRODUCT_ROW_COLUMNS instead of Products objects
+
+    Returns:
+        Products ordered from best to worst match
+    """
+    index = get_search_index()
+    index.sync(db)
+    product_ids = [product_id for product_id, _ in index.search(query, limit=limit)]
+    return get_products_by_ids(db, product_ids, as_rows=as_rows)
+
+def get_products_by_ids(db: Session, product_ids: List[int], as_rows: bool = False) -> List[Products]:
+    """
+    Products in the order of product_ids, skipping the ids that don't exist
+    """
+    if not product_ids:
+        return []
+    products = db.query(*PRODUCT_ROW_COLUMNS) if as_rows else db.query(Products)
+    by_id = {product.id: product for product in products.filter(Products.id.in_(product_ids))}
+    return [by_id[product_id] for product_id in product_ids if product_id in by_id]
+
 def create_product(
     db: Session,
     name: str,
@@ -54,6 +196,8 @@ def create_product(
 ) -> Products:
     db_product = Products(
         name=name,
+        product_key=make_product_key(name, game, product_type, edition),
+        match_key=make_match_key(name, game, product_type, edition),
         img_url=img_url,
         min_price=min_price,
         game=game,
@@ -64,35 +208,195 @@ def create_product(
         product_type=product_type
     )
     db.add(db_product)
+    bump_catalog_version(db)
     db.commit()
     db.refresh(db_product)
+    get_search_index().add([db_product])
+    invalidate_listings()
     return db_product
 
 
 def create_products_bulk(
     db: Session,
-    products: List[Products]
-) -> List[Products]:
-    db_products = []
-    
-    for product in products:
-        db_product = Products(
-            name=product.name,
-            img_url=product.img_url,
-            min_price=product.min_price,
-            game=product.game,
-            edition=product.edition,
-            language=product.language,
-            description=product.description,
-            condition=product.condition,
-            product_type=product.product_type
-        )
-        db_products.append(db_product)
-    
-    db.add_all(db_products)
+    products: Iterable[Any],
+    chunk_size: int = PRODUCT_BULK_CHUNK_SIZE,
+    as_rows: bool = False
+) -> List[Any]:
+    """
+    Creates or updates products by product_key with
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING, one transaction per chunk.
+
+    Each chunk is its own transaction and no ORM objects are built or kept,
+    so memory only grows with the returned rows or ids; a failed run can be retried
+    since writing the same products again changes nothing. Within a chunk
+    a repeated key is written once, with the last values. updated_at only
+    moves when a written column actually changes, so the product's ETag
+    changes with it.
+
+    Args:
+        db: Database session
+        products: Objects with the ProductCreate fields
+        chunk_size: Number of products per statement
+        as_rows: Return rows with the PRODUCT_ROW_COLUMNS instead of ids
+
+    Returns:
+        Product ids or rows, one per distinct key of each chunk
+    """
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    # Built once and executed with a list of rows, so the statement compiles
+    # once and the driver batches the rows into multi-row VALUES
+    stmt = dialect_insert(Products)
+    img_url = func.coalesce(stmt.excluded.img_url, Products.img_url)
+    changed = or_(
+        *(getattr(Products, column).is_distinct_from(stmt.excluded[column]) for column in PRODUCT_UPSERT_COLUMNS),
+        Products.img_url.is_distinct_from(img_url)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Products.product_key],
+        set_={
+            **{column: stmt.excluded[column] for column in PRODUCT_UPSERT_COLUMNS},
+            "img_url": img_url,
+            "updated_at": case((changed, stmt.excluded.updated_at), else_=Products.updated_at),
+        }
+    )
+    if as_rows:
+        stmt = stmt.returning(*PRODUCT_ROW_COLUMNS, Products.product_key)
+    else:
+        stmt = stmt.returning(Products.id, Products.product_key, Products.name, Products.edition, Products.description)
+    products = iter(products)
+    written = []
+    while chunk := list(islice(products, chunk_size)):
+        now = datetime.now(timezone.utc)
+        rows: Dict[str, dict] = {}
+        for product in chunk:
+            key = make_product_key(product.name, product.game, product.product_type, product.edition)
+            rows[key] = {
+                "product_key": key,
+                "match_key": make_match_key(product.name, product.game, product.product_type, product.edition),
+                "name": product.name,
+                "img_url": product.img_url,
+                "min_price": product.min_price,
+                "game": product.game,
+                "edition": product.edition,
+                "language": product.language,
+                "description": product.description,
+                "condition": product.condition,
+                "product_type": product.product_type,
+                "updated_at": now,
+            }
+        by_key = {row.product_key: row for row in db.execute(stmt, list(rows.values()))}
+        bump_catalog_version(db)
+        db.commit()
+
+        get_search_index().add(by_key.values())
+        ids = [by_key[key].id for key in rows]
+        invalidate_products(ids, listed=True)
+        written.extend([by_key[key] for key in rows] if as_rows else ids)
+    invalidate_listings()
+    return written
+
+def get_product_ids_by_keys(db: Session, keys: Sequence[str]) -> Dict[str, int]:
+    if not keys:
+        return {}
+    return dict(db.execute(select(Products.product_key, Products.id).where(Products.product_key.in_(keys))).all())
+
+def get_product_ids_by_match_keys(db: Session, keys: Sequence[str]) -> Dict[str, int]:
+    """
+    Resolves match keys to the oldest product sharing each of them
+    """
+    if not keys:
+        return {}
+    rows = db.execute(
+        select(Products.match_key, Products.id)
+        .where(Products.match_key.in_(keys))
+        .order_by(Products.id)
+    ).all()
+    product_ids = {}
+    for key, product_id in rows:
+        product_ids.setdefault(key, product_id)
+    return product_ids
+
+def update_product_img_url(db: Session, product_id: int, img_url: str) -> None:
+    db.query(Products).filter(Products.id == product_id).update({Products.img_url: img_url})
+    bump_catalog_version(db)
     db.commit()
-    
-    for product in db_products:
-        db.refresh(product)
-    
-    return db_products
\ No newline at end of file
+    invalidate_products([product_id], listed=True)
+
+def refresh_product_offers(db: Session, product_ids: Optional[List[int]] = None) -> int:
+    """
+    Recomputes min_price and offer_count from the current offers, without committing.
+
+    Args:
+        db: Database session
+        product_ids: Products touched by a write; the whole catalog when None
+
+    Returns:
+        Number of products whose aggregates changed
+    """
+    now = datetime.now(timezone.utc)
+    offers = [CurrentPrices.product_id == Products.id]
+    if OFFER_MAX_AGE_DAYS:
+        offers.append(CurrentPrices.last_seen_at >= now - timedelta(days=OFFER_MAX_AGE_DAYS))
+    min_price = select(func.min(CurrentPrices.price)).where(*offers).scalar_subquery()
+    offer_count = select(func.count()).select_from(CurrentPrices).where(*offers).scalar_subquery()
+
+    stmt = (
+        update(Products)
+        .where(or_(Products.min_price.is_distinct_from(min_price), Products.offer_count != offer_count))
+        .values(min_price=min_price, offer_count=offer_count, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if product_ids is not None:
+        if not product_ids:
+            return 0
+        stmt = stmt.where(Products.id.in_(product_ids))
+    count = db.execute(stmt).rowcount
+    if count:
+        bump_catalog_version(db)
+    return count
+
+def bump_catalog_version(db: Session) -> None:
+    """
+    Increments the catalog version, without committing.
+
+    Call it last before committing: the row stays locked until the commit.
+    """
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(CatalogVersion).values(id=1, version=1)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CatalogVersion.id],
+            set_={"version": CatalogVersion.version + 1}
+        )
+    )
+
+def get_catalog_version(db: Session) -> int:
+    return db.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1)).scalar() or 0
+
+def get_product_version(db: Session, product_id: int) -> Optional[str]:
+    """
+    Digest of everything the product detail shows, from index lookups only.
+
+    Price rows only get higher ids and current_prices.last_seen_at only moves
+    forward, so their count, max price id and max last_seen_at change whenever
+    the offers change. Comments are only ever added, so comment_count covers them.
+
+    Returns:
+        Hex digest, None if the product does not exist
+    """
+    current = CurrentPrices.product_id == product_id
+    row = db.execute(
+        select(
+            Products.min_price,
+            Products.offer_count,
+            Products.img_url,
+            Products.updated_at,
+            Products.comment_count,
+            select(func.count()).select_from(CurrentPrices).where(current).scalar_subquery(),
+            select(func.max(CurrentPrices.price_id)).where(current).scalar_subquery(),
+            select(func.max(CurrentPrices.last_seen_at)).where(current).scalar_subquery(),
+        ).where(Products.id == product_id)
+    ).first()
+    if row is None:
+        return None
+    return hashlib.sha1("|".join(map(str, row)).encode()).hexdigest()
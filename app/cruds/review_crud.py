@@ -1,20 +1,51 @@
+from sqlalchemy import and_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from app.models.models import Reviews
-from typing import Optional
+from app.models.models import Reviews, Stores
+from app.utils.dates import utcnow
+from typing import Optional, Tuple
 
-def create_review(db: Session, user: str, store_id: int, rating: int) -> Reviews:
-    db_review = Reviews(
-        user=user,
-        store_id=store_id,
-        rating=rating
-    )
-    db.add(db_review)
+def upsert_review(db: Session, user: str, store_id: int, rating: int) -> Tuple[Reviews, bool]:
+    """
+    Creates the user's review of the store, or replaces its rating, and
+    applies the difference to the store's rating_count and rating_sum in
+    the same transaction.
+
+    Returns:
+        The review and whether it was created
+    """
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    review_id = db.execute(
+        dialect_insert(Reviews)
+        .values(user=user, store_id=store_id, rating=rating, date=utcnow())
+        .on_conflict_do_nothing(index_elements=[Reviews.store_id, Reviews.user])
+        .returning(Reviews.id)
+    ).scalar()
+    created = review_id is not None
+
+    if created:
+        count_delta, sum_delta = 1, rating
+    else:
+        # Locked until the commit, so concurrent updates apply their deltas in turn
+        review_id, previous_rating = db.execute(
+            select(Reviews.id, Reviews.rating)
+            .where(Reviews.store_id == store_id, Reviews.user == user)
+            .with_for_update()
+        ).one()
+        db.execute(update(Reviews).where(Reviews.id == review_id).values(rating=rating, date=utcnow()))
+        count_delta, sum_delta = 0, rating - previous_rating
+
+    if count_delta or sum_delta:
+        db.execute(
+            update(Stores)
+            .where(Stores.id == store_id)
+            .values(rating_count=Stores.rating_count + count_delta, rating_sum=Stores.rating_sum + sum_delta)
+        )
     db.commit()
-    db.refresh(db_review)
-    return db_review
+    return db.get(Reviews, review_id, populate_existing=True), created
 
 def get_all_reviews_by_store_id(db: Session, store_id: int) -> list[Reviews]:
     return db.query(Reviews).filter(Reviews.store_id == store_id).all()
 
 def get_one_review(db: Session, store_id: int, user: str) -> Optional[Reviews]:
-    return db.query(Reviews).filter(Reviews.store_id == store_id and Reviews.user == user).first()
\ No newline at end of file
+    return db.query(Reviews).filter(and_(Reviews.store_id == store_id, Reviews.user == user)).first()
\ No newline at end of file
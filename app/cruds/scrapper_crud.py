@@ -0,0 +1,343 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.cache.response_cache import invalidate_listings, invalidate_products
+from app.models.models import Stores, Products, ProductMatchCandidates
+from app.cruds.price_crud import record_price_observations
+from app.cruds.product_crud import (
+    bump_catalog_version,
+    get_product_ids_by_keys,
+    get_product_ids_by_match_keys,
+    refresh_product_offers,
+)
+from app.schema.scrapper_schemas import ScrapperItem, IngestionResult, PendingImage
+from app.search.matching import ProductMatcher, match_key_scope
+from app.utils.parsing import make_match_key, make_product_key, map_game_to_enum, map_product_type_to_enum, extract_base_url
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def get_store_ids_by_names(db: Session, names: Sequence[str]) -> Dict[str, int]:
+    if not names:
+        return {}
+    rows = db.execute(
+        select(Stores.name, Stores.id).where(Stores.name.in_(names)).order_by(Stores.id)
+    ).all()
+    store_ids = {}
+    for name, store_id in rows:
+        store_ids.setdefault(name, store_id)
+    return store_ids
+
+def get_or_create_store_ids(db: Session, website_urls: Dict[str, str]) -> Dict[str, int]:
+    """
+    Resolves store names to ids, inserting the missing stores in one statement.
+
+    Args:
+        db: Database session
+        website_urls: Store name -> website url used if the store has to be created
+
+    Returns:
+        Dict mapping every requested store name to its id
+    """
+    store_ids = get_store_ids_by_names(db, list(website_urls))
+    missing = [
+        {"name": name, "website_url": url}
+        for name, url in website_urls.items()
+        if name not in store_ids
+    ]
+    if missing:
+        created = db.execute(
+            insert(Stores).returning(Stores.name, Stores.id, sort_by_parameter_order=True),
+            missing
+        ).all()
+        store_ids.update({name: store_id for name, store_id in created})
+    return store_ids
+
+def load_match_keys(db: Session, matcher: ProductMatcher, scopes: Iterable[str]) -> None:
+    """
+    Adds the match keys of every product of the scopes ("game/product_type")
+    the matcher has not loaded yet, so near-duplicates are looked up in memory
+    for the rest of the batch
+    """
+    scopes = sorted(set(scopes) - matcher.loaded_scopes)
+    if not scopes:
+        return
+    pairs = [scope.split("/", 1) for scope in scopes]
+    rows = db.execute(
+        select(Products.match_key, Products.id)
+        .where(
+            or_(*(and_(Products.game == game, Products.product_type == product_type) for game, product_type in pairs)),
+            Products.match_key.is_not(None)
+        )
+        .order_by(Products.id)
+    )
+    matcher.add_all(rows)
+    matcher.loaded_scopes.update(scopes)
+
+def record_match_candidates(db: Session, candidates: Sequence[dict]) -> None:
+    """
+    Stores near-duplicate product pairs for review; a pair already stored is kept as is
+
+    Args:
+        db: Database session
+        candidates: Dicts with product_id, candidate_id and score
+    """
+    if not candidates:
+        return
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    db.execute(
+        dialect_insert(ProductMatchCandidates)
+        .on_conflict_do_nothing(index_elements=[ProductMatchCandidates.product_id, ProductMatchCandidates.candidate_id]),
+        list(candidates)
+    )
+
+def get_match_candidates(db: Session, limit: int = 100) -> List[tuple]:
+    """
+    Newest near-duplicate pairs with the names of both products
+
+    Returns:
+        Rows of (product_id, product_name, candidate_id, candidate_name, score, created_at)
+    """
+    product = aliased(Products)
+    candidate = aliased(Products)
+    return db.execute(
+        select(
+            ProductMatchCandidates.product_id,
+            product.name,
+            ProductMatchCandidates.candidate_id,
+            candidate.name,
+            ProductMatchCandidates.score,
+            ProductMatchCandidates.created_at
+        )
+        .join(product, product.id == ProductMatchCandidates.product_id)
+        .join(candidate, candidate.id == ProductMatchCandidates.candidate_id)
+        .order_by(ProductMatchCandidates.id.desc())
+        .limit(limit)
+    ).all()
+
+def create_products_from_items(db: Session, items: Dict[str, ScrapperItem]) -> Dict[str, int]:
+    """
+    Inserts one product per item in a single statement.
+
+    Products are created without img_url; the image stage fills it in later.
+    A key inserted meanwhile by another transaction is skipped.
+
+    Args:
+        db: Database session
+        items: Items whose products do not exist yet, by match key
+
+    Returns:
+        Dict mapping match key to the new product id
+    """
+    if not items:
+        return {}
+    match_keys = {}
+    rows = []
+    for key, item in items.items():
+        product_key = make_product_key(
+            item.name, map_game_to_enum(item.game), map_product_type_to_enum(item.product_type)
+        )
+        match_keys[product_key] = key
+        rows.append({
+            "product_key": product_key,
+            "match_key": key,
+            "name": item.name,
+            "game": map_game_to_enum(item.game).value,
+            "product_type": map_product_type_to_enum(item.product_type).value,
+            "min_price": item.min_price,
+            "language": item.language,
+            "description": item.description,
+        })
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    created = db.execute(
+        dialect_insert(Products)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=[Products.product_key])
+        .returning(Products.product_key, Products.id)
+    ).all()
+    return {match_keys[product_key]: product_id for product_key, product_id in created}
+
+def ingest_chunk(
+    db: Session,
+    items: Sequence[ScrapperItem],
+    result: IngestionResult,
+    matcher: Optional[ProductMatcher] = None,
+    observation_keys: Optional[Sequence[str]] = None
+) -> Tuple[List[int], bool]:
+    """
+    Writes one chunk of scrapper items (stores, products and prices) in a single transaction.
+
+    Items are matched to products by exact match key: first the keys already
+    in the matcher, then one query for the other keys. Items left over create
+    one product per key; when such a key is a near-duplicate of a known one
+    (same game, product type and distinguishing tokens) the pair is stored in
+    product_match_candidates for review instead of being merged.
+
+    Args:
+        db: Database session
+        items: Items to write
+        result: IngestionResult updated with the processed count and the images
+            of the products created by this chunk
+        matcher: Match keys resolved by the previous chunks of the job
+        observation_keys: observation_key of the price of each item, if any
+
+    Returns:
+        Ids of the products whose prices were written, and whether any product was created
+    """
+    matcher = matcher if matcher is not None else ProductMatcher()
+    website_urls = {}
+    for item in items:
+        website_urls.setdefault(item.store, extract_base_url(item.url))
+    store_ids = get_or_create_store_ids(db, website_urls)
+
+    # Items are told apart by name, game and product type, not by name alone
+    item_keys = {}
+    key_items = {}
+    for item in items:
+        identity = (item.name, item.game, item.product_type)
+        if identity not in item_keys:
+            key = make_match_key(item.name, map_game_to_enum(item.game), map_product_type_to_enum(item.product_type))
+            item_keys[identity] = key
+            key_items.setdefault(key, item)
+    # Always asked for: the matcher may outlive products created meanwhile by another job
+    lookup = [key for key in key_items if key not in matcher]
+    matcher.add_all(get_product_ids_by_match_keys(db, lookup).items())
+    unresolved = [key for key in key_items if key not in matcher]
+    load_match_keys(db, matcher, {match_key_scope(key) for key in unresolved})
+
+    # Only an exact key shares a product: a near-duplicate of a known product,
+    # or of an earlier item, gets its own and is listed for review
+    similar = {}
+    new_items = {}
+    for key in unresolved:
+        found = matcher.find_similar(key)
+        if found is not None:
+            similar[key] = found
+        matcher.add(key)
+        new_items[key] = key_items[key]
+    created = create_products_from_items(db, new_items)
+    matcher.add_all(created.items())
+    # Lost to another transaction, or an existing product with another match key
+    product_keys = {
+        make_product_key(
+            item.name, map_game_to_enum(item.game), map_product_type_to_enum(item.product_type)
+        ): key
+        for key, item in new_items.items()
+        if key not in created
+    }
+    matcher.add_all(
+        (product_keys[product_key], product_id)
+        for product_key, product_id in get_product_ids_by_keys(db, list(product_keys)).items()
+    )
+    product_ids = {identity: matcher.get(key) for identity, key in item_keys.items()}
+    record_match_candidates(db, [
+        {"product_id": matcher.get(key), "candidate_id": matcher.get(found), "score": score}
+        for key, (found, score) in similar.items()
+        if matcher.get(key) != matcher.get(found)
+    ])
+
+    prices = [
+        {
+            "product_id": product_ids[(item.name, item.game, item.product_type)],
+            "store_id": store_ids[item.store],
+            "price": item.price,
+            "url": item.url,
+            "observation_key": observation_keys[index] if observation_keys else None
+        }
+        for index, item in enumerate(items)
+    ]
+    record_price_observations(db, prices)
+    touched = sorted(set(product_ids.values()))
+    refresh_product_offers(db, touched)
+    if created:
+        bump_catalog_version(db)
+
+    result.processed_count += len(prices)
+    result.pending_images.extend(
+        PendingImage(product_id=product_id, name=new_items[key].name, game=new_items[key].game, img_url=new_items[key].img_url)
+        for key, product_id in created.items()
+        if new_items[key].img_url
+    )
+    return touched, bool(created)
+
+def write_chunk(
+    db: Session,
+    items: Sequence[ScrapperItem],
+    result: IngestionResult,
+    matcher: ProductMatcher,
+    observation_keys: Optional[Sequence[str]] = None
+) -> Optional[Tuple[str, str]]:
+    """
+    Writes and commits one chunk, or rolls it back
+
+    Returns:
+        None on success, else the kind of error and its message
+    """
+    chunk_result = IngestionResult()
+    try:
+        touched, created = ingest_chunk(db, items, chunk_result, matcher, observation_keys)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        # May hold ids of products the rollback removed
+        matcher.clear()
+        return "DB error", str(e)
+    except Exception as e:
+        db.rollback()
+        matcher.clear()
+        return "Error", str(e)
+    result.processed_count += chunk_result.processed_count
+    result.pending_images.extend(chunk_result.pending_images)
+    invalidate_products(touched, listed=True, prices=True)
+    if created:
+        invalidate_listings()
+    return None
+
+def ingest_scrapper_items(
+    db: Session,
+    items: Sequence[ScrapperItem],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    matcher: Optional[ProductMatcher] = None,
+    source: Optional[str] = None
+) -> IngestionResult:
+    """
+    Ingests scrapper items with set-based queries, committing once per chunk.
+
+    A chunk that fails is rolled back and its items are written again one per
+    transaction, so only the items that fail on their own are reported as
+    errors; the remaining chunks are still processed. The match keys resolved
+    by one chunk are reused by the next ones.
+
+    Args:
+        db: Database session
+        items: Items to ingest
+        chunk_size: Number of items written per transaction
+        matcher: Match keys resolved by earlier calls for the same job, updated in place
+        source: Identifies this batch of items, e.g. "job:12:3" for chunk 3 of
+            job 12; its prices are keyed "<source>:<index>", so ingesting the
+            same batch again doesn't write them twice
+
+    Returns:
+        IngestionResult with the processed count, per-item errors and the
+        images still to be fetched for newly created products
+    """
+    result = IngestionResult(total_items=len(items))
+    matcher = matcher if matcher is not None else ProductMatcher()
+    keys = [f"{source}:{index}" for index in range(len(items))] if source else None
+
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start:start + chunk_size]
+        chunk_keys = keys[start:start + chunk_size] if keys else None
+        if write_chunk(db, chunk, result, matcher, chunk_keys) is None:
+            continue
+        # One transaction per item, so a bad row only fails itself
+        for index, item in enumerate(chunk):
+            error = write_chunk(db, [item], result, matcher, [chunk_keys[index]] if chunk_keys else None)
+            if error is not None:
+                kind, message = error
+                result.errors.append(f"{kind} for item '{item.name}': {message}")
+
+    return result
@@ -1,4 +1,6 @@
+from sqlalchemy import Row, select
 from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
 from app.models.models import Stores
 
 def create_store(db: Session, name: str, website_url: str) -> Stores:
@@ -7,3 +9,19 @@ def create_store(db: Session, name: str, website_url: str) -> Stores:
     db.commit()
     db.refresh(db_store)
     return db_store
+
+def get_store_by_id(db: Session, store_id: int) -> Optional[Stores]:
+    return db.query(Stores).filter(Stores.id == store_id).first()
+
+def get_store_rating(db: Session, store_id: int) -> Optional[Row]:
+    """
+    Review count and rating sum of a store, None if the store doesn't exist
+    """
+    return db.execute(
+        select(Stores.id, Stores.rating_count, Stores.rating_sum).where(Stores.id == store_id)
+    ).first()
+
+def get_stores_by_ids(db: Session, store_ids: List[int]) -> Dict[int, Stores]:
+    if not store_ids:
+        return {}
+    return {store.id: store for store in db.query(Stores).filter(Stores.id.in_(store_ids)).all()}
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import httpx
+
+AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
+AUTH0_CLIENT_ID = os.getenv("AUTH0_CLIENT_ID")
+AUTH0_CLIENT_SECRET = os.getenv("AUTH0_CLIENT_SECRET")
+AUTH0_AUDIENCE = os.getenv("AUTH0_AUDIENCE")
+AUTH0_TIMEOUT = float(os.getenv("AUTH0_TIMEOUT", "10"))
+AUTH0_MAX_CONNECTIONS = int(os.getenv("AUTH0_MAX_CONNECTIONS", "20"))
+# The management token is renewed this many seconds before it expires
+MANAGEMENT_TOKEN_MARGIN = 60
+DATABASE_CONNECTION = "Username-Password-Authentication"
+
+
+class Auth0Error(Exception):
+    def __init__(self, status_code: int, detail: Any):
+        """
+        Auth0 rejected a request (status_code 400) or could not be reached (503)
+        """
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class Auth0Client:
+    def __init__(
+        self,
+        base_url: str,
+        client_id: Optional[str],
+        client_secret: Optional[str],
+        audience: Optional[str] = None,
+        timeout: float = AUTH0_TIMEOUT,
+        max_connections: int = AUTH0_MAX_CONNECTIONS
+    ):
+        """
+        Async Auth0 Authentication and Management API client
+
+        Keeps one pooled HTTP client for the running event loop, closing the
+        previous one when the loop changes, and reuses the management token
+        until MANAGEMENT_TOKEN_MARGIN seconds before it expires.
+
+        Args:
+            base_url: Tenant URL, e.g. https://tenant.auth0.com
+            client_id: Application client id
+            client_secret: Application client secret
+            audience: API audience of the login access tokens
+            timeout: Seconds before a request to Auth0 is abandoned
+            max_connections: Size of the connection pool
+        """
+        self.base_url = base_url.rstrip("/")
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.audience = audience
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.client: Optional[httpx.AsyncClient] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.token_lock: Optional[asyncio.Lock] = None
+        self.management_token: Optional[str] = None
+        self.management_token_expires_at = 0.0
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        # Pooled connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if self.client is None or self.loop is not loop:
+            stale = self.client
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections)
+            )
+            self.loop = loop
+            self.token_lock = asyncio.Lock()
+            if stale is not None:
+                await _close_client(stale)
+        return self.client
+
+    async def _post(self, path: str, json: Dict[str, Any], token: Optional[str] = None) -> httpx.Response:
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        try:
+            client = await self._get_client()
+            return await client.post(path, json=json, headers=headers)
+        except httpx.HTTPError as error:
+            raise Auth0Error(503, f"Auth0 unavailable: {error}")
+
+    async def login(self, email: str, password: str) -> Dict[str, Any]:
+        response = await self._post("/oauth/token", {
+            "grant_type": "http://auth0.com/oauth/grant-type/password-realm",
+            "username": email,
+            "password": password,
+            "audience": self.audience,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "realm": DATABASE_CONNECTION,
+            "scope": "openid profile email"
+        })
+        if response.status_code != 200:
+            raise Auth0Error(400, _body(response))
+        return response.json()
+
+    async def get_management_token(self, renew: bool = False) -> str:
+        """
+        Cached client-credentials token for the Management API, fetched by one request at a time
+        """
+        await self._get_client()
+        async with self.token_lock:
+            if renew or not self.management_token or time.monotonic() >= self.management_token_expires_at:
+                response = await self._post("/oauth/token", {
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "audience": f"{self.base_url}/api/v2/",
+                    "grant_type": "client_credentials"
+                })
+                if response.status_code != 200:
+                    raise Auth0Error(400, _body(response))
+                body = response.json()
+                self.management_token = body["access_token"]
+                self.management_token_expires_at = (
+                    time.monotonic() + float(body.get("expires_in", 86400)) - MANAGEMENT_TOKEN_MARGIN
+                )
+            return self.management_token
+
+    async def create_user(self, email: str, password: str) -> Dict[str, Any]:
+        user = {"email": email, "password": password, "connection": DATABASE_CONNECTION}
+        response = await self._post("/api/v2/users", user, token=await self.get_management_token())
+        if response.status_code == 401:
+            # Revoked or rotated before its expiry: renew once
+            token = await self.get_management_token(renew=True)
+            response = await self._post("/api/v2/users", user, token=token)
+        if response.status_code != 201:
+            raise Auth0Error(400, _body(response))
+        return response.json()
+
+    async def aclose(self) -> None:
+        if self.client is not None:
+            await _close_client(self.client)
+            self.client = None
+
+
+async def _close_client(client: httpx.AsyncClient) -> None:
+    try:
+        await client.aclose()
+    except RuntimeError:
+        # Opened on an event loop that is already closed, which took the sockets with it
+        pass
+
+
+def _body(response: httpx.Response) -> Any:
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+@lru_cache
+def get_auth0_client() -> Auth0Client:
+    return Auth0Client(
+        f"https://{AUTH0_DOMAIN}",
+        AUTH0_CLIENT_ID,
+        AUTH0_CLIENT_SECRET,
+        audience=AUTH0_AUDIENCE
+    )
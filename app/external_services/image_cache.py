@@ -0,0 +1,178 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.external_services.images import fetch_image, public_image_url
+from app.utils.parsing import sanitize_filename
+
+
+class ImageCache:
+    def __init__(self, index_path: str, max_bytes: int = 2 * 1024 ** 3):
+        """
+        Content-addressed cache in front of the image download/upload path
+
+        A local SQLite index maps each source URL (plus its ETag/Last-Modified)
+        to the SHA-256 of the content and the S3 object key it was stored
+        under. Unchanged images are answered with a conditional GET and are
+        never uploaded twice.
+
+        Args:
+            index_path: Path of the SQLite index file
+            max_bytes: Maximum total size of the cached images; the least recently used are evicted
+        """
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(index_path, check_same_thread=False)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS image_index (
+                source_url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                object_key TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_image_index_last_used ON image_index (last_used)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_image_index_object_key ON image_index (object_key, content_hash)"
+        )
+        self.connection.commit()
+
+    def get(self, source_url: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT etag, last_modified, content_hash, object_key, size FROM image_index WHERE source_url = ?",
+                (source_url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'content_hash': row[2],
+            'object_key': row[3],
+            'size': row[4],
+        }
+
+    def put(
+        self,
+        source_url: str,
+        content_hash: str,
+        object_key: str,
+        size: int,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ) -> None:
+        with self.lock:
+            self.connection.execute(
+                """
+                INSERT INTO image_index (source_url, etag, last_modified, content_hash, object_key, size, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source_url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    content_hash = excluded.content_hash,
+                    object_key = excluded.object_key,
+                    size = excluded.size,
+                    last_used = excluded.last_used
+                """,
+                (source_url, etag, last_modified, content_hash, object_key, size, time.time())
+            )
+            self._evict()
+            self.connection.commit()
+
+    def touch(self, source_url: str) -> None:
+        with self.lock:
+            self.connection.execute(
+                "UPDATE image_index SET last_used = ? WHERE source_url = ?",
+                (time.time(), source_url)
+            )
+            self.connection.commit()
+
+    def is_stored(self, object_key: str, content_hash: str) -> bool:
+        """
+        Checks if any cached URL already stored this content under this key
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM image_index WHERE object_key = ? AND content_hash = ? LIMIT 1",
+                (object_key, content_hash)
+            ).fetchone()
+        return row is not None
+
+    def _evict(self) -> None:
+        total = self.connection.execute("SELECT coalesce(sum(size), 0) FROM image_index").fetchone()[0]
+        if total > self.max_bytes:
+            # Keeps the most recently used entries that fit in max_bytes
+            self.connection.execute(
+                """
+                DELETE FROM image_index WHERE source_url IN (
+                    SELECT source_url FROM (
+                        SELECT source_url, sum(size) OVER (ORDER BY last_used DESC, source_url) AS kept_bytes
+                        FROM image_index
+                    ) WHERE kept_bytes > ?
+                )
+                """,
+                (self.max_bytes,)
+            )
+
+    def upload_img_from_url(self, url: str, filename: str, game_prefix: str, s3_service) -> str:
+        """
+        Cached drop-in for images.upload_img_from_url
+
+        Returns:
+            Public url of the stored image
+        """
+        clean_filename = sanitize_filename(filename)
+        clean_game_prefix = sanitize_filename(game_prefix)
+        if not clean_filename.endswith('.png'):
+            clean_filename += '.png'
+        object_key = f"{clean_game_prefix}/{clean_filename}"
+
+        entry = self.get(url)
+        if entry and entry['object_key'] != object_key:
+            entry = None
+
+        response = fetch_image(
+            url,
+            etag=entry['etag'] if entry else None,
+            last_modified=entry['last_modified'] if entry else None
+        )
+        if response['status'] == 304 and entry:
+            self.touch(url)
+            return public_image_url(object_key)
+
+        image_bytes = response['content']
+        content_hash = hashlib.sha256(image_bytes).hexdigest()
+        already_stored = (
+            (entry is not None and entry['content_hash'] == content_hash)
+            or self.is_stored(object_key, content_hash)
+            or (s3_service.get_image_metadata(object_key) or {}).get('content_sha256') == content_hash
+        )
+        if not already_stored:
+            result = s3_service.upload_from_bytes(
+                image_bytes,
+                clean_filename,
+                clean_game_prefix,
+                metadata={'content_sha256': content_hash}
+            )
+            if not result["success"]:
+                raise Exception(f"S3 upload failed: {result['error']}")
+
+        self.put(
+            url,
+            content_hash,
+            object_key,
+            len(image_bytes),
+            etag=response['etag'],
+            last_modified=response['last_modified']
+        )
+        return public_image_url(object_key)
@@ -0,0 +1,80 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Iterator
+from urllib.parse import urlparse
+
+from app.external_services.images import upload_img_from_url
+
+
+class ImageUploadStage:
+    def __init__(
+        self,
+        s3_service,
+        max_workers: int = 8,
+        max_per_host: int = 2,
+        uploader: Callable[..., str] = upload_img_from_url
+    ):
+        """
+        Downloads images and uploads them to S3 with bounded concurrency
+
+        Args:
+            s3_service: S3ImageService (or anything with upload_from_bytes)
+            max_workers: Maximum number of images in flight overall
+            max_per_host: Maximum number of images in flight per source host
+            uploader: Function (url, filename, game_prefix, s3_service) -> public url
+        """
+        self.s3_service = s3_service
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.uploader = uploader
+
+    def _process(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            url = self.uploader(job['img_url'], job['filename'], job['game_prefix'], self.s3_service)
+            return {'key': job['key'], 'success': True, 'url': url}
+        except Exception as e:
+            return {'key': job['key'], 'success': False, 'error': str(e)}
+
+    def run(self, jobs: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Processes jobs and yields each result as soon as it is done
+
+        Jobs are dicts with 'key', 'img_url', 'filename' and 'game_prefix'.
+        Hosts are served round-robin so a slow CDN only ever holds
+        max_per_host workers while the rest keep draining other hosts.
+
+        Yields:
+            Dict with 'key', 'success' and either 'url' or 'error'
+        """
+        pending_by_host: Dict[str, deque] = {}
+        for job in jobs:
+            host = urlparse(job['img_url']).netloc
+            pending_by_host.setdefault(host, deque()).append(job)
+
+        hosts = deque(pending_by_host)
+        in_flight_by_host = {host: 0 for host in pending_by_host}
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while hosts or in_flight:
+                submitted = True
+                while submitted and hosts and len(in_flight) < self.max_workers:
+                    submitted = False
+                    for _ in range(len(hosts)):
+                        if not hosts or len(in_flight) >= self.max_workers:
+                            break
+                        host = hosts[0]
+                        hosts.rotate(-1)
+                        if in_flight_by_host[host] >= self.max_per_host:
+                            continue
+                        future = pool.submit(self._process, pending_by_host[host].popleft())
+                        in_flight[future] = host
+                        in_flight_by_host[host] += 1
+                        submitted = True
+                        if not pending_by_host[host]:
+                            hosts.remove(host)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight_by_host[in_flight.pop(future)] -= 1
+                    yield future.result()
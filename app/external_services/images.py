@@ -1,12 +1,26 @@
-from typing import List
+from typing import Any, Dict, List, Optional
 import requests
 import os
 from urllib.parse import urlparse
 from app.utils.parsing import sanitize_filename
 import time
 
+S3_PUBLIC_URL = "https://teodiodocker-images.s3.us-east-2.amazonaws.com"
+
+
+def public_image_url(object_key: str) -> str:
+    return f"{S3_PUBLIC_URL}/{object_key}"
 
 def download_image_bytes(url: str) -> bytes:
+    return fetch_image(url)['content']
+
+def fetch_image(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Downloads an image, optionally as a conditional GET
+
+    Returns:
+        Dict with 'status' (200 or 304), 'content' (None on 304), 'etag' and 'last_modified'
+    """
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
@@ -15,6 +29,10 @@ def download_image_bytes(url: str) -> bytes:
         'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1',
     }
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
     
     max_retries = 3
     retry_delay = 1
@@ -29,7 +47,12 @@ def download_image_bytes(url: str) -> bytes:
                 verify=True
             )
             response.raise_for_status()
-            return response.content
+            return {
+                'status': response.status_code,
+                'content': None if response.status_code == 304 else response.content,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
             
         except requests.exceptions.Timeout:
             if attempt < max_retries - 1:
@@ -75,7 +98,7 @@ def upload_img_from_url(url: str, filename: str, game_prefix: str,s3_service) ->
         result = s3_service.upload_from_bytes(image_bytes, clean_filename, clean_game_prefix)
         if not result["success"]:
             raise Exception(f"S3 upload failed: {result['error']}")
-        return f"https://teodiodocker-images.s3.us-east-2.amazonaws.com/{result['object_key']}"
+        return public_image_url(result['object_key'])
     except Exception as e:
         print(f"Failed to process image from {url}: {str(e)}")
         raise
\ No newline at end of file
@@ -0,0 +1,265 @@
+import uuid
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.models import ScrapperJobs, ScrapperJobChunks
+from app.utils.dates import as_utc, utcnow
+
+JOB_RECEIVING = "receiving"
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobLostError(Exception):
+    """
+    The job was reclaimed by another worker after its heartbeat went stale
+    """
+
+
+class JobQueue(ABC):
+    """
+    Backend interface for scrapper batch jobs
+
+    A job is created, filled with chunks of raw item dicts, then sealed so
+    workers can claim it. Workers consume the chunks in order and record
+    progress after each one, so a job can be resumed by another worker.
+    A claim returns a token the worker passes to heartbeat, record_chunk,
+    release and finish; once the job is claimed again the old token is refused.
+    """
+
+    @abstractmethod
+    def create_job(self) -> int:
+        ...
+
+    @abstractmethod
+    def append_chunk(self, job_id: int, items: List[Dict[str, Any]]) -> None:
+        ...
+
+    @abstractmethod
+    def seal(self, job_id: int) -> None:
+        ...
+
+    @abstractmethod
+    def claim(self) -> Optional[Tuple[int, str]]:
+        ...
+
+    @abstractmethod
+    def heartbeat(self, job_id: int, token: str) -> bool:
+        ...
+
+    @abstractmethod
+    def iter_pending_chunks(self, job_id: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        ...
+
+    @abstractmethod
+    def record_chunk(self, job_id: int, token: str, seq: int, processed_count: int, errors: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    def release(self, job_id: int, token: str) -> None:
+        ...
+
+    @abstractmethod
+    def finish(self, job_id: int, error: Optional[str] = None, token: Optional[str] = None) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        ...
+
+    def enqueue(self, items: List[Dict[str, Any]], chunk_size: int) -> int:
+        job_id = self.create_job()
+        for start in range(0, len(items), chunk_size):
+            self.append_chunk(job_id, items[start:start + chunk_size])
+        self.seal(job_id)
+        return job_id
+
+
+class DatabaseJobQueue(JobQueue):
+    def __init__(self, session_factory: Callable[[], Session], stale_after: float = 300):
+        """
+        Job queue stored in the application database (Postgres or SQLite)
+
+        Args:
+            session_factory: Callable returning a new Session
+            stale_after: Seconds without a heartbeat after which a running job
+                is considered abandoned and can be claimed again
+        """
+        self.session_factory = session_factory
+        self.stale_after = stale_after
+
+    def create_job(self) -> int:
+        with self.session_factory() as db:
+            job = ScrapperJobs(status=JOB_RECEIVING, errors=[], created_at=utcnow())
+            db.add(job)
+            db.commit()
+            return job.id
+
+    def append_chunk(self, job_id: int, items: List[Dict[str, Any]]) -> None:
+        with self.session_factory() as db:
+            job = db.query(ScrapperJobs).filter(ScrapperJobs.id == job_id).with_for_update().one()
+            db.add(ScrapperJobChunks(job_id=job_id, seq=job.chunk_count, items=items))
+            job.chunk_count += 1
+            job.total_items += len(items)
+            db.commit()
+
+    def seal(self, job_id: int) -> None:
+        with self.session_factory() as db:
+            db.execute(
+                update(ScrapperJobs)
+                .where(ScrapperJobs.id == job_id, ScrapperJobs.status == JOB_RECEIVING)
+                .values(status=JOB_QUEUED)
+            )
+            db.commit()
+
+    def claim(self) -> Optional[Tuple[int, str]]:
+        """
+        Claims the oldest queued job, or a running one whose heartbeat is stale
+
+        Returns:
+            (job_id, claim token), None if no job can be claimed
+        """
+        stale_before = utcnow() - timedelta(seconds=self.stale_after)
+        claimable = or_(
+            ScrapperJobs.status == JOB_QUEUED,
+            (ScrapperJobs.status == JOB_RUNNING) & (ScrapperJobs.heartbeat_at < stale_before)
+        )
+        with self.session_factory() as db:
+            while True:
+                job_id = db.execute(
+                    select(ScrapperJobs.id)
+                    .where(claimable)
+                    .order_by(ScrapperJobs.id)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                ).scalar()
+                if job_id is None:
+                    db.rollback()
+                    return None
+
+                now = utcnow()
+                token = uuid.uuid4().hex
+                claimed = db.execute(
+                    update(ScrapperJobs)
+                    .where(ScrapperJobs.id == job_id, claimable)
+                    .values(status=JOB_RUNNING, heartbeat_at=now, claim_token=token)
+                ).rowcount
+                db.execute(
+                    update(ScrapperJobs)
+                    .where(ScrapperJobs.id == job_id, ScrapperJobs.started_at.is_(None))
+                    .values(started_at=now)
+                )
+                db.commit()
+                if claimed:
+                    return job_id, token
+
+    def heartbeat(self, job_id: int, token: str) -> bool:
+        """
+        Keeps a claimed job from going stale
+
+        Returns:
+            bool: False if the job was claimed again or finished meanwhile
+        """
+        with self.session_factory() as db:
+            updated = db.execute(
+                update(ScrapperJobs)
+                .where(ScrapperJobs.id == job_id, ScrapperJobs.claim_token == token, ScrapperJobs.status == JOB_RUNNING)
+                .values(heartbeat_at=utcnow())
+            ).rowcount
+            db.commit()
+            return bool(updated)
+
+    def _locked_job(self, db: Session, job_id: int, token: Optional[str]) -> ScrapperJobs:
+        job = db.query(ScrapperJobs).filter(ScrapperJobs.id == job_id).with_for_update().one()
+        if token is not None and (job.claim_token != token or job.status != JOB_RUNNING):
+            raise JobLostError(f"Job {job_id} was claimed by another worker")
+        return job
+
+    def iter_pending_chunks(self, job_id: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        with self.session_factory() as db:
+            chunks_done = db.execute(
+                select(ScrapperJobs.chunks_done).where(ScrapperJobs.id == job_id)
+            ).scalar_one()
+            seqs = db.execute(
+                select(ScrapperJobChunks.seq)
+                .where(ScrapperJobChunks.job_id == job_id, ScrapperJobChunks.seq >= chunks_done)
+                .order_by(ScrapperJobChunks.seq)
+            ).scalars().all()
+
+        for seq in seqs:
+            with self.session_factory() as db:
+                items = db.execute(
+                    select(ScrapperJobChunks.items)
+                    .where(ScrapperJobChunks.job_id == job_id, ScrapperJobChunks.seq == seq)
+                ).scalar_one()
+            yield seq, items
+
+    def record_chunk(self, job_id: int, token: str, seq: int, processed_count: int, errors: List[str]) -> None:
+        with self.session_factory() as db:
+            job = self._locked_job(db, job_id, token)
+            job.processed_count += processed_count
+            job.error_count += len(errors)
+            if errors:
+                job.errors = job.errors + errors
+            job.chunks_done = seq + 1
+            job.heartbeat_at = utcnow()
+            db.commit()
+
+    def release(self, job_id: int, token: str) -> None:
+        """
+        Puts a claimed job back in the queue, so another worker can resume it
+        right away instead of after its heartbeat goes stale
+        """
+        with self.session_factory() as db:
+            db.execute(
+                update(ScrapperJobs)
+                .where(ScrapperJobs.id == job_id, ScrapperJobs.claim_token == token, ScrapperJobs.status == JOB_RUNNING)
+                .values(status=JOB_QUEUED, claim_token=None, heartbeat_at=None)
+            )
+            db.commit()
+
+    def finish(self, job_id: int, error: Optional[str] = None, token: Optional[str] = None) -> None:
+        # Without a token the job is finished whoever holds it (an interrupted upload)
+        with self.session_factory() as db:
+            job = self._locked_job(db, job_id, token)
+            job.status = JOB_FAILED if error else JOB_DONE
+            job.finished_at = utcnow()
+            if error:
+                job.errors = job.errors + [error]
+                job.error_count += 1
+            db.execute(delete(ScrapperJobChunks).where(ScrapperJobChunks.job_id == job_id))
+            db.commit()
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self.session_factory() as db:
+            job = db.query(ScrapperJobs).filter(ScrapperJobs.id == job_id).first()
+            if not job:
+                return None
+            return job_status(job)
+
+
+def job_status(job: ScrapperJobs) -> Dict[str, Any]:
+    items_per_second = None
+    if job.started_at:
+        end = as_utc(job.finished_at) if job.finished_at else utcnow()
+        elapsed = (end - as_utc(job.started_at)).total_seconds()
+        if elapsed > 0:
+            items_per_second = job.processed_count / elapsed
+    return {
+        "id": job.id,
+        "status": job.status,
+        "total_items": job.total_items,
+        "processed_count": job.processed_count,
+        "error_count": job.error_count,
+        "errors": job.errors,
+        "progress": job.chunks_done / job.chunk_count if job.chunk_count else 0.0,
+        "items_per_second": items_per_second,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
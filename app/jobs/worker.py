@@ -0,0 +1,121 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+from app.jobs.queue import JobLostError, JobQueue
+from app.schema.scrapper_schemas import IngestionResult
+
+# Called with the raw items of one chunk and a dict shared by the chunks of the
+# same job, where "job_id" and "seq" identify the chunk being processed
+ChunkHandler = Callable[[List[Dict[str, Any]], Dict[str, Any]], IngestionResult]
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorkerPool:
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: ChunkHandler,
+        workers: int = 2,
+        poll_interval: float = 1.0,
+        heartbeat_interval: float = 60.0
+    ):
+        """
+        Background threads that claim jobs from a queue and process them chunk by chunk
+
+        Args:
+            queue: Job queue backend
+            handler: Processes one chunk of raw items, given the state dict of its
+                job, and returns its IngestionResult
+            workers: Number of jobs processed in parallel
+            poll_interval: Seconds an idle worker waits before polling the queue again
+            heartbeat_interval: Seconds between heartbeats of a job being processed;
+                well below the queue's stale timeout, since one chunk can take longer
+        """
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stop_event = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        self.stop_event.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"scrapper-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout: float = 10) -> None:
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def _run(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                processed = self.run_once()
+            except Exception:
+                logger.exception("Scrapper worker failed to process a job")
+                processed = False
+            if not processed:
+                self.stop_event.wait(self.poll_interval)
+
+    def _heartbeat(self, job_id: int, token: str, done: threading.Event, lost: threading.Event) -> None:
+        while not done.wait(self.heartbeat_interval):
+            try:
+                if not self.queue.heartbeat(job_id, token):
+                    lost.set()
+                    return
+            except Exception:
+                logger.exception("Heartbeat of scrapper job %d failed", job_id)
+
+    def run_once(self) -> bool:
+        """
+        Claims and processes one job, heartbeating from another thread while it runs
+
+        A job claimed again by another worker (the heartbeat was refused) is
+        dropped without recording or finishing anything. When the pool is
+        stopped, the job is released after the current chunk.
+
+        Returns:
+            bool: True if a job was processed, False if the queue was empty
+        """
+        claimed = self.queue.claim()
+        if claimed is None:
+            return False
+        job_id, token = claimed
+        done, lost = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(job_id, token, done, lost),
+            name=f"scrapper-heartbeat-{job_id}",
+            daemon=True
+        )
+        heartbeat.start()
+        state: Dict[str, Any] = {"job_id": job_id}
+        try:
+            for seq, items in self.queue.iter_pending_chunks(job_id):
+                state["seq"] = seq
+                result = self.handler(items, state)
+                if lost.is_set():
+                    return True
+                self.queue.record_chunk(job_id, token, seq, result.processed_count, result.errors)
+                if self.stop_event.is_set():
+                    self.queue.release(job_id, token)
+                    return True
+            self.queue.finish(job_id, token=token)
+        except JobLostError:
+            pass
+        except Exception as e:
+            try:
+                self.queue.finish(job_id, error=f"Job failed: {str(e)}", token=token)
+            except JobLostError:
+                pass
+        finally:
+            done.set()
+            heartbeat.join()
+        return True
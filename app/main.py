@@ -1,9 +1,14 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Security
 from fastapi.security import HTTPBearer
 from .routers import cards, product_router, price_router, store_router, comment_router, review_router, scrapper_router
 from fastapi.middleware.cors import CORSMiddleware
-from .utils.utils import VerifyToken
+from .utils.utils import get_verify_token
 from app.routers import auth
+from app.external_services.auth0 import get_auth0_client
+from app.cache.response_cache import get_response_cache
+from app.database import SessionLocal
+from app.search.index import get_search_index
 
 token_auth_scheme = HTTPBearer()
 
@@ -15,8 +20,26 @@ origins = [
     "https://te-odio-docker-front.vercel.app",
     "https://te-odio-docker-front-git-main-teodiodockers-projects.vercel.app/"  
 ]
-app = FastAPI()
-verifyToken = VerifyToken()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scrapper_workers = scrapper_router.create_worker_pool()
+    scrapper_workers.start()
+    # Built here rather than at import so cold starts don't pay for it
+    key_store = get_verify_token().key_store
+    key_store.start()
+    search_index = get_search_index()
+    search_index.start(SessionLocal)
+    yield
+    search_index.stop()
+    key_store.stop()
+    scrapper_workers.stop()
+    # Lets the uploads already queued finish
+    scrapper_router.get_image_executor().shutdown(wait=True)
+    scrapper_router.get_image_executor.cache_clear()
+    await get_auth0_client().aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,6 +57,11 @@ app.include_router(store_router.router)
 app.include_router(comment_router.router)
 app.include_router(scrapper_router.router)
 app.include_router(review_router.router)
+
 @app.get("/")
 def read_root():
     return {"msg": "Hello World"}
+
+@app.get("/metrics/cache")
+def cache_metrics():
+    return get_response_cache().stats()
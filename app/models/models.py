@@ -1,5 +1,5 @@
-from datetime import datetime
-from sqlalchemy import Column, DateTime, func
+from datetime import date, datetime, timezone
+from sqlalchemy import JSON, Column, DateTime, Index, func, text
 from pydantic import EmailStr
 from sqlmodel import Field, Relationship, SQLModel
 from typing import List, Optional
@@ -17,19 +17,64 @@ class ProductTypeEnum(str, Enum):
     BUNDLE = "bundle"
     OTHER = "other"
 
+class PriceBucketEnum(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+
+class ProductSortEnum(str, Enum):
+    ID = "id"
+    PRICE_ASC = "price_asc"
+    PRICE_DESC = "price_desc"
+    NAME = "name"
+    UPDATED = "updated"
+
 class Stores(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    name: str = Field(max_length=255, nullable=False)
+    name: str = Field(max_length=255, nullable=False, index=True)
     website_url: str = Field(nullable=False, max_length=255)
+    # Count and sum of the ratings of its reviews, kept up to date by upsert_review
+    rating_count: int = Field(default=0, nullable=False)
+    rating_sum: int = Field(default=0, nullable=False)
 
     prices: List["Prices"] = Relationship(back_populates="store")
     reviews: List["Reviews"] = Relationship(back_populates="store")
 
 class Products(SQLModel, table=True):
+    # One index per ProductSortEnum mode, tie-broken by id for keyset pages.
+    # On Postgres the alembic migration also adds ix_products_name_trgm, a
+    # pg_trgm GIN index serving the ilike('%name%') search
+    __table_args__ = (
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_min_price_id", "min_price", "id"),
+        # SQLite already keeps NULLs last when scanning the index above backwards
+        Index(
+            "ix_products_min_price_desc_id",
+            text("min_price DESC NULLS LAST"),
+            text("id DESC"),
+        ).ddl_if(dialect="postgresql"),
+        Index("ix_products_updated_at_id", text("updated_at DESC"), text("id DESC")),
+        Index("ux_products_product_key", "product_key", unique=True),
+        Index("ix_products_match_key", "match_key"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     name: str = Field(max_length=255, nullable=False)
+    # make_product_key(name, game, product_type, edition), the conflict target of the bulk upserts
+    product_key: str | None = Field(default=None, max_length=300)
+    # make_match_key(name, game, product_type, edition), how ingestion
+    # recognises the product in other stores; not unique
+    match_key: str | None = Field(default=None, max_length=300)
     img_url: str | None = Field(default=None, max_length=255)
     min_price: int | None = Field(default=None)
+    offer_count: int = Field(default=0, nullable=False)
+    # Maintained by create_comment, so the detail doesn't count the comments
+    comment_count: int = Field(default=0, nullable=False)
+    # Set from Python rather than func.now() so SQLite stores the exact value
+    # that keyset cursors hand back
+    updated_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    )
     game: str = Field(max_length=255, nullable=False)
     edition: str | None = Field(default=None, max_length=50)
     language: str | None = Field(default=None, max_length=100)
@@ -41,27 +86,114 @@ class Products(SQLModel, table=True):
     prices: List["Prices"] = Relationship(back_populates="product")
     comments: List["Comments"] = Relationship(back_populates="product")
 
+# Near-duplicate products seen by ingestion (match keys alike but not equal),
+# kept apart and listed for review instead of merged
+class ProductMatchCandidates(SQLModel, table=True):
+    __tablename__ = "product_match_candidates"
+    __table_args__ = (
+        Index("ux_product_match_candidates_pair", "product_id", "candidate_id", unique=True),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    product_id: int = Field(foreign_key="products.id", nullable=False)
+    candidate_id: int = Field(foreign_key="products.id", nullable=False)
+    score: float = Field(nullable=False)
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    )
+
 class Prices(SQLModel, table=True):
+    __table_args__ = (
+        # Latest row per (product, store) and per-product history, newest first
+        Index(
+            "ix_prices_product_id_store_id_scrapped_at",
+            "product_id",
+            "store_id",
+            text("scrapped_at DESC"),
+            postgresql_include=["id", "price"],
+        ),
+        Index("ux_prices_observation_key", "observation_key", unique=True),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     product_id: int = Field(foreign_key="products.id", nullable=False)
     store_id: int = Field(foreign_key="stores.id", nullable=False)
     price: int = Field(nullable=False)
     url: str = Field(max_length=255, nullable=False)
-    scrapped_at: datetime = Field(sa_column=Column(DateTime(timezone=True), default=func.now(), onupdate=func.now()))
+    scrapped_at: datetime = Field(sa_column=Column(DateTime(timezone=True), default=func.now()))
+    last_seen_at: datetime = Field(sa_column=Column(DateTime(timezone=True), default=func.now()))
+    # Scrapper job item the row was written from ("job:<id>:<chunk>:<item>"),
+    # so a chunk processed again doesn't write its prices twice
+    observation_key: str | None = Field(default=None, max_length=64)
 
     product: Optional[Products] = Relationship(back_populates="prices")
     store: Optional[Stores] = Relationship(back_populates="prices")
 
+# Latest price row of every (product, store) pair, written together with prices
+class CurrentPrices(SQLModel, table=True):
+    __tablename__ = "current_prices"
+
+    product_id: int = Field(foreign_key="products.id", primary_key=True)
+    store_id: int = Field(foreign_key="stores.id", primary_key=True)
+    price_id: int = Field(foreign_key="prices.id", nullable=False)
+    price: int = Field(nullable=False)
+    url: str = Field(max_length=255, nullable=False)
+    scrapped_at: datetime = Field(sa_column=Column(DateTime(timezone=True)))
+    last_seen_at: datetime = Field(sa_column=Column(DateTime(timezone=True)))
+
+# Per store, per UTC day price aggregates; avg_price is weighted by the seconds
+# each price row was current during the day (weight_seconds)
+class PriceDailyRollups(SQLModel, table=True):
+    __tablename__ = "price_daily_rollups"
+
+    product_id: int = Field(foreign_key="products.id", primary_key=True)
+    store_id: int = Field(foreign_key="stores.id", primary_key=True)
+    day: date = Field(primary_key=True)
+    min_price: int = Field(nullable=False)
+    max_price: int = Field(nullable=False)
+    avg_price: float = Field(nullable=False)
+    last_price: int = Field(nullable=False)
+    weight_seconds: float = Field(nullable=False)
+
+# Single row (id 1), bumped by every transaction that changes what the
+# product listings show; listing ETags are derived from it
+class CatalogVersion(SQLModel, table=True):
+    __tablename__ = "catalog_version"
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=0, nullable=False)
+
+# Single row (id 1): raw price rows that stopped being current before
+# pruned_before were deleted, only price_daily_rollups covers those days
+class PriceRetention(SQLModel, table=True):
+    __tablename__ = "price_retention"
+
+    id: int = Field(default=1, primary_key=True)
+    pruned_before: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+
+# Listed newest first by keyset pages over (date, id)
 class Comments(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_comments_product_id_date", "product_id", text("date DESC"), text("id DESC")),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     user: str = Field(nullable=False, max_length=255)
     product_id: int = Field(foreign_key="products.id", nullable=False)
     text: str = Field(nullable=False, max_length=500)
-    date: datetime = Field(sa_column=Column(DateTime(timezone=True), default=func.now()))
+    # Set from Python for the same reason as Products.updated_at
+    date: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    )
 
     product: Optional[Products] = Relationship(back_populates="comments")
 
+# One review per user and store; the unique index also serves the lookups by store_id
 class Reviews(SQLModel, table=True):
+    __table_args__ = (
+        Index("ux_reviews_store_id_user", "store_id", "user", unique=True),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     user: str = Field(nullable=False, max_length=255)
     store_id: int = Field(foreign_key="stores.id", nullable=False)
@@ -69,3 +201,33 @@ class Reviews(SQLModel, table=True):
     date: datetime = Field(sa_column=Column(DateTime(timezone=True), default=func.now()))
 
     store: Optional[Stores] = Relationship(back_populates="reviews")
+
+class ScrapperJobs(SQLModel, table=True):
+    __tablename__ = "scrapper_jobs"
+
+    id: int | None = Field(default=None, primary_key=True)
+    status: str = Field(max_length=20, nullable=False, index=True)
+    total_items: int = Field(default=0, nullable=False)
+    processed_count: int = Field(default=0, nullable=False)
+    error_count: int = Field(default=0, nullable=False)
+    chunk_count: int = Field(default=0, nullable=False)
+    chunks_done: int = Field(default=0, nullable=False)
+    errors: List[str] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    started_at: datetime | None = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    heartbeat_at: datetime | None = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    # New on every claim: a worker whose job was reclaimed no longer matches it
+    claim_token: str | None = Field(default=None, max_length=32)
+    finished_at: datetime | None = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+
+    chunks: List["ScrapperJobChunks"] = Relationship(back_populates="job")
+
+class ScrapperJobChunks(SQLModel, table=True):
+    __tablename__ = "scrapper_job_chunks"
+
+    id: int | None = Field(default=None, primary_key=True)
+    job_id: int = Field(foreign_key="scrapper_jobs.id", nullable=False, index=True)
+    seq: int = Field(nullable=False)
+    items: List[dict] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+
+    job: Optional[ScrapperJobs] = Relationship(back_populates="chunks")
@@ -1,47 +1,63 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.schema.comment_schemas import (
     CommentCreate,
     CommentResponse,
-    CommentBase
+    CommentBase,
+    COMMENT_RESPONSE_FIELDS
 )
 from app.cruds.comment_crud import (
+    comment_cursor,
     create_comment,
-    get_all_comments_by_product_id
+    get_comments_by_product_id
 )
 from app.cruds.product_crud import (
     get_product_by_id
 )
 from app.models.models import Comments, Products
 
-from app.database import get_db
+from app.database import get_async_db, get_async_read_db
+from app.utils.fast_json import FastJSONResponse, rows_to_dicts
 
 router = APIRouter(prefix="/comments", tags=["comments"])
 
 @router.get("/{product_id}", response_model=list[CommentResponse])
 async def get_comments(
     product_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None)
 ):
-    product = get_product_by_id(db=db, product_id=product_id)
+    product = await db.run_sync(get_product_by_id, product_id=product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    comments = get_all_comments_by_product_id(db=db, product_id=product_id)
+    try:
+        comments = await db.run_sync(
+            get_comments_by_product_id,
+            product_id=product_id,
+            limit=limit,
+            cursor=cursor,
+            as_rows=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return [CommentResponse.model_validate(comment) for comment in comments]
+    # Newest first; pass X-Next-Cursor back as ?cursor= to get older comments
+    headers = {"X-Next-Cursor": comment_cursor(comments[-1])} if len(comments) == limit else None
+    return FastJSONResponse(rows_to_dicts(comments, COMMENT_RESPONSE_FIELDS), headers=headers)
 
 @router.post("/", response_model=CommentResponse, status_code=201)
 async def create_comment_endpoint(
     comment: CommentCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    product = get_product_by_id(db=db, product_id=comment.product_id)
+    product = await db.run_sync(get_product_by_id, product_id=comment.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    db_comment = create_comment(
-        db=db,
+    db_comment = await db.run_sync(
+        create_comment,
         user=comment.user,
         product_id=comment.product_id,
         text=comment.text
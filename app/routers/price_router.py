@@ -1,35 +1,47 @@
+from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.schema.product_schemas import (
     PriceResponse,
     PriceCreate,
     PriceWithStore,
-    StoreBase
+    PriceHistoryPoint,
+    PriceHistoryResponse,
+    PriceHistorySeries,
+    StoreBase,
+    price_with_store_dicts
 )
 from app.cruds.product_crud import get_product_by_id
-from app.cruds.price_crud import create_price
-from app.models.models import Stores, Prices
+from app.cruds.price_crud import create_price, get_price_rows_with_stores
+from app.cruds.price_history_crud import BUCKET_STEPS, get_price_history
+from app.cruds.store_crud import get_store_by_id, get_stores_by_ids
+from app.models.models import PriceBucketEnum
+from app.utils.dates import as_utc, utcnow
+from app.utils.fast_json import FastJSONResponse
 
-from app.database import get_db
+from app.database import get_async_db, get_async_read_db
 
 router = APIRouter(prefix="/prices", tags=["prices"])
 
+MAX_HISTORY_BUCKETS = 2000
+DEFAULT_HISTORY_DAYS = 30
+
 @router.post("/", response_model=PriceResponse, status_code=201)
 async def create_price_endpoint(
     price: PriceCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    product = get_product_by_id(db=db, product_id=price.product_id)
+    product = await db.run_sync(get_product_by_id, product_id=price.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    store = db.query(Stores).filter(Stores.id == price.store_id).first()
+    store = await db.run_sync(get_store_by_id, store_id=price.store_id)
     if not store:
         raise HTTPException(status_code=404, detail="Store not found")
 
-    db_price = create_price(
-        db=db,
+    db_price = await db.run_sync(
+        create_price,
         product_id=price.product_id,
         store_id=price.store_id,
         price=price.price,
@@ -40,40 +52,77 @@ async def create_price_endpoint(
 @router.get("/product/{product_id}", response_model=List[PriceWithStore])
 async def get_prices_by_product(
     product_id: int,
-    db: Session = Depends(get_db),
-    store_id: Optional[int] = Query(None)
+    db: AsyncSession = Depends(get_async_read_db),
+    store_id: Optional[int] = Query(None),
+    latest_only: bool = Query(False)
 ):
-    product = get_product_by_id(db=db, product_id=product_id)
+    product = await db.run_sync(get_product_by_id, product_id=product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    query = (
-        db.query(Prices, Stores)
-        .join(Stores, Prices.store_id == Stores.id)
-        .filter(Prices.product_id == product_id)
-    )
-
     if store_id:
-        store = db.query(Stores).filter(Stores.id == store_id).first()
+        store = await db.run_sync(get_store_by_id, store_id=store_id)
         if not store:
             raise HTTPException(status_code=404, detail="Store not found")
-        query = query.filter(Prices.store_id == store_id)
 
-    prices_query = query.order_by(Prices.scrapped_at.desc()).all()
+    price_rows = await db.run_sync(
+        get_price_rows_with_stores,
+        product_id=product_id,
+        store_id=store_id,
+        latest_only=latest_only
+    )
+    return FastJSONResponse(price_with_store_dicts(price_rows))
+
+@router.get("/product/{product_id}/history", response_model=PriceHistoryResponse)
+async def get_price_history_endpoint(
+    product_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    bucket: PriceBucketEnum = Query(PriceBucketEnum.DAY),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    store_id: Optional[int] = Query(None)
+):
+    end = as_utc(end) if end else utcnow()
+    start = as_utc(start) if start else end - timedelta(days=DEFAULT_HISTORY_DAYS)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if (end - start) / BUCKET_STEPS[bucket] > MAX_HISTORY_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range exceeds {MAX_HISTORY_BUCKETS} buckets")
+
+    product = await db.run_sync(get_product_by_id, product_id=product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
 
-    prices_with_stores = []
-    for price, store in prices_query:
-        price_with_store = PriceWithStore(
-            id=price.id,
-            price=price.price,
-            url=price.url,
-            scrapped_at=price.scrapped_at,
-            store=StoreBase(
-                id=store.id,
-                name=store.name,
-                website_url=store.website_url
-            )
+    try:
+        stats = await db.run_sync(
+            get_price_history,
+            product_id=product_id,
+            bucket=bucket,
+            start=start,
+            end=end,
+            store_id=store_id
         )
-        prices_with_stores.append(price_with_store)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    stores = await db.run_sync(get_stores_by_ids, store_ids=list({key[0] for key in stats}))
+
+    series = {}
+    for (stats_store_id, bucket_start), point in sorted(stats.items(), key=lambda item: (item[0][0], item[0][1])):
+        store = stores[stats_store_id]
+        series.setdefault(stats_store_id, PriceHistorySeries(
+            store=StoreBase(id=store.id, name=store.name, website_url=store.website_url)
+        )).points.append(PriceHistoryPoint(
+            bucket_start=bucket_start,
+            min_price=point["min"],
+            max_price=point["max"],
+            avg_price=round(point["weighted_sum"] / point["weight"], 2),
+            last_price=point["last"]
+        ))
 
-    return prices_with_stores
+    return PriceHistoryResponse(
+        product_id=product_id,
+        bucket=bucket,
+        start=start,
+        end=end,
+        series=list(series.values())
+    )
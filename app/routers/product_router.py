@@ -1,123 +1,189 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+import os
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 from app.schema.product_schemas import (
+    PRODUCT_RESPONSE_FIELDS,
     ProductResponse, 
+    ProductBulkResponse,
     ProductWithPricesResponse, 
-    PriceWithStore,
-    StoreBase,
-    ProductCreate
+    ProductCreate,
+    price_with_store_dicts
 )
-from app.schema.comment_schemas import CommentResponse
+from app.schema.comment_schemas import COMMENT_RESPONSE_FIELDS
 from app.cruds.product_crud import (
     get_products, 
+    get_catalog_version,
     get_product_by_id,
+    get_product_version,
+    get_products_by_ids,
+    product_cursor,
     create_product,
     create_products_bulk
 )
-from app.cruds.comment_crud import get_all_comments_by_product_id
-from app.models.models import Prices, Stores, GameEnum, ProductTypeEnum
+from app.cruds.comment_crud import comment_cursor, get_comments_by_product_id
+from app.cruds.price_crud import get_price_rows_with_stores
+from app.models.models import GameEnum, ProductTypeEnum, ProductSortEnum
+from app.cache.response_cache import (
+    LISTINGS_TAG,
+    PRICE_LISTINGS_TAG,
+    cache_key,
+    get_response_cache,
+    listed_tag,
+    product_tag
+)
 
-from app.database import get_db
+from app.database import get_async_db, get_async_read_db
+from app.search.index import get_search_index
+from app.utils.etags import etag_matches, make_etag, not_modified
+from app.utils.fast_json import FastJSONResponse, rows_to_dicts
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+# Newest comments embedded in the product detail
+DETAIL_COMMENTS = int(os.getenv("PRODUCT_DETAIL_COMMENTS", "10"))
+
+# Sorts whose order changes when prices are written
+PRICE_DEPENDENT_SORTS = {ProductSortEnum.PRICE_ASC, ProductSortEnum.PRICE_DESC, ProductSortEnum.UPDATED}
+
 @router.get("/", response_model=List[ProductResponse])
 async def get_products_endpoint(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     name: Optional[str] = Query(None),
     min_price: Optional[int] = Query(None),
     max_price: Optional[int] = Query(None),
     game: Optional[GameEnum] = Query(None),
     product_type: Optional[ProductTypeEnum] = Query(None),
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=1000)
+    limit: int = Query(100, ge=1, le=1000),
+    sort: ProductSortEnum = Query(ProductSortEnum.ID),
+    cursor: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None)
 ):
-    products = get_products(
-        db=db,
+    cache = get_response_cache()
+    key = cache_key(
+        "products",
         name=name,
         min_price=min_price,
         max_price=max_price,
         game=game,
         product_type=product_type,
         skip=skip,
-        limit=limit
+        limit=limit,
+        sort=sort,
+        cursor=cursor
     )
+    cached = cache.get(key)
+    if cached is not None and not cache.shared:
+        # A per-process cache misses the invalidations of other workers and
+        # commands, so its hit is only served while the catalog version matches
+        if cached.headers["ETag"] != make_etag(key, await db.run_sync(get_catalog_version)):
+            cached = None
+    if cached is not None:
+        return not_modified(cached.headers["ETag"]) if etag_matches(if_none_match, cached.headers["ETag"]) else cached
+    price_dependent = sort in PRICE_DEPENDENT_SORTS or min_price is not None or max_price is not None
+    versions = cache.snapshot(LISTINGS_TAG, *([PRICE_LISTINGS_TAG] if price_dependent else []))
+
+    etag = make_etag(key, await db.run_sync(get_catalog_version))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    try:
+        products = await db.run_sync(
+            get_products,
+            name=name,
+            min_price=min_price,
+            max_price=max_price,
+            game=game,
+            product_type=product_type,
+            skip=skip,
+            limit=limit,
+            sort=sort,
+            cursor=cursor,
+            as_rows=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Pass X-Next-Cursor back as ?cursor= to get the next page
+    headers = {"ETag": etag}
+    if len(products) == limit:
+        headers["X-Next-Cursor"] = product_cursor(products[-1], sort)
 
-    return [ProductResponse.model_validate(product) for product in products]
+    versions = {**cache.snapshot(*(listed_tag(product.id) for product in products)), **versions}
+    return cache.put(key, rows_to_dicts(products, PRODUCT_RESPONSE_FIELDS), versions, headers)
+
+@router.get("/search", response_model=List[ProductResponse])
+async def search_products_endpoint(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    # The index is synced by its background thread; a request only loads it
+    # when it comes first. Scoring runs in the threadpool
+    index = get_search_index()
+    if not index.loaded:
+        await index.sync_async(db)
+    hits = await run_in_threadpool(index.search, q, limit)
+    products = await db.run_sync(get_products_by_ids, product_ids=[product_id for product_id, _ in hits], as_rows=True)
+    return FastJSONResponse(rows_to_dicts(products, PRODUCT_RESPONSE_FIELDS))
 
 @router.get("/{product_id}", response_model=ProductWithPricesResponse)
 async def get_product_detail(
     product_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db),
+    if_none_match: Optional[str] = Header(None)
 ):
-    product = get_product_by_id(db=db, product_id=product_id)
-    if not product:
+    cache = get_response_cache()
+    key = cache_key("product", product_id=product_id)
+    cached = cache.get(key)
+    if cached is not None and not cache.shared:
+        # Same check as the listings, against the product version
+        if cached.headers["ETag"] != make_etag(key, await db.run_sync(get_product_version, product_id=product_id)):
+            cached = None
+    if cached is not None:
+        return not_modified(cached.headers["ETag"]) if etag_matches(if_none_match, cached.headers["ETag"]) else cached
+    versions = cache.snapshot(product_tag(product_id))
+
+    # Polling clients get their 304 from this one indexed query
+    version = await db.run_sync(get_product_version, product_id=product_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    etag = make_etag(key, version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
-    latest_prices_subquery = (
-        db.query(
-            Prices.store_id,
-            func.max(Prices.scrapped_at).label('max_scrapped_at')
-        )
-        .filter(Prices.product_id == product_id)
-        .group_by(Prices.store_id)
-        .subquery()
-    )
+    product = await db.run_sync(get_product_by_id, product_id=product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
 
-    prices_query = (
-        db.query(Prices, Stores)
-        .join(Stores, Prices.store_id == Stores.id)
-        .join(
-            latest_prices_subquery, 
-            (Prices.store_id == latest_prices_subquery.c.store_id) & 
-            (Prices.scrapped_at == latest_prices_subquery.c.max_scrapped_at)
-        )
-        .filter(Prices.product_id == product_id)
-        .all()
+    price_rows = await db.run_sync(get_price_rows_with_stores, product_id=product_id, latest_only=True)
+    comment_rows = await db.run_sync(
+        get_comments_by_product_id,
+        product_id=product_id,
+        limit=DETAIL_COMMENTS,
+        as_rows=True
     )
-
-    prices_with_stores = []
-    for price, store in prices_query:
-        price_with_store = PriceWithStore(
-            id=price.id,
-            price=price.price,
-            url=price.url,
-            scrapped_at=price.scrapped_at,
-            store=StoreBase(
-                id=store.id,
-                name=store.name,
-                website_url=store.website_url
-            )
+    product_response = {
+        **ProductResponse.model_validate(product).model_dump(),
+        "prices": price_with_store_dicts(price_rows),
+        "comments": rows_to_dicts(comment_rows, COMMENT_RESPONSE_FIELDS),
+        "comment_count": product.comment_count,
+        "next_comments_cursor": (
+            comment_cursor(comment_rows[-1]) if comment_rows and product.comment_count > len(comment_rows) else None
         )
-        prices_with_stores.append(price_with_store)
-    product_comments = get_all_comments_by_product_id(db=db, product_id=product_id)
-    product_comments = [CommentResponse.model_validate(comment) for comment in product_comments]
-    product_response = ProductWithPricesResponse(
-        id=product.id,
-        name=product.name,
-        img_url=product.img_url,
-        min_price=product.min_price,
-        game=product.game,
-        edition=product.edition,
-        language=product.language,
-        description=product.description,
-        condition=product.condition,
-        product_type=product.product_type,
-        prices=prices_with_stores,
-        comments=product_comments
-    )
+    }
 
-    return product_response
+    return cache.put(key, product_response, versions, {"ETag": etag})
 
 @router.post("/", response_model=ProductResponse, status_code=201)
 async def create_product_endpoint(
     product: ProductCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_product = create_product(
-        db=db,
+    db_product = await db.run_sync(
+        create_product,
         name=product.name,
         game=product.game,
         product_type=product.product_type,
@@ -130,10 +196,16 @@ async def create_product_endpoint(
     )
     return ProductResponse.model_validate(db_product)
 
-@router.post("/createAll", response_model=List[ProductResponse], status_code=201)
+@router.post("/createAll", response_model=Union[List[ProductResponse], ProductBulkResponse], status_code=201)
 async def create_products_bulk_endpoint(
     products: List[ProductCreate],
-    db: Session = Depends(get_db)
+    ids_only: bool = Query(False, description="Return only the count and ids instead of the products"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_products = create_products_bulk(db=db, products=products)
-    return [ProductResponse.model_validate(product) for product in db_products]
\ No newline at end of file
+    # Upserts by product key: posting the same catalog again updates it instead of duplicating it.
+    # ids_only keeps the response of a large catalog small
+    if ids_only:
+        ids = await db.run_sync(create_products_bulk, products=products)
+        return FastJSONResponse({"count": len(ids), "ids": ids}, status_code=201)
+    rows = await db.run_sync(create_products_bulk, products=products, as_rows=True)
+    return FastJSONResponse(rows_to_dicts(rows, PRODUCT_RESPONSE_FIELDS), status_code=201)
\ No newline at end of file
@@ -1,47 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.schema.product_schemas import (
     ReviewCreate,
     ReviewResponse,
 )
 from app.cruds.review_crud import (
-    get_one_review,
-    create_review,
+    upsert_review,
     get_all_reviews_by_store_id
 )
+from app.cruds.store_crud import get_store_by_id
 
 from app.models.models import Reviews
 
-from app.database import get_db
+from app.database import get_async_db, get_async_read_db
 
 router = APIRouter(prefix="/reviews", tags=["reviews"])
 
 @router.get("/{store_id}", response_model=list[ReviewResponse])
 async def get_reviews(
     store_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    reviews = get_all_reviews_by_store_id(db=db, store_id=store_id)
+    reviews = await db.run_sync(get_all_reviews_by_store_id, store_id=store_id)
     return [ReviewResponse.model_validate(review) for review in reviews]
 
 @router.post("/", response_model=ReviewResponse, status_code=201)
 async def create_review_endpoint(
     review: ReviewCreate,
-    db: Session = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    review_of_db = get_one_review(
-        db=db,
+    store = await db.run_sync(get_store_by_id, store_id=review.store_id)
+    if not store:
+        raise HTTPException(status_code=404, detail="Store not found")
+
+    # A user has one review per store: posting again replaces its rating
+    db_review, created = await db.run_sync(
+        upsert_review,
+        user=review.user,
         store_id=review.store_id,
-        user=review.user
+        rating=review.rating
     )
-    if not review_of_db:
-        review_create = create_review(
-            db=db,
-            user=review.user,
-            store_id=review.store_id,
-            rating = review.rating
-        )
-    else:
-        return review_of_db
-    return ReviewResponse.model_validate(review_create)
\ No newline at end of file
+    if not created:
+        response.status_code = 200
+    return ReviewResponse.model_validate(db_review)
\ No newline at end of file
@@ -1,136 +1,252 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
-from urllib.parse import urlparse
-from typing import List
-import requests
+from sqlalchemy.ext.asyncio import AsyncSession
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pydantic import ValidationError
+from typing import List, Optional
+import logging
 import os
+import sqlite3
+import tempfile
+import zlib
 
 from dotenv import load_dotenv
-from app.schema.scrapper_schemas import ScrapperItem
-from app.cruds.store_crud import create_store
-from app.cruds.product_crud import create_product
-from app.cruds.price_crud import create_price
-from app.models.models import Stores, Products, Prices, GameEnum, ProductTypeEnum
-from app.database import get_db
+from app.schema.scrapper_schemas import (
+    ScrapperItem,
+    PendingImage,
+    IngestionResult,
+    ScrapperJobCreated,
+    ScrapperJobResponse,
+    MatchCandidateResponse
+)
+from app.cruds.scrapper_crud import ingest_scrapper_items, get_match_candidates
+from app.cruds.product_crud import update_product_img_url
+from app.search.matching import ProductMatcher
+from app.database import SessionLocal, get_async_read_db
+from app.jobs.queue import JobQueue, DatabaseJobQueue, JOB_QUEUED
+from app.jobs.worker import JobWorkerPool
 from app.utils.s3_utils import S3ImageService
-from app.utils.parsing import sanitize_filename
+from app.utils.parsing import StreamLimitError, sanitize_filename, iter_lines
+from app.external_services.image_stage import ImageUploadStage
+from app.external_services.image_cache import ImageCache
 from app.external_services.images import upload_img_from_url
 
 load_dotenv()
 
-router = APIRouter(prefix="/scrapper", tags=["scrapper"])
-
-aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID')
-aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
-
-if not aws_access_key_id or aws_access_key_id.strip() == '':
-    raise ValueError("AWS_ACCESS_KEY_ID environment variable is not set or empty")
-if not aws_secret_access_key or aws_secret_access_key.strip() == '':
-    raise ValueError("AWS_SECRET_ACCESS_KEY environment variable is not set or empty")
+logger = logging.getLogger(__name__)
 
+router = APIRouter(prefix="/scrapper", tags=["scrapper"])
 
-s3_service = S3ImageService(
-    bucket_name='teodiodocker-images',
-    region_name='us-east-2',
-    aws_access_key_id=aws_access_key_id,
-    aws_secret_access_key=aws_secret_access_key,
-)
+SCRAPPER_WORKERS = int(os.getenv('SCRAPPER_WORKERS', '2'))
+SCRAPPER_POLL_INTERVAL = float(os.getenv('SCRAPPER_POLL_INTERVAL', '1.0'))
+SCRAPPER_CHUNK_SIZE = int(os.getenv('SCRAPPER_CHUNK_SIZE', '500'))
+SCRAPPER_HEARTBEAT_INTERVAL = float(os.getenv('SCRAPPER_HEARTBEAT_INTERVAL', '60'))
+# Limits of a /scrapper/stream body, after gzip decompression
+SCRAPPER_MAX_LINE_BYTES = int(os.getenv('SCRAPPER_MAX_LINE_BYTES', str(1024 ** 2)))
+SCRAPPER_MAX_BODY_BYTES = int(os.getenv('SCRAPPER_MAX_BODY_BYTES', str(1024 ** 3)))
+MAX_REPORTED_ERRORS = 100
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '8'))
+IMAGE_WORKERS_PER_HOST = int(os.getenv('IMAGE_WORKERS_PER_HOST', '2'))
+IMAGE_CACHE_PATH = os.getenv('IMAGE_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'image_cache.sqlite3'))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+
+@lru_cache()
+def get_s3_service() -> S3ImageService:
+    # Built on the first image upload: creating the boto3 client is slow and
+    # importing the app must not require AWS credentials
+    aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
+    aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
+
+    if not aws_access_key_id or aws_access_key_id.strip() == '':
+        raise ValueError("AWS_ACCESS_KEY_ID environment variable is not set or empty")
+    if not aws_secret_access_key or aws_secret_access_key.strip() == '':
+        raise ValueError("AWS_SECRET_ACCESS_KEY environment variable is not set or empty")
+
+    return S3ImageService(
+        bucket_name='teodiodocker-images',
+        region_name='us-east-2',
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_access_key,
+    )
 
-def map_game_to_enum(game: str) -> GameEnum:
-    game_mapping = {
-        "pokemon": GameEnum.POKEMON,
-        "magic": GameEnum.MAGIC,
-        "magic-the-gathering": GameEnum.MAGIC,
-        "yu-gi-oh": GameEnum.YUGIOH,
-        "yugioh": GameEnum.YUGIOH,
-        "prismatic_evolutions": GameEnum.POKEMON,
-        "twilight_masquerade": GameEnum.POKEMON,
-        "temporal_forces": GameEnum.POKEMON
-    }
-    return game_mapping.get(game.lower(), GameEnum.OTHER)
-
-def map_product_type_to_enum(product_type: str) -> ProductTypeEnum:
-    type_mapping = {
-        "booster": ProductTypeEnum.BOOSTER,
-        "singles": ProductTypeEnum.SINGLES,
-        "bundle": ProductTypeEnum.BUNDLE
-    }
-    return type_mapping.get(product_type.lower(), ProductTypeEnum.OTHER)
-
-def extract_base_url(url: str) -> str:
-    parsed = urlparse(url)
-    return f"{parsed.scheme}://{parsed.netloc}"
-
-def get_or_create_store(db: Session, store_name: str, website_url: str) -> Stores:
-    store = db.query(Stores).filter(Stores.name == store_name).first()
-    if not store:
-        store = create_store(db=db, name=store_name, website_url=website_url)
-    return store
-
-def create_price_from_scrapper(db: Session, item: ScrapperItem, product_id: int, store_id: int):
-    return create_price(
-        db=db,
-        product_id=product_id,
-        store_id=store_id,
-        price=item.price,
-        url=item.url
+@lru_cache()
+def get_image_cache() -> Optional[ImageCache]:
+    # Images are uploaded uncached when the index can't be written, e.g. on a read-only filesystem
+    index_dir = os.path.dirname(os.path.abspath(IMAGE_CACHE_PATH))
+    if not os.access(IMAGE_CACHE_PATH if os.path.exists(IMAGE_CACHE_PATH) else index_dir, os.W_OK):
+        logger.warning("Image cache disabled: %s is not writable", IMAGE_CACHE_PATH)
+        return None
+    try:
+        return ImageCache(IMAGE_CACHE_PATH, max_bytes=IMAGE_CACHE_MAX_BYTES)
+    except sqlite3.Error:
+        logger.exception("Image cache disabled: could not open %s", IMAGE_CACHE_PATH)
+        return None
+
+def store_product_images(db: Session, pending_images: List[PendingImage]) -> None:
+    if not pending_images:
+        return
+    image_cache = get_image_cache()
+    stage = ImageUploadStage(
+        get_s3_service(),
+        max_workers=IMAGE_WORKERS,
+        max_per_host=IMAGE_WORKERS_PER_HOST,
+        uploader=image_cache.upload_img_from_url if image_cache else upload_img_from_url
+    )
+    jobs = [
+        {
+            'key': image.product_id,
+            'img_url': image.img_url,
+            'filename': f"{sanitize_filename(image.name)}.png",
+            'game_prefix': sanitize_filename(image.game.replace(" ", "_")),
+        }
+        for image in pending_images
+    ]
+    names = {image.product_id: image.name for image in pending_images}
+    for result in stage.run(jobs):
+        if result['success']:
+            update_product_img_url(db, result['key'], result['url'])
+        else:
+            logger.warning("Image upload failed for %s: %s", names[result['key']], result['error'])
+
+
+@lru_cache()
+def get_image_executor() -> ThreadPoolExecutor:
+    # One thread: the stage already uploads in parallel, this only takes it
+    # off the job workers so a chunk doesn't wait for its images
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="product-images")
+
+def upload_pending_images(pending_images: List[PendingImage]) -> None:
+    try:
+        with SessionLocal() as db:
+            store_product_images(db, pending_images)
+    except Exception:
+        logger.exception("Storing %d product images failed", len(pending_images))
+
+def process_job_chunk(items: List[dict], state: dict) -> IngestionResult:
+    # One matcher per job: match keys resolved by a chunk are reused by the next ones
+    matcher = state.setdefault("matcher", ProductMatcher())
+    with SessionLocal() as db:
+        result = ingest_scrapper_items(
+            db,
+            [ScrapperItem.model_validate(item) for item in items],
+            matcher=matcher,
+            # A chunk processed again after a lost claim or a crash doesn't append its prices twice
+            source=f"job:{state['job_id']}:{state['seq']}"
+        )
+    if result.pending_images:
+        get_image_executor().submit(upload_pending_images, result.pending_images)
+    return result
+
+@lru_cache()
+def get_job_queue() -> JobQueue:
+    return DatabaseJobQueue(SessionLocal)
+
+def create_worker_pool() -> JobWorkerPool:
+    return JobWorkerPool(
+        get_job_queue(),
+        process_job_chunk,
+        workers=SCRAPPER_WORKERS,
+        poll_interval=SCRAPPER_POLL_INTERVAL,
+        heartbeat_interval=SCRAPPER_HEARTBEAT_INTERVAL
     )
 
 
-@router.post("/bulk")
+@router.post("/bulk", response_model=ScrapperJobCreated, status_code=202)
 async def process_scrapper_results(
     items: List[ScrapperItem],
-    db: Session = Depends(get_db)
+    queue: JobQueue = Depends(get_job_queue)
+):
+    job_id = await run_in_threadpool(
+        queue.enqueue,
+        [item.model_dump() for item in items],
+        SCRAPPER_CHUNK_SIZE
+    )
+    return ScrapperJobCreated(job_id=job_id, status=JOB_QUEUED, total_items=len(items))
+
+@router.post("/stream", response_model=ScrapperJobCreated, status_code=202)
+async def stream_scrapper_results(
+    request: Request,
+    queue: JobQueue = Depends(get_job_queue)
 ):
-    processed_count = 0
+    # NDJSON body, validated line by line and queued in SCRAPPER_CHUNK_SIZE chunks
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+    job_id = await run_in_threadpool(queue.create_job)
+    total_items = 0
+    rejected_count = 0
     errors = []
+    chunk = []
+
+    try:
+        line_number = 0
+        async for line in iter_lines(
+            request.stream(),
+            gzipped=gzipped,
+            max_line_bytes=SCRAPPER_MAX_LINE_BYTES,
+            max_body_bytes=SCRAPPER_MAX_BODY_BYTES
+        ):
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                item = ScrapperItem.model_validate_json(line)
+            except ValidationError as e:
+                rejected_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"Invalid item on line {line_number}: {e.errors()[0]['msg']}")
+                continue
+            chunk.append(item.model_dump())
+            total_items += 1
+            if len(chunk) >= SCRAPPER_CHUNK_SIZE:
+                await run_in_threadpool(queue.append_chunk, job_id, chunk)
+                chunk = []
+        if chunk:
+            await run_in_threadpool(queue.append_chunk, job_id, chunk)
+    except zlib.error as e:
+        await run_in_threadpool(queue.finish, job_id, f"Invalid gzip body: {str(e)}")
+        raise HTTPException(status_code=400, detail="Invalid gzip body")
+    except StreamLimitError as e:
+        await run_in_threadpool(queue.finish, job_id, f"Upload rejected: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        await run_in_threadpool(queue.finish, job_id, f"Upload interrupted: {str(e)}")
+        raise
+
+    await run_in_threadpool(queue.seal, job_id)
+    return ScrapperJobCreated(
+        job_id=job_id,
+        status=JOB_QUEUED,
+        total_items=total_items,
+        rejected_count=rejected_count,
+        errors=errors
+    )
 
-    for item in items:
-        try:
-            website_url = extract_base_url(item.url)
-            store = get_or_create_store(db, item.store, website_url)
-
-            img_s3_url = None
-            if item.img_url:
-                try:
-                    filename = f"{sanitize_filename(item.name)}.png"
-                    game_prefix = sanitize_filename(item.game.replace(" ", "_"))
-                    img_s3_url = upload_img_from_url(item.img_url, filename, game_prefix, s3_service)
-                except Exception as img_error:
-                    print(f"Image upload failed for {item.name}: {str(img_error)}")
-                    img_s3_url = None
-
-            product = db.query(Products).filter(Products.name == item.name).first()
-            if not product:
-                product = create_product(
-                    db=db,
-                    name=item.name,
-                    game=map_game_to_enum(item.game),
-                    product_type=map_product_type_to_enum(item.product_type),
-                    img_url=img_s3_url,
-                    min_price=item.min_price,
-                    language=item.language,
-                    description=item.description
-                )
-
-            create_price_from_scrapper(db, item, product.id, store.id)
-            processed_count += 1
-
-        except SQLAlchemyError as e:
-            errors.append(f"DB error for item '{item.name}': {str(e)}")
-            db.rollback()
-        except Exception as e:
-            errors.append(f"Error for item '{item.name}': {str(e)}")
-
-    response = {
-        "message": f"Successfully processed {processed_count} items",
-        "processed_count": processed_count,
-        "total_items": len(items)
-    }
-
-    if errors:
-        response["errors"] = errors
-        response["error_count"] = len(errors)
-
-    return response
+@router.get("/jobs/{job_id}", response_model=ScrapperJobResponse)
+async def get_scrapper_job(
+    job_id: int,
+    queue: JobQueue = Depends(get_job_queue)
+):
+    job = await run_in_threadpool(queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/match-candidates", response_model=List[MatchCandidateResponse])
+async def list_match_candidates(
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    # Products ingestion kept apart because their names are only alike
+    rows = await db.run_sync(get_match_candidates, limit=limit)
+    return [
+        MatchCandidateResponse(
+            product_id=product_id,
+            product_name=product_name,
+            candidate_id=candidate_id,
+            candidate_name=candidate_name,
+            score=score,
+            created_at=created_at
+        )
+        for product_id, product_name, candidate_id, candidate_name, score, created_at in rows
+    ]
@@ -1,21 +1,39 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schema.product_schemas import (
     StoreBase,
-    StoreCreate
+    StoreCreate,
+    StoreRatingResponse
 )
 from app.cruds.store_crud import (
-    create_store
+    create_store,
+    get_store_rating
 )
 
-from app.database import get_db
+from app.database import get_async_db, get_async_read_db
 
 router = APIRouter(prefix="/stores", tags=["stores"])
 
 @router.post("/", response_model=StoreBase, status_code=201)
 async def create_store_endpoint(
     store: StoreCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_store = create_store(db=db, name=store.name, website_url=store.website_url)
+    db_store = await db.run_sync(create_store, name=store.name, website_url=store.website_url)
     return StoreBase.model_validate(db_store)
+
+@router.get("/{store_id}/rating", response_model=StoreRatingResponse)
+async def get_store_rating_endpoint(
+    store_id: int,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    # One primary key lookup: the counters are maintained by the review upsert
+    rating = await db.run_sync(get_store_rating, store_id=store_id)
+    if not rating:
+        raise HTTPException(status_code=404, detail="Store not found")
+    return StoreRatingResponse(
+        store_id=rating.id,
+        rating_count=rating.rating_count,
+        rating_sum=rating.rating_sum,
+        average_rating=round(rating.rating_sum / rating.rating_count, 2) if rating.rating_count else None
+    )
@@ -19,3 +19,6 @@ class CommentCreate(BaseModel):
 
 class CommentResponse(CommentBase):
     pass
+
+# Fields serialized when comments are read as rows
+COMMENT_RESPONSE_FIELDS = tuple(CommentResponse.model_fields)
@@ -1,14 +1,14 @@
 from datetime import datetime
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Union
-from app.models.models import GameEnum, ProductTypeEnum
+from app.models.models import GameEnum, PriceBucketEnum, ProductTypeEnum
 from app.schema.comment_schemas import CommentResponse
 
 class ReviewCreate(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     user: str
     store_id: int
-    rating: int  # Rating between 1 and 5
+    rating: int = Field(ge=1, le=5)
 class ReviewResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: int
@@ -23,6 +23,12 @@ class StoreBase(BaseModel):
     name: str
     website_url: str
 
+class StoreRatingResponse(BaseModel):
+    store_id: int
+    rating_count: int
+    rating_sum: int
+    average_rating: Optional[float] = None
+
 class StoreCreate(BaseModel):
     name: str
     website_url: str
@@ -37,14 +43,32 @@ class PriceWithStore(BaseModel):
     price: int
     url: str
     scrapped_at: datetime
+    last_seen_at: Optional[datetime] = None
     store: StoreBase
 
+def price_with_store_dicts(rows) -> List[dict]:
+    """
+    PriceWithStore shaped dicts from get_price_rows_with_stores rows
+    """
+    return [
+        {
+            "id": row.id,
+            "price": row.price,
+            "url": row.url,
+            "scrapped_at": row.scrapped_at,
+            "last_seen_at": row.last_seen_at,
+            "store": {"id": row.store_id, "name": row.store_name, "website_url": row.store_website_url},
+        }
+        for row in rows
+    ]
+
 class ProductBase(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: int
     name: str
     img_url: Optional[str] = None
     min_price: Optional[int] = None
+    offer_count: int = 0
     game: Union[GameEnum, str]
     edition: Optional[str] = None
     language: Optional[str] = None
@@ -66,9 +90,20 @@ class ProductCreate(BaseModel):
 class ProductResponse(ProductBase):
     pass
 
+class ProductBulkResponse(BaseModel):
+    count: int
+    # One per distinct product, in the order they were posted
+    ids: List[int]
+
+# Fields serialized when products are read as rows (see PRODUCT_ROW_COLUMNS)
+PRODUCT_RESPONSE_FIELDS = tuple(ProductResponse.model_fields)
+
 class ProductWithPricesResponse(ProductBase):
     prices: List[PriceWithStore] = []
+    # Newest comments only; next_comments_cursor pages through the rest on /comments
     comments: List[CommentResponse] = []
+    comment_count: int = 0
+    next_comments_cursor: Optional[str] = None
 
 class PriceCreate(BaseModel):
     product_id: int
@@ -84,3 +119,22 @@ class PriceResponse(BaseModel):
     price: int
     url: str
     scrapped_at: datetime
+    last_seen_at: Optional[datetime] = None
+
+class PriceHistoryPoint(BaseModel):
+    bucket_start: datetime
+    min_price: int
+    max_price: int
+    avg_price: float
+    last_price: int
+
+class PriceHistorySeries(BaseModel):
+    store: StoreBase
+    points: List[PriceHistoryPoint] = []
+
+class PriceHistoryResponse(BaseModel):
+    product_id: int
+    bucket: PriceBucketEnum
+    start: datetime
+    end: datetime
+    series: List[PriceHistorySeries] = []
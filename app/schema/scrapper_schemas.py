@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional, Union, Dict, Any
 
@@ -5,7 +6,7 @@ class ScrapperItem(BaseModel):
     price: int
     description: Optional[str] = None
     language: Optional[str] = None
-    stock: Union[Dict[str, Any], str] = None
+    stock: Optional[Union[Dict[str, Any], str]] = None
     name: str
     url: str
     game: str
@@ -17,3 +18,43 @@ class ScrapperItem(BaseModel):
 
 class ScrapperRequest(BaseModel):
     results: List[ScrapperItem]
+
+class PendingImage(BaseModel):
+    product_id: int
+    name: str
+    game: str
+    img_url: str
+
+class IngestionResult(BaseModel):
+    total_items: int = 0
+    processed_count: int = 0
+    errors: List[str] = []
+    pending_images: List[PendingImage] = []
+
+class ScrapperJobCreated(BaseModel):
+    job_id: int
+    status: str
+    total_items: int
+    rejected_count: int = 0
+    errors: List[str] = []
+
+class ScrapperJobResponse(BaseModel):
+    id: int
+    status: str
+    total_items: int
+    processed_count: int
+    error_count: int
+    errors: List[str] = []
+    progress: float
+    items_per_second: Optional[float] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class MatchCandidateResponse(BaseModel):
+    product_id: int
+    product_name: str
+    candidate_id: int
+    candidate_name: str
+    score: float
+    created_at: datetime
@@ -0,0 +1,268 @@
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Row, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.models import Products
+from app.utils.parsing import normalize_text
+
+# A gram found in the name counts three times as much as one only found in the description
+FIELD_WEIGHTS = {"name": 3.0, "edition": 1.5, "description": 1.0}
+MAX_FIELD_WEIGHT = max(FIELD_WEIGHTS.values())
+# Added when the whole normalized query appears in the normalized name
+EXACT_NAME_BONUS = 0.5
+DEFAULT_MIN_SCORE = 0.35
+# Each sync reads again the products updated this long before the newest one
+# it saw, so a transaction that committed late is not skipped
+SYNC_OVERLAP = timedelta(seconds=10)
+# Seconds between background syncs, and between the full passes over the
+# catalog that catch the commits even later than SYNC_OVERLAP
+SEARCH_SYNC_INTERVAL = float(os.getenv("SEARCH_SYNC_INTERVAL", "30"))
+SEARCH_FULL_SYNC_INTERVAL = float(os.getenv("SEARCH_FULL_SYNC_INTERVAL", "3600"))
+
+logger = logging.getLogger(__name__)
+
+
+def word_grams(text: str) -> Set[str]:
+    """
+    Trigrams of every word, padded like pg_trgm so short words and word
+    starts get their own grams
+    """
+    grams = set()
+    for word in normalize_text(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class ProductSearchIndex:
+    def __init__(self, min_score: float = DEFAULT_MIN_SCORE):
+        """
+        In-memory inverted trigram index over product name, edition and description
+
+        Built from the database on the first sync and kept up to date by
+        create_product/create_products_bulk; sync() also picks up products
+        created or changed elsewhere (scrapper jobs, upserts, other processes)
+        by walking (updated_at, id) from the newest product it saw, so the index
+        behaves the same on SQLite and Postgres. updated_at is set when the
+        statement runs, not when it commits, so the background thread started
+        by start() also reads the whole catalog every full_interval. Products
+        whose texts didn't change are not indexed again.
+
+        Args:
+            min_score: Products covering less than this share of the query (0..1) are dropped
+        """
+        self.min_score = min_score
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.synced_at: Optional[datetime] = None
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.doc_grams: Dict[int, Set[str]] = {}
+        self.names: Dict[int, str] = {}
+        # Hash of the indexed texts, to skip unchanged products on sync
+        self.texts: Dict[int, int] = {}
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_grams)
+
+    def _add(self, product_id: int, name: str, edition: Optional[str], description: Optional[str]) -> None:
+        self._remove(product_id)
+        weights: Dict[str, float] = {}
+        for field, text in (("name", name), ("edition", edition), ("description", description)):
+            if not text:
+                continue
+            for gram in word_grams(text):
+                weights[gram] = max(weights.get(gram, 0.0), FIELD_WEIGHTS[field])
+        for gram, weight in weights.items():
+            self.postings.setdefault(gram, {})[product_id] = weight
+        self.doc_grams[product_id] = set(weights)
+        self.names[product_id] = normalize_text(name)
+        self.texts[product_id] = hash((name, edition, description))
+
+    def _remove(self, product_id: int) -> None:
+        for gram in self.doc_grams.pop(product_id, ()):
+            posting = self.postings[gram]
+            posting.pop(product_id, None)
+            if not posting:
+                del self.postings[gram]
+        self.names.pop(product_id, None)
+        self.texts.pop(product_id, None)
+
+    def add(self, products: Iterable[Products]) -> None:
+        """
+        Indexes new or changed products; ignored until the first sync loads the catalog
+        """
+        with self.lock:
+            if not self.loaded:
+                return
+            for product in products:
+                self._add(product.id, product.name, product.edition, product.description)
+
+    def remove(self, product_ids: Iterable[int]) -> None:
+        with self.lock:
+            for product_id in product_ids:
+                self._remove(product_id)
+
+    def sync_since(self) -> Optional[datetime]:
+        return self.synced_at - SYNC_OVERLAP if self.synced_at is not None else None
+
+    def changed_rows(
+        self,
+        db: Session,
+        since: Optional[datetime],
+        after: Optional[Tuple[datetime, int]] = None,
+        batch_size: int = 5000
+    ) -> Sequence[Row]:
+        """
+        One batch of the products updated since `since`, in (updated_at, id)
+        order after the `after` cursor
+        """
+        stmt = select(Products.id, Products.name, Products.edition, Products.description, Products.updated_at)
+        if since is not None:
+            stmt = stmt.where(Products.updated_at >= since)
+        if after is not None:
+            stmt = stmt.where(tuple_(Products.updated_at, Products.id) > tuple_(*after))
+        return db.execute(stmt.order_by(Products.updated_at, Products.id).limit(batch_size)).all()
+
+    def apply(self, rows: Sequence[Row]) -> int:
+        """
+        Indexes the rows of changed_rows whose texts changed
+
+        Returns:
+            Number of products (re)indexed
+        """
+        added = 0
+        with self.lock:
+            for row in rows:
+                if self.texts.get(row.id) != hash((row.name, row.edition, row.description)):
+                    self._add(row.id, row.name, row.edition, row.description)
+                    added += 1
+            if rows and (self.synced_at is None or rows[-1].updated_at > self.synced_at):
+                self.synced_at = rows[-1].updated_at
+            self.loaded = True
+        return added
+
+    def sync(self, db: Session, batch_size: int = 5000, full: bool = False) -> int:
+        """
+        Indexes the products created or changed since the last sync
+
+        Args:
+            full: Read every product instead, only indexing those whose texts changed
+
+        Returns:
+            Number of products (re)indexed
+        """
+        since, after, added = None if full else self.sync_since(), None, 0
+        while True:
+            rows = self.changed_rows(db, since, after, batch_size)
+            added += self.apply(rows)
+            if len(rows) < batch_size:
+                return added
+            after = (rows[-1].updated_at, rows[-1].id)
+
+    async def sync_async(self, db: AsyncSession, batch_size: int = 5000) -> int:
+        """
+        sync() for async endpoints that find the index not loaded yet: the
+        queries go through the session, the indexing of the whole catalog runs
+        in the threadpool so it doesn't block the event loop
+        """
+        since, after, added = self.sync_since(), None, 0
+        while True:
+            rows = await db.run_sync(self.changed_rows, since, after, batch_size)
+            added += await run_in_threadpool(self.apply, rows)
+            if len(rows) < batch_size:
+                return added
+            after = (rows[-1].updated_at, rows[-1].id)
+
+    def start(
+        self,
+        session_factory: Callable[[], Session],
+        interval: float = SEARCH_SYNC_INTERVAL,
+        full_interval: float = SEARCH_FULL_SYNC_INTERVAL
+    ) -> None:
+        """
+        Starts the background thread: it syncs right away, then every interval,
+        with a full pass every full_interval
+        """
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._run,
+            args=(session_factory, interval, full_interval),
+            name="search-index-sync",
+            daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def _run(self, session_factory: Callable[[], Session], interval: float, full_interval: float) -> None:
+        full_synced_at = time.monotonic()
+        while not self.stop_event.is_set():
+            full = time.monotonic() - full_synced_at >= full_interval
+            try:
+                with session_factory() as db:
+                    self.sync(db, full=full)
+                if full:
+                    full_synced_at = time.monotonic()
+            except Exception:
+                logger.exception("Syncing the search index failed")
+            self.stop_event.wait(interval)
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[int, float]]:
+        """
+        Ranks products by the IDF-weighted share of the query trigrams they contain,
+        counting name matches over edition and description ones
+
+        Returns:
+            (product_id, score) pairs, best first
+        """
+        query_grams = word_grams(query)
+        if not query_grams:
+            return []
+        normalized_query = normalize_text(query)
+
+        with self.lock:
+            total = len(self.doc_grams) or 1
+            idf = {gram: math.log(1 + total / (len(self.postings.get(gram, ())) or 1)) for gram in query_grams}
+            query_weight = sum(idf.values())
+
+            # Per product: IDF share of the query it covers, and the same share
+            # weighted by the field each gram was found in
+            coverage: Dict[int, float] = {}
+            weighted: Dict[int, float] = {}
+            for gram in query_grams:
+                for product_id, weight in self.postings.get(gram, {}).items():
+                    coverage[product_id] = coverage.get(product_id, 0.0) + idf[gram]
+                    weighted[product_id] = weighted.get(product_id, 0.0) + idf[gram] * weight
+
+            ranked = []
+            for product_id, covered in coverage.items():
+                if covered / query_weight < self.min_score:
+                    continue
+                score = weighted[product_id] / (query_weight * MAX_FIELD_WEIGHT)
+                if normalized_query in self.names[product_id]:
+                    score += EXACT_NAME_BONUS
+                ranked.append((product_id, score))
+
+        ranked.sort(key=lambda hit: (-hit[1], hit[0]))
+        return ranked[:limit]
+
+
+@lru_cache
+def get_search_index() -> ProductSearchIndex:
+    return ProductSearchIndex()
@@ -0,0 +1,131 @@
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from app.search.index import word_grams
+from app.utils.parsing import MATCH_PACKAGING_TOKENS
+
+DEFAULT_MATCH_THRESHOLD = 0.8
+# Blocks holding more keys than this come from tokens most products share
+# and are skipped rather than compared one by one
+DEFAULT_MAX_BLOCK_SIZE = 200
+BLOCK_PREFIX_LENGTH = 4
+
+
+def match_key_scope(key: str) -> str:
+    """
+    The "game/product_type" part of a match key
+    """
+    return key.partition(":")[0]
+
+
+def is_distinguishing_token(token: str) -> bool:
+    # Numbers, short codes ("151", "ex", "v") and packaging ("box", "bundle")
+    # tell products apart even when the rest of the name is alike
+    return len(token) <= 2 or any(c.isdigit() for c in token) or token in MATCH_PACKAGING_TOKENS
+
+
+def distinguishing_tokens(key: str) -> FrozenSet[str]:
+    return frozenset(token for token in key.partition(":")[2].split() if is_distinguishing_token(token))
+
+
+class ProductMatcher:
+    def __init__(self, threshold: float = DEFAULT_MATCH_THRESHOLD, max_block_size: int = DEFAULT_MAX_BLOCK_SIZE):
+        """
+        Match key -> product id map kept for one ingestion job, with a lookup
+        of near-duplicate keys
+
+        Keys are blocked by scope and the prefix of each token, and by scope
+        and distinguishing tokens, so a lookup only compares the keys sharing a
+        block with it instead of every known key. A near-duplicate must have
+        the same scope and distinguishing tokens and a trigram Jaccard
+        similarity of at least threshold.
+
+        Args:
+            threshold: Minimum similarity (0..1) of a near-duplicate
+            max_block_size: Blocks with more keys than this are not compared
+        """
+        self.threshold = threshold
+        self.max_block_size = max_block_size
+        self.ids: Dict[str, Optional[int]] = {}
+        self.blocks: Dict[str, List[str]] = {}
+        self.distinguishing: Dict[str, FrozenSet[str]] = {}
+        self.grams: Dict[str, Set[str]] = {}
+        self.loaded_scopes: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.ids
+
+    @staticmethod
+    def _blocks(key: str) -> Set[str]:
+        scope, _, tokens = key.partition(":")
+        tokens = tokens.split()
+        blocks = {f"{scope}:{token[:BLOCK_PREFIX_LENGTH]}" for token in tokens if not is_distinguishing_token(token)}
+        # A near-duplicate has the same distinguishing tokens, so they make a block of their own
+        distinguishing = [token for token in tokens if is_distinguishing_token(token)]
+        if distinguishing:
+            blocks.add(f"{scope}#{' '.join(distinguishing)}")
+        return blocks
+
+    def _grams(self, key: str) -> Set[str]:
+        # Only computed for keys that get compared
+        grams = self.grams.get(key)
+        if grams is None:
+            grams = self.grams[key] = word_grams(key.partition(":")[2])
+        return grams
+
+    def add(self, key: str, product_id: Optional[int] = None) -> None:
+        """
+        Adds a key, or sets the product id of a key added without one; a key
+        keeps the first product id it gets
+        """
+        if key in self.ids:
+            if self.ids[key] is None:
+                self.ids[key] = product_id
+            return
+        self.ids[key] = product_id
+        self.distinguishing[key] = distinguishing_tokens(key)
+        for block in self._blocks(key):
+            self.blocks.setdefault(block, []).append(key)
+
+    def add_all(self, keys: Iterable[tuple]) -> None:
+        for key, product_id in keys:
+            self.add(key, product_id)
+
+    def get(self, key: str) -> Optional[int]:
+        return self.ids.get(key)
+
+    def clear(self) -> None:
+        self.ids.clear()
+        self.blocks.clear()
+        self.distinguishing.clear()
+        self.grams.clear()
+        self.loaded_scopes.clear()
+
+    def find_similar(self, key: str) -> Optional[Tuple[str, float]]:
+        """
+        The known key most similar to key, other than key itself
+
+        Returns:
+            (key, similarity), or None when nothing is close enough
+        """
+        distinguishing = distinguishing_tokens(key)
+        grams = word_grams(key.partition(":")[2])
+        best, best_score = None, self.threshold
+        compared = {key}
+        for block in sorted(self._blocks(key)):
+            candidates = self.blocks.get(block, ())
+            if len(candidates) > self.max_block_size:
+                continue
+            for candidate in candidates:
+                if candidate in compared:
+                    continue
+                compared.add(candidate)
+                if self.distinguishing[candidate] != distinguishing:
+                    continue
+                other = self._grams(candidate)
+                score = len(grams & other) / len(grams | other)
+                if score > best_score or (best is None and score == best_score):
+                    best, best_score = candidate, score
+        return (best, best_score) if best is not None else None
@@ -0,0 +1,9 @@
+from datetime import datetime, timezone
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite hands timestamps back without tzinfo
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
@@ -0,0 +1,46 @@
+from typing import Any, Iterable, List, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# UTC datetimes end in Z, the same output as pydantic
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Compact JSON bytes; dicts, lists, datetimes and enums are encoded natively,
+    pydantic models through model_dump
+    """
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson
+
+    Returning it from a route skips the response_model validation, so the
+    content must already have the documented shape, e.g. from rows_to_dicts.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_to_dicts(rows: Iterable, fields: Sequence[str]) -> List[dict]:
+    """
+    Plain dicts with the given fields from result rows (tuples with named columns)
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    keys = list(rows[0]._fields)
+    indexes = [keys.index(field) for field in fields]
+    return [{field: row[index] for field, index in zip(fields, indexes)} for row in rows]
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import jwt
+
+JWKS_REFRESH_INTERVAL = float(os.getenv("JWKS_REFRESH_INTERVAL", "3600"))
+# An unknown kid refreshes the keys at most once per this many seconds
+JWKS_MIN_REFRESH_GAP = float(os.getenv("JWKS_MIN_REFRESH_GAP", "30"))
+JWKS_FETCH_TIMEOUT = float(os.getenv("JWKS_FETCH_TIMEOUT", "5"))
+VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "10000"))
+# Upper bound on how long a verified token skips the signature check
+VERIFIED_TOKEN_MAX_AGE = float(os.getenv("VERIFIED_TOKEN_MAX_AGE", "300"))
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSKeyStore:
+    def __init__(
+        self,
+        jwks_url: str,
+        fetch_jwks: Optional[Callable[[], Dict[str, Any]]] = None,
+        refresh_interval: float = JWKS_REFRESH_INTERVAL,
+        min_refresh_gap: float = JWKS_MIN_REFRESH_GAP
+    ):
+        """
+        Signing keys of the JWKS endpoint, kept in memory by kid
+
+        Keys are prefetched and refreshed by a background thread, so looking
+        up a known kid never does IO. An unknown kid (key rotation) triggers
+        one refresh, shared by every request waiting on it and rate limited
+        by min_refresh_gap.
+
+        Args:
+            jwks_url: URL of the JWKS document
+            fetch_jwks: Returns the JWKS document as a dict; fetches jwks_url by default
+            refresh_interval: Seconds between background refreshes
+            min_refresh_gap: Minimum seconds between refreshes caused by unknown kids
+        """
+        self.jwks_url = jwks_url
+        self.fetch_jwks = fetch_jwks or jwt.PyJWKClient(
+            jwks_url, cache_jwk_set=False, timeout=JWKS_FETCH_TIMEOUT
+        ).fetch_data
+        self.refresh_interval = refresh_interval
+        self.min_refresh_gap = min_refresh_gap
+        self.keys: Dict[str, jwt.PyJWK] = {}
+        self.refreshed_at: Optional[float] = None
+        self.fetch_count = 0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> None:
+        with self.lock:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        # Set before fetching so failed fetches are rate limited too
+        self.refreshed_at = time.monotonic()
+        self.fetch_count += 1
+        jwk_set = jwt.PyJWKSet.from_dict(self.fetch_jwks())
+        self.keys = {key.key_id: key for key in jwk_set.keys}
+
+    def _refresh_for(self, kid: str) -> Optional[jwt.PyJWK]:
+        # Waiting on the lock is the single flight: whoever gets it after the
+        # first refresh finds the kid already loaded
+        with self.lock:
+            stale = self.refreshed_at is None or time.monotonic() - self.refreshed_at >= self.min_refresh_gap
+            if kid not in self.keys and stale:
+                self._refresh()
+            return self.keys.get(kid)
+
+    async def get_key(self, kid: Optional[str]) -> Optional[jwt.PyJWK]:
+        """
+        Signing key for the kid, None if the JWKS doesn't have it
+        """
+        key = self.keys.get(kid)
+        if key is not None or kid is None:
+            return key
+        return await asyncio.to_thread(self._refresh_for, kid)
+
+    def start(self) -> None:
+        """
+        Starts the background thread: it fetches the keys right away, then every refresh_interval
+        """
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def _run(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                self.refresh()
+                wait = self.refresh_interval
+            except Exception:
+                logger.exception("Refreshing the JWKS failed")
+                wait = min(self.refresh_interval, self.min_refresh_gap)
+            self.stop_event.wait(wait)
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_entries: int = VERIFIED_TOKEN_CACHE_SIZE, max_age: float = VERIFIED_TOKEN_MAX_AGE):
+        """
+        LRU of the payloads of tokens whose signature and claims were already checked
+
+        An entry is dropped at the token's exp, or after max_age seconds if
+        sooner, which also bounds how long a token signed with a key removed
+        from the JWKS keeps being accepted.
+
+        Args:
+            max_entries: Maximum number of tokens kept; the least recently used are evicted
+            max_age: Maximum seconds a token is served from the cache
+        """
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is None:
+                return None
+            if cached[0] <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return cached[1]
+
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        expires_at = time.time() + self.max_age
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+        key = self._key(token)
+        with self.lock:
+            self.entries[key] = (expires_at, payload)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
@@ -0,0 +1,36 @@
+import base64
+import binascii
+import json
+from typing import Any, List, Sequence
+
+
+def encode_cursor(sort: str, values: Sequence[Any]) -> str:
+    """
+    Builds an opaque cursor pointing right after a row
+
+    Args:
+        sort: Sort mode the cursor belongs to
+        values: Sort key of the last row of the page, tie-breaker id last
+
+    Returns:
+        URL safe cursor string
+    """
+    payload = json.dumps({"s": sort, "k": list(values)}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> List[Any]:
+    """
+    Reads a cursor built by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed or was built for another sort mode
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(payload, dict) or payload.get("s") != sort or not isinstance(payload.get("k"), list):
+        raise ValueError("Invalid cursor")
+    return payload["k"]
@@ -1,10 +1,82 @@
 import re
 import unicodedata
+import zlib
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from app.models.models import GameEnum, ProductTypeEnum
+
+def fold_accents(text: str) -> str:
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Folds accents and case and keeps only letters and digits, so that
+    "Pokémon: Escarlata & Púrpura" becomes "pokemon escarlata purpura"
+    """
+    text = fold_accents(text).lower()
+    return ' '.join(re.findall(r'[^\W_]+', text))
+
+
+def make_product_key(name: str, game: str, product_type: str, edition: Optional[str] = None) -> str:
+    """
+    Identity of a product for upserts: its game and product type plus its
+    normalized name and edition, so "Pokémon: 151  Booster" and "pokemon 151 booster"
+    of the same game, type and edition are one product, but a booster and a
+    bundle, or two editions, are not
+    """
+    key = f"{getattr(game, 'value', game)}/{getattr(product_type, 'value', product_type)}:{normalize_text(name)}"
+    edition = normalize_text(edition or '')
+    return f"{key}|{edition}" if edition else key
+
+
+# The game is part of the scope of a match key, so naming it again in the
+# product name doesn't tell two products apart
+GAME_MATCH_TOKENS = {
+    GameEnum.POKEMON.value: {"pokemon", "ptcg"},
+    GameEnum.YUGIOH.value: {"yu", "gi", "oh", "yugioh"},
+    GameEnum.MAGIC.value: {"magic", "gathering", "mtg"},
+}
+MATCH_STOPWORDS = {"tcg", "the", "of", "and", "y", "de", "del", "el", "la", "en"}
+MATCH_ABBREVIATIONS = {"etb": ("elite", "trainer", "box"), "boxes": ("box",)}
+# How a product is packaged: "Booster" and "Booster Box" are different
+# products however alike the rest of their names is
+MATCH_PACKAGING_TOKENS = {
+    "booster", "box", "bundle", "pack", "display", "case", "tin", "blister", "collection",
+    "premium", "super", "ultra", "elite", "trainer", "deck", "starter", "kit", "mini", "half",
+}
+
+
+def match_token(token: str) -> str:
+    # "evolutions" and "evolution" are the same set; short words and codes are left alone
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and not token[-2].isdigit():
+        return token[:-1]
+    return token
+
+
+def make_match_key(name: str, game: str, product_type: str, edition: Optional[str] = None) -> str:
+    """
+    Key used to recognise one product across stores: its game and product type
+    plus the sorted, distinct name and edition tokens without game names,
+    stopwords or plurals, so "Pokémon TCG: Prismatic Evolutions Booster" and
+    "pokemon tcg prismatic evolution booster" share it
+    """
+    game = getattr(game, 'value', game)
+    skipped = MATCH_STOPWORDS | GAME_MATCH_TOKENS.get(game, set())
+    tokens = set()
+    for text in (name, edition):
+        for token in normalize_text(text or '').split():
+            for part in MATCH_ABBREVIATIONS.get(token, (token,)):
+                if part not in skipped:
+                    tokens.add(match_token(part))
+    return f"{game}/{getattr(product_type, 'value', product_type)}:{' '.join(sorted(tokens))}"
+
 
 def sanitize_filename(filename: str) -> str:
     filename = filename.replace('\n', ' ').replace('\r', ' ')
-    filename = unicodedata.normalize('NFD', filename)
-    filename = ''.join(c for c in filename if unicodedata.category(c) != 'Mn')
+    filename = fold_accents(filename)
     
     replacements = {
         '–': '-',
@@ -44,3 +116,103 @@ def sanitize_filename(filename: str) -> str:
         filename = "unnamed_product"
     
     return filename
+
+
+def map_game_to_enum(game: str) -> GameEnum:
+    game_mapping = {
+        "pokemon": GameEnum.POKEMON,
+        "magic": GameEnum.MAGIC,
+        "magic-the-gathering": GameEnum.MAGIC,
+        "yu-gi-oh": GameEnum.YUGIOH,
+        "yugioh": GameEnum.YUGIOH,
+        "prismatic_evolutions": GameEnum.POKEMON,
+        "twilight_masquerade": GameEnum.POKEMON,
+        "temporal_forces": GameEnum.POKEMON
+    }
+    return game_mapping.get(game.lower(), GameEnum.OTHER)
+
+def map_product_type_to_enum(product_type: str) -> ProductTypeEnum:
+    type_mapping = {
+        "booster": ProductTypeEnum.BOOSTER,
+        "singles": ProductTypeEnum.SINGLES,
+        "bundle": ProductTypeEnum.BUNDLE
+    }
+    return type_mapping.get(product_type.lower(), ProductTypeEnum.OTHER)
+
+def extract_base_url(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+# Most bytes one gzip decompress call may produce, so a compressed body
+# can't expand past the limits in a single step
+INFLATE_STEP = 64 * 1024
+
+
+class StreamLimitError(Exception):
+    """
+    A line or the whole body of a stream is over its configured limit
+    """
+
+
+def _inflate(decompressor: Any, data: bytes) -> Iterator[bytes]:
+    while True:
+        out = decompressor.decompress(data, INFLATE_STEP)
+        if out:
+            yield out
+        data = decompressor.unconsumed_tail
+        if not data and len(out) < INFLATE_STEP:
+            return
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes],
+    gzipped: bool = False,
+    max_line_bytes: Optional[int] = None,
+    max_body_bytes: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Splits a byte stream into lines without buffering more than one partial line
+
+    The partial line is kept as a list of parts and joined once, when its
+    newline arrives.
+
+    Args:
+        chunks: Raw body chunks as they arrive
+        gzipped: Whether the body is gzip compressed
+        max_line_bytes: Longest line allowed, None for no limit
+        max_body_bytes: Largest (decompressed) body allowed, None for no limit
+
+    Raises:
+        StreamLimitError: A line or the body is over its limit
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    parts: List[bytes] = []
+    line_size = 0
+    body_size = 0
+
+    def split(data: bytes) -> Iterator[bytes]:
+        nonlocal parts, line_size, body_size
+        body_size += len(data)
+        if max_body_bytes and body_size > max_body_bytes:
+            raise StreamLimitError(f"Body is over {max_body_bytes} bytes")
+        *lines, rest = data.split(b"\n")
+        for line in lines:
+            if max_line_bytes and line_size + len(line) > max_line_bytes:
+                raise StreamLimitError(f"Line is over {max_line_bytes} bytes")
+            parts.append(line)
+            yield b"".join(parts)
+            parts, line_size = [], 0
+        if rest:
+            line_size += len(rest)
+            if max_line_bytes and line_size > max_line_bytes:
+                raise StreamLimitError(f"Line is over {max_line_bytes} bytes")
+            parts.append(rest)
+
+    async for chunk in chunks:
+        for data in (_inflate(decompressor, chunk) if decompressor else (chunk,)):
+            for line in split(data):
+                yield line
+    if decompressor:
+        for line in split(decompressor.flush()):
+            yield line
+    if parts:
+        yield b"".join(parts)
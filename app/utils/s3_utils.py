@@ -1,9 +1,11 @@
-import boto3
 import uuid
 import os
 from datetime import datetime
-from typing import Optional, Dict, Any
-from werkzeug.datastructures import FileStorage
+from typing import TYPE_CHECKING, Optional, Dict, Any
+
+if TYPE_CHECKING:
+    # Only used in annotations, not worth importing at runtime
+    from werkzeug.datastructures import FileStorage
 
 import logging
 
@@ -29,6 +31,9 @@ class S3ImageService:
        self.max_file_size = 10 * 1024 * 1024  # 10MB
        self.allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
        
+       # boto3 takes a few hundred ms to import, only pay it when a service is built
+       import boto3
+
        # Configure S3 client
        if aws_access_key_id and aws_secret_access_key:
            self.s3_client = boto3.client(
@@ -43,7 +48,7 @@ class S3ImageService:
        
        self.logger = logging.getLogger(__name__)
 
-   def _validate_file(self, file: FileStorage) -> Dict[str, Any]:
+   def _validate_file(self, file: 'FileStorage') -> Dict[str, Any]:
        """
        Validates the file before uploading
        
@@ -80,7 +85,7 @@ class S3ImageService:
        return '.' in filename and \
               filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
 
-   def upload_image(self, file: FileStorage, custom_prefix: str = None) -> Dict[str, Any]:
+   def upload_image(self, file: 'FileStorage', custom_prefix: str = None) -> Dict[str, Any]:
        """
        Uploads an image to S3
        
@@ -142,7 +147,13 @@ class S3ImageService:
                'error': f"Internal error: {str(e)}"
            }
 
-   def upload_from_bytes(self, image_bytes: bytes, filename: str, custom_prefix: str = None) -> Dict[str, Any]:
+   def upload_from_bytes(
+       self,
+       image_bytes: bytes,
+       filename: str,
+       custom_prefix: str = None,
+       metadata: Optional[Dict[str, str]] = None
+   ) -> Dict[str, Any]:
        """
        Uploads image from bytes (useful for base64, PIL, etc.)
        
@@ -150,6 +161,7 @@ class S3ImageService:
            image_bytes: Image bytes
            filename: Filename
            custom_prefix: Custom prefix
+           metadata: Extra S3 object metadata (optional)
            
        Returns:
            Dict with upload result
@@ -196,7 +208,8 @@ class S3ImageService:
                        'original_filename': filename,
                        'upload_date': datetime.now().isoformat(),
                        'file_size': str(len(image_bytes)),
-                       'source': 'bytes'
+                       'source': 'bytes',
+                       **(metadata or {})
                    }
                }
            )
@@ -248,3 +261,19 @@ class S3ImageService:
            return True
        except:
            return False
+
+   def get_image_metadata(self, object_key: str) -> Optional[Dict[str, str]]:
+       """
+       Gets the user metadata of an image in S3
+       
+       Args:
+           object_key: Object key
+           
+       Returns:
+           Dict with the metadata, None if the image does not exist
+       """
+       try:
+           response = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+           return response.get('Metadata', {})
+       except:
+           return None
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Optional 
 
 import jwt 
@@ -5,6 +6,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import SecurityScopes, HTTPAuthorizationCredentials, HTTPBearer 
 
 from app.config import get_settings 
+from app.utils.jwks import JWKSKeyStore, VerifiedTokenCache
 
 class UnauthorizedException(HTTPException):
     def __init__(self, detail: str, **kwargs):
@@ -20,13 +22,15 @@ class UnauthenticatedException(HTTPException):
 class VerifyToken:
   """Does all the token verification using PyJWT"""
 
-  def __init__(self):
+  def __init__(self, key_store: Optional[JWKSKeyStore] = None, token_cache: Optional[VerifiedTokenCache] = None):
     self.config = get_settings()
 
-    # This gets the JWKS from a given URL and does processing so you can
-    # use any of the keys available
+    # Signing keys by kid, prefetched and refreshed in the background once
+    # key_store.start() runs (see the app lifespan)
     jwks_url = f'https://{self.config.auth0_domain}/.well-known/jwks.json'
-    self.jwks_client = jwt.PyJWKClient(jwks_url)
+    self.key_store = key_store or JWKSKeyStore(jwks_url)
+    # Tokens seen before skip the signature check until they expire
+    self.token_cache = token_cache or VerifiedTokenCache()
  
 
   async def verify(self,
@@ -36,20 +40,25 @@ class VerifyToken:
     if token is None:
         raise UnauthenticatedException
 
+    payload = self.token_cache.get(token.credentials)
+    if payload is not None:
+        return payload
+
     # This gets the 'kid' from the passed token
     try:
-        signing_key = self.jwks_client.get_signing_key_from_jwt(
-            token.credentials
-        ).key
-    except jwt.exceptions.PyJWKClientError as error:
-        raise UnauthorizedException(str(error))
+        kid = jwt.get_unverified_header(token.credentials).get("kid")
+        signing_key = await self.key_store.get_key(kid)
     except jwt.exceptions.DecodeError as error:
         raise UnauthorizedException(str(error))
+    except Exception as error:
+        raise UnauthorizedException(f"Unable to fetch the signing keys: {error}")
+    if signing_key is None:
+        raise UnauthorizedException(f'Unable to find a signing key that matches: "{kid}"')
 
     try:
         payload = jwt.decode(
             token.credentials,
-            signing_key,
+            signing_key.key,
             algorithms=self.config.auth0_algorithms,
             audience=self.config.auth0_api_audience,
             issuer=self.config.auth0_issuer,
@@ -57,4 +66,10 @@ class VerifyToken:
     except Exception as error:
         raise UnauthorizedException(str(error))
 
-    return payload
\ No newline at end of file
+    self.token_cache.put(token.credentials, payload)
+    return payload
+
+@lru_cache()
+def get_verify_token() -> VerifyToken:
+  # Reads the settings on first use instead of when the app is imported
+  return VerifyToken()
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""Auth overhead per request: PyJWKClient + full decode vs the cached fast path
+
+Verifies tokens signed by a local RSA key, with the JWKS served from memory
+so no network is involved. "baseline" is the old VerifyToken.verify
+(get_signing_key_from_jwt + jwt.decode on every call), "first seen" is the
+new path for a token never verified before, "repeat" a token already in the
+verified-token cache.
+
+    python -m benchmarks.bench_auth --requests 5000 --users 200
+"""
+import argparse
+import asyncio
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.security import HTTPAuthorizationCredentials, SecurityScopes
+
+from app.config import get_settings
+from app.utils.jwks import JWKSKeyStore
+from app.utils.utils import VerifyToken
+
+
+def make_jwks_and_tokens(users: int):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    jwks = {"keys": [{**jwk, "kid": "bench", "use": "sig", "alg": "RS256"}]}
+    settings = get_settings()
+    tokens = [
+        jwt.encode(
+            {
+                "sub": f"auth0|{i}",
+                "aud": settings.auth0_api_audience,
+                "iss": settings.auth0_issuer,
+                "exp": int(time.time()) + 3600,
+            },
+            private_key,
+            algorithm="RS256",
+            headers={"kid": "bench"},
+        )
+        for i in range(users)
+    ]
+    return jwks, tokens
+
+
+def baseline_verify(jwks_client: jwt.PyJWKClient, token: str):
+    settings = get_settings()
+    signing_key = jwks_client.get_signing_key_from_jwt(token).key
+    return jwt.decode(
+        token,
+        signing_key,
+        algorithms=settings.auth0_algorithms,
+        audience=settings.auth0_api_audience,
+        issuer=settings.auth0_issuer,
+    )
+
+
+async def run_fast(verifier: VerifyToken, tokens, requests: int) -> float:
+    scopes = SecurityScopes()
+    credentials = [HTTPAuthorizationCredentials(scheme="Bearer", credentials=token) for token in tokens]
+    start = time.perf_counter()
+    for i in range(requests):
+        await verifier.verify(scopes, credentials[i % len(credentials)])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200, help="distinct tokens, reused round robin")
+    args = parser.parse_args()
+
+    jwks, tokens = make_jwks_and_tokens(args.users)
+
+    jwks_client = jwt.PyJWKClient("https://bench/.well-known/jwks.json")
+    jwks_client.fetch_data = lambda: jwks
+    start = time.perf_counter()
+    for i in range(args.requests):
+        baseline_verify(jwks_client, tokens[i % len(tokens)])
+    baseline = time.perf_counter() - start
+
+    key_store = JWKSKeyStore("https://bench/.well-known/jwks.json", fetch_jwks=lambda: jwks)
+    key_store.refresh()
+    verifier = VerifyToken(key_store=key_store)
+    first_seen = asyncio.run(run_fast(verifier, tokens, len(tokens)))
+    repeat = asyncio.run(run_fast(verifier, tokens, args.requests))
+
+    print(f"{args.requests} requests, {args.users} tokens")
+    print(f"baseline    {baseline / args.requests * 1e6:8.1f} us/request")
+    print(f"first seen  {first_seen / len(tokens) * 1e6:8.1f} us/request")
+    print(f"repeat      {repeat / args.requests * 1e6:8.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
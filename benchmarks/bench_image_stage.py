@@ -0,0 +1,109 @@
+"""Image stage throughput: sequential upload_img_from_url vs ImageUploadStage
+
+Serves fake images from local HTTP servers (one of them slow, like a
+struggling shop CDN) and uploads into an in-memory S3 stand-in.
+
+    python -m benchmarks.bench_image_stage --images 200 --latency 0.05
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.external_services.image_stage import ImageUploadStage
+from app.external_services.images import upload_img_from_url
+from app.utils.s3_utils import S3ImageService
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 20_000
+
+
+class InMemoryS3Client:
+    def __init__(self):
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        with self.lock:
+            self.objects[key] = fileobj.read()
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise KeyError(Key)
+        return {"ContentLength": len(self.objects[Key])}
+
+
+def start_image_server(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(PNG_BYTES)))
+            self.end_headers()
+            self.wfile.write(PNG_BYTES)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_s3_service() -> S3ImageService:
+    service = S3ImageService(
+        bucket_name="bench",
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench",
+    )
+    service.s3_client = InMemoryS3Client()
+    return service
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--per-host", type=int, default=2)
+    args = parser.parse_args()
+
+    servers = [start_image_server(args.latency) for _ in range(3)]
+    servers.append(start_image_server(args.slow_latency))
+    jobs = []
+    for i in range(args.images):
+        port = servers[i % len(servers)].server_address[1]
+        jobs.append({
+            "key": i,
+            "img_url": f"http://127.0.0.1:{port}/img/{i}.png",
+            "filename": f"product_{i}.png",
+            "game_prefix": "pokemon",
+        })
+
+    s3_service = make_s3_service()
+    start = time.perf_counter()
+    for job in jobs:
+        upload_img_from_url(job["img_url"], job["filename"], job["game_prefix"], s3_service)
+    sequential = time.perf_counter() - start
+
+    s3_service = make_s3_service()
+    stage = ImageUploadStage(s3_service, max_workers=args.workers, max_per_host=args.per_host)
+    start = time.perf_counter()
+    first_result = None
+    for _ in stage.run(jobs):
+        if first_result is None:
+            first_result = time.perf_counter() - start
+    concurrent = time.perf_counter() - start
+
+    print(f"images: {args.images}, workers: {args.workers}, per host: {args.per_host}")
+    print(f"sequential: {sequential:.2f}s ({args.images / sequential:.1f} img/s)")
+    print(f"stage:      {concurrent:.2f}s ({args.images / concurrent:.1f} img/s), first result after {first_result:.3f}s")
+    print(f"speedup:    {sequential / concurrent:.1f}x")
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
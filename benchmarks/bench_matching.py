@@ -0,0 +1,88 @@
+"""Near-duplicate lookups: blocked ProductMatcher.find_similar vs comparing every known key
+
+Builds a catalog of distinct product names, then looks up a misspelt
+variant of some of them, the way another store lists the same product.
+"all pairs" scores each lookup against every key of the catalog, "blocked"
+only against the keys sharing a scope + token prefix or distinguishing
+tokens block.
+
+    python -m benchmarks.bench_matching --products 50000 --lookups 2000
+"""
+import argparse
+import random
+import time
+
+from app.search.index import word_grams
+from app.search.matching import DEFAULT_MATCH_THRESHOLD, ProductMatcher, distinguishing_tokens, is_distinguishing_token
+from app.utils.parsing import make_match_key
+
+SETS = ["Prismatic Evolutions", "Temporal Forces", "Twilight Masquerade", "Surging Sparks", "Paldean Fates",
+        "Obsidian Flames", "Paradox Rift", "Stellar Crown", "Shrouded Fable", "Journey Together"]
+KINDS = ["Booster", "Elite Trainer Box", "Booster Bundle", "Collection Box", "Tin", "Blister"]
+POKEMON = ["Charizard", "Pikachu", "Mewtwo", "Lugia", "Eevee", "Gengar", "Rayquaza", "Umbreon", "Sylveon", "Greninja"]
+
+
+def catalog(count, rng):
+    names = set()
+    while len(names) < count:
+        names.add(f"Pokémon TCG {rng.choice(SETS)} {rng.choice(KINDS)} {rng.choice(POKEMON)} {rng.randint(1, 500)}")
+    return sorted(names)
+
+
+def variant(name, rng):
+    # Lowercase, no punctuation, one set or Pokémon word missing a letter;
+    # packaging words and numbers tell products apart, so they are kept
+    words = name.replace("Pokémon TCG ", "pokemon ").lower().split()
+    i = rng.choice([i for i, word in enumerate(words[1:], start=1) if len(word) >= 5 and not is_distinguishing_token(word)])
+    words[i] = words[i][:2] + words[i][3:]
+    return " ".join(words)
+
+
+def all_pairs(keys, key):
+    distinguishing = distinguishing_tokens(key)
+    grams = word_grams(key.partition(":")[2])
+    best, best_score = None, DEFAULT_MATCH_THRESHOLD
+    for candidate in keys:
+        if candidate == key or distinguishing_tokens(candidate) != distinguishing:
+            continue
+        other = word_grams(candidate.partition(":")[2])
+        score = len(grams & other) / len(grams | other)
+        if score > best_score or (best is None and score == best_score):
+            best, best_score = candidate, score
+    return best
+
+
+def run(label, find, lookups, expected):
+    start = time.perf_counter()
+    found = [find(key) for key in lookups]
+    elapsed = time.perf_counter() - start
+    hits = sum(1 for key, want in zip(found, expected) if key == want)
+    print(f"{label:10} {elapsed:8.2f}s {elapsed / len(lookups) * 1000:9.3f}ms/lookup  {hits}/{len(lookups)} matched")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--all-pairs-lookups", type=int, default=50, help="all pairs is slow, so it only runs this many")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    names = catalog(args.products, rng)
+    keys = [make_match_key(name, "pokemon", "booster") for name in names]
+    sample = rng.sample(range(len(names)), k=min(args.lookups, len(names)))
+    lookups = [make_match_key(variant(names[i], rng), "pokemon", "booster") for i in sample]
+    expected = [keys[i] for i in sample]
+
+    start = time.perf_counter()
+    matcher = ProductMatcher()
+    matcher.add_all((key, product_id) for product_id, key in enumerate(keys, start=1))
+    print(f"{len(keys)} keys loaded in {time.perf_counter() - start:.2f}s, {len(matcher.blocks)} blocks")
+
+    run("blocked", lambda key: (matcher.find_similar(key) or (None,))[0], lookups, expected)
+    n = args.all_pairs_lookups
+    run("all pairs", lambda key: all_pairs(keys, key), lookups[:n], expected[:n])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Prices table size and latest-offer query latency: append vs change_only storage
+
+Replays the same scrape history (most prices unchanged between rounds) into
+two SQLite databases, one per PRICE_STORAGE_MODE, and times the
+latest-price-per-store query used by GET /products/{id}.
+
+    python -m benchmarks.bench_price_storage --products 500 --stores 5 --rounds 60
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app.cruds import price_crud
+from app.models.models import Prices, Products, Stores
+
+
+def latest_prices(db, product_id):
+    latest = (
+        db.query(Prices.store_id, func.max(Prices.scrapped_at).label("max_scrapped_at"))
+        .filter(Prices.product_id == product_id)
+        .group_by(Prices.store_id)
+        .subquery()
+    )
+    return (
+        db.query(Prices, Stores)
+        .join(Stores, Prices.store_id == Stores.id)
+        .join(
+            latest,
+            (Prices.store_id == latest.c.store_id) & (Prices.scrapped_at == latest.c.max_scrapped_at)
+        )
+        .filter(Prices.product_id == product_id)
+        .all()
+    )
+
+
+def run(mode, args, directory):
+    path = os.path.join(directory, f"{mode}.sqlite3")
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    price_crud.PRICE_STORAGE_MODE = mode
+    rng = random.Random(42)
+
+    with Session() as db:
+        db.add_all(Stores(name=f"Store {i}", website_url=f"https://store{i}.cl") for i in range(args.stores))
+        db.add_all(Products(name=f"Product {i}", game="pokemon", product_type="booster") for i in range(args.products))
+        db.commit()
+
+        current = {
+            (product_id, store_id): rng.randint(1000, 50000)
+            for product_id in range(1, args.products + 1)
+            for store_id in range(1, args.stores + 1)
+        }
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            observations = []
+            for (product_id, store_id), price in current.items():
+                if rng.random() < args.change_rate:
+                    price = current[(product_id, store_id)] = rng.randint(1000, 50000)
+                observations.append({
+                    "product_id": product_id,
+                    "store_id": store_id,
+                    "price": price,
+                    "url": f"https://store{store_id}.cl/p/{product_id}",
+                })
+            price_crud.record_price_observations(db, observations)
+            db.commit()
+        write_time = time.perf_counter() - start
+
+        rows = db.query(Prices).count()
+        product_ids = [rng.randint(1, args.products) for _ in range(args.queries)]
+        start = time.perf_counter()
+        for product_id in product_ids:
+            latest_prices(db, product_id)
+        query_ms = (time.perf_counter() - start) / args.queries * 1000
+
+    engine.dispose()
+    return rows, os.path.getsize(path), write_time, query_ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--stores", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=60)
+    parser.add_argument("--change-rate", type=float, default=0.05)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{args.products} products x {args.stores} stores x {args.rounds} rounds, "
+              f"{args.change_rate:.0%} of prices change per round")
+        for mode in (price_crud.APPEND, price_crud.CHANGE_ONLY):
+            rows, size, write_time, query_ms = run(mode, args, directory)
+            print(f"{mode:12} rows: {rows:>9}  size: {size / 1024 / 1024:7.1f} MB  "
+                  f"ingest: {write_time:6.2f}s  latest-per-store query: {query_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Cold start cost: import time of app.main and time to the first response
+
+Every run is a fresh interpreter. "import" times `import app.main` alone,
+"first response" starts uvicorn and polls until the first 200 comes back,
+measured from process spawn. "eager" also builds the S3 service and the
+token verifier right after the import, which is what importing the app used
+to do before they became lazy.
+
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --runs 5 --path /products
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+if {eager}:
+    from app.routers.scrapper_router import get_s3_service
+    from app.utils.utils import get_verify_token
+    get_s3_service()
+    get_verify_token()
+built = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "total": built - start,
+    "boto3": "boto3" in sys.modules,
+    "werkzeug": "werkzeug" in sys.modules,
+}}))
+"""
+
+# Dummy settings: nothing is contacted, the clients only have to be constructible
+BENCH_ENV = {
+    "AWS_ACCESS_KEY_ID": "bench",
+    "AWS_SECRET_ACCESS_KEY": "bench",
+    "AUTH0_DOMAIN": "bench.auth0.com",
+    "AUTH0_API_AUDIENCE": "bench",
+    "AUTH0_ISSUER": "https://bench.auth0.com/",
+    "AUTH0_ALGORITHMS": "RS256",
+    "AUTH0_CLIENT_ID": "bench",
+    "AUTH0_CLIENT_SECRET": "bench",
+}
+
+
+def bench_env(database_url: str) -> dict:
+    env = {**BENCH_ENV, **os.environ}
+    env.setdefault("DATABASE_URL", database_url)
+    return env
+
+def measure_import(env: dict, eager: bool) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(eager=eager)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_first_response(env: dict, path: str, timeout: float = 30) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - start < timeout:
+                try:
+                    if client.get(path).status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise TimeoutError(f"No 200 from {path} after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+def report(name: str, seconds: list) -> None:
+    print(f"{name:16} median {statistics.median(seconds) * 1000:7.1f} ms   min {min(seconds) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--path", default="/", help="endpoint requested for the first response")
+    parser.add_argument("--database-url", default=f"sqlite:///{tempfile.gettempdir()}/bench_startup.sqlite3")
+    args = parser.parse_args()
+
+    env = bench_env(args.database_url)
+    lazy = [measure_import(env, eager=False) for _ in range(args.runs)]
+    eager = [measure_import(env, eager=True) for _ in range(args.runs)]
+    first_response = [measure_first_response(env, args.path) for _ in range(args.runs)]
+
+    print(f"{args.runs} runs, first request GET {args.path}")
+    report("import", [run["import"] for run in lazy])
+    report("import + eager", [run["total"] for run in eager])
+    report("first response", first_response)
+    print(f"loaded on import: boto3={lazy[0]['boto3']} werkzeug={lazy[0]['werkzeug']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import time
+
+from app.cache.response_cache import MemoryCacheBackend, ResponseCache, cache_key, product_tag
+from app.models.models import ProductSortEnum
+
+
+def test_cache_key_ignores_unset_params_and_order():
+    assert cache_key("products", sort=ProductSortEnum.NAME, limit=10, name=None) == \
+        cache_key("products", limit=10, sort="name")
+
+
+def test_invalidating_a_tag_drops_only_its_entries():
+    cache = ResponseCache(MemoryCacheBackend(), ttl=60)
+    cache.put("product?product_id=1", {"id": 1}, cache.snapshot(product_tag(1)))
+    cache.put("product?product_id=2", {"id": 2}, cache.snapshot(product_tag(2)))
+
+    cache.invalidate(product_tag(1))
+
+    assert cache.get("product?product_id=1") is None
+    assert cache.get("product?product_id=2").body == b'{"id":2}'
+    assert cache.stats()["endpoints"]["product"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_write_during_the_read_is_not_cached_as_fresh():
+    cache = ResponseCache(MemoryCacheBackend(), ttl=60)
+    versions = cache.snapshot(product_tag(1))
+    cache.invalidate(product_tag(1))
+    cache.put("product?product_id=1", {"id": 1, "stale": True}, versions)
+
+    assert cache.get("product?product_id=1") is None
+
+
+def test_entries_expire_and_lru_evicts():
+    backend = MemoryCacheBackend(max_entries=2)
+    cache = ResponseCache(backend, ttl=0.05)
+    for product_id in range(3):
+        cache.put(f"product?product_id={product_id}", {"id": product_id}, cache.snapshot())
+
+    assert len(backend) == 2
+    assert cache.get("product?product_id=0") is None
+    time.sleep(0.06)
+    assert cache.get("product?product_id=2") is None
+
+
+def test_zero_ttl_disables_the_cache():
+    cache = ResponseCache(MemoryCacheBackend(), ttl=0)
+    response = cache.put("product?product_id=1", {"id": 1}, cache.snapshot())
+
+    assert response.body == b'{"id":1}'
+    assert cache.get("product?product_id=1") is None
+
+
+def test_memory_cache_is_not_shared():
+    # The API checks its hits against the database: invalidations from other processes don't reach it
+    assert ResponseCache(MemoryCacheBackend()).shared is False
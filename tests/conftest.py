@@ -1,17 +1,38 @@
+import os
+import tempfile
+
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool
 from sqlmodel import SQLModel
 from typing import Iterator
 
+from app.cache.response_cache import get_response_cache
 from app.models.models import Prices, Products, Stores
 
+# File database so the sync engine (fixtures) and the aiosqlite engine
+# (routers) see the same data
+_, DB_PATH = tempfile.mkstemp(suffix=".sqlite3")
+
 engine = create_engine(
-    "sqlite:///:memory:",
+    f"sqlite:///{DB_PATH}",
     connect_args={"check_same_thread": False},
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: TestClient runs every request on its own event loop
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def db_file():
+    yield DB_PATH
+    engine.dispose()
+    os.remove(DB_PATH)
+
 
 @pytest.fixture(name="db", scope="function")
 def db_fixture() -> Iterator[Session]:
@@ -23,3 +44,16 @@ def db_fixture() -> Iterator[Session]:
     finally:
         session.close()
         SQLModel.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(autouse=True)
+def response_cache():
+    # Every test gets an empty cache: ids restart with each fresh database
+    get_response_cache.cache_clear()
+    yield get_response_cache()
+    get_response_cache.cache_clear()
+
+
+@pytest.fixture
+def async_session_factory(db: Session):
+    return TestingAsyncSessionLocal
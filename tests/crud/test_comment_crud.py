@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from app.cruds.comment_crud import comment_cursor, create_comment, get_comments_by_product_id
+from app.models.models import Comments, Products
+
+def test_comments_are_paged_newest_first(db: Session):
+    product = Products(name="Booster A", game="pokemon", product_type="booster")
+    other = Products(name="Booster B", game="pokemon", product_type="booster")
+    db.add_all([product, other])
+    db.commit()
+    # Same date on every comment: the id breaks the tie
+    date = datetime(2025, 7, 1, tzinfo=timezone.utc)
+    db.add_all([Comments(user=f"user{i}", product_id=product.id, text=f"{i}", date=date) for i in range(3)])
+    db.add(Comments(user="late", product_id=product.id, text="late", date=date + timedelta(days=1)))
+    db.commit()
+    create_comment(db, user="other", product_id=other.id, text="other")
+
+    texts = []
+    cursor = None
+    while True:
+        page = get_comments_by_product_id(db, product.id, limit=2, cursor=cursor)
+        texts += [comment.text for comment in page]
+        if len(page) < 2:
+            break
+        cursor = comment_cursor(page[-1])
+    assert texts == ["late", "2", "1", "0"]
+
+    rows = get_comments_by_product_id(db, product.id, limit=1, as_rows=True)
+    assert rows[0].text == "late"
+    db.refresh(other)
+    assert other.comment_count == 1
@@ -1,6 +1,13 @@
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from app.cruds.price_crud import create_price
-from app.models.models import Products, Stores
+from app.cruds.price_crud import (
+    create_price,
+    get_latest_prices_by_product,
+    get_price_rows_with_stores,
+    rebuild_current_prices,
+    record_price_observations
+)
+from app.models.models import CurrentPrices, Products, Stores, Prices
 
 def test_create_price_with_no_min_price(db: Session):
     product = Products(name="Test Product", description="A product for testing", game="Test Game", product_type="Test Type")
@@ -46,4 +53,102 @@ def test_create_price_higher_than_min_price(db: Session):
 
     db.refresh(product)
     assert new_price.price == 350
-    assert product.min_price == 300
+    assert product.min_price == 350
+    assert product.offer_count == 1
+
+def test_create_price_unchanged_only_extends_current_row(db: Session):
+    product = Products(name="Test Product 4", game="Test Game", product_type="Test Type")
+    store = Stores(name="Test Store 4", website_url="http://teststore4.com")
+    db.add(product)
+    db.add(store)
+    db.commit()
+
+    first = create_price(db, product_id=product.id, store_id=store.id, price=400, url="http://teststore4.com/product")
+    first_seen_at = first.scrapped_at
+    db.query(Prices).filter(Prices.id == first.id).update(
+        {Prices.last_seen_at: first_seen_at - timedelta(days=1)}
+    )
+    db.commit()
+
+    repeated = create_price(db, product_id=product.id, store_id=store.id, price=400, url="http://teststore4.com/product")
+    assert repeated.id == first.id
+    assert repeated.scrapped_at == first_seen_at
+    assert repeated.last_seen_at >= first_seen_at
+
+    changed = create_price(db, product_id=product.id, store_id=store.id, price=380, url="http://teststore4.com/product")
+    assert changed.id != first.id
+    assert db.query(Prices).filter(Prices.product_id == product.id).count() == 2
+
+def test_current_prices_follow_new_rows(db: Session):
+    product = Products(name="Test Product 5", game="Test Game", product_type="Test Type")
+    store = Stores(name="Test Store 5", website_url="http://teststore5.com")
+    other_store = Stores(name="Test Store 6", website_url="http://teststore6.com")
+    db.add_all([product, store, other_store])
+    db.commit()
+
+    create_price(db, product_id=product.id, store_id=store.id, price=500, url="http://teststore5.com/product")
+    record_price_observations(db, [
+        {"product_id": product.id, "store_id": store.id, "price": 450, "url": "http://teststore5.com/product"},
+        {"product_id": product.id, "store_id": other_store.id, "price": 700, "url": "http://teststore6.com/product"},
+        {"product_id": product.id, "store_id": other_store.id, "price": 650, "url": "http://teststore6.com/product"},
+    ])
+    db.commit()
+
+    latest = get_latest_prices_by_product(db, product.id)
+    assert [(current.store_id, current.price) for current, _ in latest] == [(store.id, 450), (other_store.id, 650)]
+    for current, current_store in latest:
+        assert db.get(Prices, current.price_id).price == current.price
+        assert current_store.id == current.store_id
+
+def test_change_only_keeps_one_listing_per_store(db: Session):
+    product = Products(name="Test Product 7", game="Test Game", product_type="Test Type")
+    store = Stores(name="Test Store 8", website_url="http://teststore8.com")
+    db.add_all([product, store])
+    db.commit()
+
+    written = record_price_observations(db, [
+        {"product_id": product.id, "store_id": store.id, "price": 300, "url": "http://teststore8.com/product"},
+        {"product_id": product.id, "store_id": store.id, "price": 350, "url": "http://teststore8.com/product-foil"},
+    ])
+    db.commit()
+
+    assert [observation["url"] for observation in written] == ["http://teststore8.com/product-foil"]
+    assert db.query(Prices).filter(Prices.product_id == product.id).count() == 1
+    assert db.query(CurrentPrices).filter(CurrentPrices.product_id == product.id).one().price == 350
+
+def test_latest_prices_leave_out_stale_offers(db: Session):
+    product = Products(name="Test Product 8", game="Test Game", product_type="Test Type")
+    store = Stores(name="Test Store 9", website_url="http://teststore9.com")
+    stale_store = Stores(name="Test Store 10", website_url="http://teststore10.com")
+    db.add_all([product, store, stale_store])
+    db.commit()
+    create_price(db, product_id=product.id, store_id=store.id, price=500, url="http://teststore9.com/product")
+    create_price(db, product_id=product.id, store_id=stale_store.id, price=400, url="http://teststore10.com/product")
+    db.query(CurrentPrices).filter(CurrentPrices.store_id == stale_store.id).update(
+        {CurrentPrices.last_seen_at: datetime.now(timezone.utc) - timedelta(days=30)}
+    )
+    db.commit()
+
+    latest = get_price_rows_with_stores(db, product.id, latest_only=True)
+    assert [row.store_id for row in latest] == [store.id]
+    # The history still has both
+    assert len(get_price_rows_with_stores(db, product.id)) == 2
+
+def test_rebuild_current_prices(db: Session):
+    product = Products(name="Test Product 6", game="Test Game", product_type="Test Type")
+    store = Stores(name="Test Store 7", website_url="http://teststore7.com")
+    db.add_all([product, store])
+    db.commit()
+    db.add_all([
+        Prices(product_id=product.id, store_id=store.id, price=900, url="http://teststore7.com/product"),
+        Prices(product_id=product.id, store_id=store.id, price=800, url="http://teststore7.com/product"),
+    ])
+    db.commit()
+    assert db.query(CurrentPrices).count() == 0
+
+    assert rebuild_current_prices(db) == 1
+    db.commit()
+
+    current = db.query(CurrentPrices).one()
+    assert current.price == 800
+    assert current.price_id == db.query(Prices).filter(Prices.price == 800).one().id
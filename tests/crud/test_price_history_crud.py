@@ -0,0 +1,119 @@
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from sqlalchemy.orm import Session
+from app.cruds.price_crud import rebuild_current_prices
+from app.cruds.price_history_crud import (
+    get_price_history,
+    get_pruned_before,
+    get_rollup_watermark,
+    prune_price_rows,
+    rollup_daily_prices
+)
+from app.models.models import CurrentPrices, PriceBucketEnum, PriceDailyRollups, Prices, Products, Stores
+
+DAY_ONE = datetime(2025, 7, 7, tzinfo=timezone.utc)
+
+
+def summary(history):
+    return {key: (day["min"], day["max"], day["weighted_sum"] / day["weight"], day["last"]) for key, day in history.items()}
+
+
+def seed_history(db: Session):
+    product = Products(name="History Product", game="Test Game", product_type="Test Type")
+    store = Stores(name="History Store", website_url="http://historystore.com")
+    db.add(product)
+    db.add(store)
+    db.commit()
+    # Change-only rows: 1000 for the first 36 hours, then 400 until day three noon
+    db.add_all([
+        Prices(product_id=product.id, store_id=store.id, price=1000, url="http://historystore.com/p",
+               scrapped_at=DAY_ONE, last_seen_at=DAY_ONE + timedelta(hours=36)),
+        Prices(product_id=product.id, store_id=store.id, price=400, url="http://historystore.com/p",
+               scrapped_at=DAY_ONE + timedelta(hours=36), last_seen_at=DAY_ONE + timedelta(hours=60)),
+    ])
+    db.commit()
+    return product, store
+
+
+def test_day_buckets_spread_change_only_rows(db: Session):
+    product, store = seed_history(db)
+
+    history = get_price_history(db, product.id, PriceBucketEnum.DAY, DAY_ONE, DAY_ONE + timedelta(days=3))
+
+    first, second, third = (history[(store.id, DAY_ONE + timedelta(days=n))] for n in range(3))
+    assert (first["min"], first["max"], first["last"]) == (1000, 1000, 1000)
+    assert (second["min"], second["max"], second["last"]) == (400, 1000, 400)
+    assert second["weighted_sum"] / second["weight"] == 700
+    assert (third["min"], third["max"]) == (400, 400)
+
+
+def test_rollups_and_raw_rows_give_the_same_history(db: Session):
+    product, store = seed_history(db)
+    end = DAY_ONE + timedelta(days=3)
+    raw = summary(get_price_history(db, product.id, PriceBucketEnum.DAY, DAY_ONE, end))
+
+    written = rollup_daily_prices(db, DAY_ONE.date(), date(2025, 7, 8), batch_size=1)
+
+    assert written == 2
+    assert get_rollup_watermark(db) == date(2025, 7, 8)
+    assert db.query(PriceDailyRollups).count() == 2
+    # Days one and two come from the rollups, day three from the raw rows
+    assert summary(get_price_history(db, product.id, PriceBucketEnum.DAY, DAY_ONE, end)) == raw
+    # Re-rolling the same days replaces the rows
+    rollup_daily_prices(db, DAY_ONE.date(), date(2025, 7, 8))
+    assert db.query(PriceDailyRollups).count() == 2
+
+
+def test_a_rolled_up_day_is_clipped_to_the_range_end(db: Session):
+    product, store = seed_history(db)
+    rollup_daily_prices(db, DAY_ONE.date(), date(2025, 7, 8))
+
+    # Day two is rolled up, but the range ends before its price drop at hour 36
+    history = get_price_history(db, product.id, PriceBucketEnum.DAY, DAY_ONE, DAY_ONE + timedelta(hours=30))
+
+    assert sorted(at for _, at in history) == [DAY_ONE, DAY_ONE + timedelta(days=1)]
+    second = history[(store.id, DAY_ONE + timedelta(days=1))]
+    assert (second["min"], second["max"], second["last"]) == (1000, 1000, 1000)
+    assert second["weight"] == 6 * 3600
+
+
+def test_week_buckets_merge_days(db: Session):
+    product, store = seed_history(db)
+    rollup_daily_prices(db, DAY_ONE.date(), DAY_ONE.date())
+
+    history = get_price_history(db, product.id, PriceBucketEnum.WEEK, DAY_ONE + timedelta(hours=5), DAY_ONE + timedelta(days=7))
+
+    week = history[(store.id, DAY_ONE)]
+    assert (week["min"], week["max"], week["last"]) == (400, 1000, 400)
+    assert week["weighted_sum"] / week["weight"] == (1000 * 36 + 400 * 24) / 60
+
+
+def test_prune_keeps_history_in_the_rollups(db: Session):
+    product, store = seed_history(db)
+    rebuild_current_prices(db)
+    db.commit()
+    end = DAY_ONE + timedelta(days=3)
+    before = summary(get_price_history(db, product.id, PriceBucketEnum.DAY, DAY_ONE, end))
+    cutoff = DAY_ONE + timedelta(days=3)
+
+    deleted = prune_price_rows(db, cutoff, batch_size=1)
+
+    # The 1000 row is gone, the 400 one is still the current price
+    assert deleted == 1
+    assert [price.price for price in db.query(Prices).all()] == [400]
+    assert db.query(CurrentPrices).one().price == 400
+    assert get_pruned_before(db) == cutoff
+    assert get_rollup_watermark(db) == date(2025, 7, 9)
+    assert summary(get_price_history(db, product.id, PriceBucketEnum.DAY, DAY_ONE, end)) == before
+    # Running it again is a no-op
+    assert prune_price_rows(db, cutoff) == 0
+
+
+def test_pruned_days_cannot_be_rolled_up_or_read_hourly(db: Session):
+    product, store = seed_history(db)
+    prune_price_rows(db, DAY_ONE + timedelta(days=3))
+
+    with pytest.raises(ValueError):
+        rollup_daily_prices(db, DAY_ONE.date(), DAY_ONE.date())
+    with pytest.raises(ValueError):
+        get_price_history(db, product.id, PriceBucketEnum.HOUR, DAY_ONE, DAY_ONE + timedelta(days=1))
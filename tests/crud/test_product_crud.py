@@ -1,13 +1,20 @@
+import pytest
 
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
 from typing import List
 from app.cruds.product_crud import (
     get_products,
     get_product_by_id,
+    get_product_version,
     create_product,
-    create_products_bulk
+    create_products_bulk,
+    product_cursor,
+    refresh_product_offers
 )
-from app.models.models import Products
+from app.models.models import CurrentPrices, Prices, Products, ProductSortEnum, Stores
+from app.schema.product_schemas import ProductCreate
+from app.utils.pagination import encode_cursor
 
 def test_create_product(db: Session):
     product_data = {
@@ -85,11 +92,141 @@ def test_create_products_bulk(db: Session):
         Products(name="Bulk 2", game="Bulk Game", product_type="Bulk Type"),
     ]
 
-    created_products = create_products_bulk(db, products_to_create)
+    created_ids = create_products_bulk(db, products_to_create)
 
-    assert len(created_products) == 2
-    assert created_products[0].id is not None
-    assert created_products[1].id is not None
+    assert len(created_ids) == 2
+    assert None not in created_ids
 
     all_products = get_products(db, game="Bulk Game")
     assert len(all_products) == 2
+
+def test_create_products_bulk_upserts_by_product_key(db: Session):
+    catalog = [
+        ProductCreate(name="Pokémon Booster", game="pokemon", product_type="booster", img_url="https://cdn/a.png", min_price=100),
+        ProductCreate(name="Magic Bundle", game="magic-the-gathering", product_type="bundle"),
+        ProductCreate(name="pokemon  booster", game="pokemon", product_type="booster", description="Updated"),
+        ProductCreate(name="Pokemon Booster", game="other", product_type="booster"),
+    ]
+
+    first = create_products_bulk(db, catalog, chunk_size=2)
+    # Chunk 2 updates the product created by chunk 1 under another spelling
+    assert len(first) == 4
+    assert first[0] == first[2]
+    assert get_product_by_id(db, first[0]).name == "pokemon  booster"
+    assert db.query(Products).count() == 3
+
+    again = create_products_bulk(db, [
+        ProductCreate(name="Pokémon Booster", game="pokemon", product_type="booster", description="First", min_price=900),
+        ProductCreate(name="Pokémon Booster", game="pokemon", product_type="booster", description="Last"),
+    ])
+    assert len(again) == 1
+    assert db.query(Products).count() == 3
+    product = get_product_by_id(db, first[0])
+    db.refresh(product)
+    # Last duplicate wins; the image is kept and min_price stays with the offers
+    assert (product.description, product.img_url, product.min_price) == ("Last", "https://cdn/a.png", 100)
+
+def test_create_products_bulk_keeps_product_types_and_editions_apart(db: Session):
+    [booster] = create_products_bulk(db, [ProductCreate(name="Pokémon Booster", game="pokemon", product_type="booster")])
+
+    others = create_products_bulk(db, [
+        ProductCreate(name="Pokémon Booster", game="pokemon", product_type="bundle"),
+        ProductCreate(name="Pokémon Booster", game="pokemon", product_type="booster", edition="SV"),
+        ProductCreate(name="Pokémon Booster", game="pokemon", product_type="booster", edition="sv"),
+        ProductCreate(name="Pokémon Booster", game="pokemon", product_type="booster", edition="151"),
+    ])
+
+    assert len(set(others)) == 3
+    assert booster not in others
+    assert db.query(Products).count() == 4
+
+def test_create_products_bulk_changes_the_product_version_only_on_changes(db: Session):
+    catalog = [ProductCreate(name="Pokémon Booster", game="pokemon", product_type="booster", description="SV")]
+    [product_id] = create_products_bulk(db, catalog)
+    version = get_product_version(db, product_id)
+
+    create_products_bulk(db, catalog)
+    assert get_product_version(db, product_id) == version
+
+    create_products_bulk(db, [ProductCreate(name="Pokémon Booster", game="pokemon", product_type="booster", description="SV2")])
+    assert get_product_version(db, product_id) != version
+
+def test_refresh_product_offers_fixes_drift(db: Session):
+    store = Stores(name="Store", website_url="https://store.cl")
+    other_store = Stores(name="Other", website_url="https://other.cl")
+    drifted = Products(name="Drifted", game="pokemon", product_type="booster", min_price=100, offer_count=5)
+    correct = Products(name="Correct", game="pokemon", product_type="booster", min_price=700, offer_count=1)
+    stale = Products(name="Stale", game="pokemon", product_type="booster", min_price=300, offer_count=1)
+    db.add_all([store, other_store, drifted, correct, stale])
+    db.commit()
+
+    now = datetime.now(timezone.utc)
+    rows = [
+        (drifted, store, 500, now),
+        (drifted, other_store, 400, now),
+        (correct, store, 700, now),
+        (stale, store, 300, now - timedelta(days=60)),
+    ]
+    for product, offer_store, price, seen_at in rows:
+        db_price = Prices(product_id=product.id, store_id=offer_store.id, price=price, url="https://store.cl/p",
+                          scrapped_at=seen_at, last_seen_at=seen_at)
+        db.add(db_price)
+        db.flush()
+        db.add(CurrentPrices(product_id=product.id, store_id=offer_store.id, price_id=db_price.id, price=price,
+                             url=db_price.url, scrapped_at=seen_at, last_seen_at=seen_at))
+    db.commit()
+
+    assert refresh_product_offers(db) == 2
+    db.commit()
+
+    db.refresh(drifted)
+    db.refresh(correct)
+    db.refresh(stale)
+    assert (drifted.min_price, drifted.offer_count) == (400, 2)
+    assert (correct.min_price, correct.offer_count) == (700, 1)
+    assert (stale.min_price, stale.offer_count) == (None, 0)
+
+def test_get_products_cursor_pages_match_offset_order(db: Session):
+    now = datetime.now(timezone.utc)
+    prices = [300, None, 100, 300, None, 200, 100]
+    for i, price in enumerate(prices):
+        db.add(Products(name=f"Product {len(prices) - i}", game="pokemon", product_type="booster",
+                        min_price=price, updated_at=now - timedelta(minutes=i % 3)))
+    db.commit()
+
+    for sort in ProductSortEnum:
+        expected = [product.id for product in get_products(db, sort=sort)]
+        seen = []
+        cursor = None
+        while True:
+            page = get_products(db, sort=sort, cursor=cursor, limit=2)
+            seen += [product.id for product in page]
+            if len(page) < 2:
+                break
+            cursor = product_cursor(page[-1], sort)
+        assert seen == expected, sort
+
+    by_price = get_products(db, sort=ProductSortEnum.PRICE_ASC)
+    assert [product.min_price for product in by_price] == [100, 100, 200, 300, 300, None, None]
+    assert get_products(db, sort=ProductSortEnum.NAME, skip=2, limit=1)[0].name == "Product 3"
+
+def test_get_products_rejects_foreign_cursor(db: Session):
+    product = create_product(db, name="Product A", game="Game 1", product_type="Type X", min_price=10)
+
+    with pytest.raises(ValueError):
+        get_products(db, sort=ProductSortEnum.NAME, cursor=product_cursor(product, ProductSortEnum.PRICE_ASC))
+    with pytest.raises(ValueError):
+        get_products(db, cursor="not-a-cursor")
+
+@pytest.mark.parametrize("sort, values", [
+    (ProductSortEnum.ID, ["1"]),
+    (ProductSortEnum.ID, [True]),
+    (ProductSortEnum.PRICE_ASC, ["cheap", 1]),
+    (ProductSortEnum.PRICE_DESC, [100, None]),
+    (ProductSortEnum.NAME, [{"name": "a"}, 1]),
+    (ProductSortEnum.UPDATED, [1700000000, 1]),
+    (ProductSortEnum.UPDATED, ["yesterday", 1]),
+])
+def test_get_products_rejects_cursor_values_of_the_wrong_type(db: Session, sort, values):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        get_products(db, sort=sort, cursor=encode_cursor(sort.value, values))
@@ -0,0 +1,30 @@
+from sqlalchemy.orm import Session
+from app.cruds.review_crud import get_one_review, upsert_review
+from app.cruds.store_crud import create_store, get_store_rating
+from app.models.models import Reviews
+
+def test_upsert_review_keeps_store_rating_in_sync(db: Session):
+    store = create_store(db, name="StoreOne", website_url="https://storeone.cl")
+    other = create_store(db, name="StoreTwo", website_url="https://storetwo.cl")
+
+    first, created = upsert_review(db, user="ana", store_id=store.id, rating=4)
+    assert created
+    assert upsert_review(db, user="bruno", store_id=store.id, rating=2)[1]
+    upsert_review(db, user="ana", store_id=other.id, rating=5)
+
+    updated, created = upsert_review(db, user="ana", store_id=store.id, rating=1)
+    assert not created
+    assert updated.id == first.id and updated.rating == 1
+    assert db.query(Reviews).filter(Reviews.store_id == store.id).count() == 2
+
+    rating = get_store_rating(db, store.id)
+    assert (rating.rating_count, rating.rating_sum) == (2, 3)
+    assert (get_store_rating(db, other.id).rating_count, get_store_rating(db, other.id).rating_sum) == (1, 5)
+    assert get_store_rating(db, 999) is None
+
+def test_get_one_review_matches_store_and_user(db: Session):
+    store = create_store(db, name="StoreOne", website_url="https://storeone.cl")
+    upsert_review(db, user="ana", store_id=store.id, rating=4)
+
+    assert get_one_review(db, store_id=store.id, user="ana").rating == 4
+    assert get_one_review(db, store_id=store.id, user="bruno") is None
@@ -0,0 +1,237 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from app.cruds import price_crud, scrapper_crud
+from app.cruds.scrapper_crud import get_match_candidates, ingest_scrapper_items
+from app.search.matching import ProductMatcher
+from app.models.models import Products, ProductMatchCandidates, Stores, Prices
+from app.schema.scrapper_schemas import ScrapperItem
+from app.utils.parsing import make_match_key
+
+
+def make_item(name: str, store: str, price: int, **kwargs) -> ScrapperItem:
+    data = {
+        "price": price,
+        "name": name,
+        "url": f"https://{store.lower()}.cl/products/{name.lower().replace(' ', '-')}",
+        "game": "pokemon",
+        "timestamp": "2025-07-01T00:00:00",
+        "store": store,
+        "product_type": "booster",
+        "min_price": price,
+    }
+    data.update(kwargs)
+    return ScrapperItem(**data)
+
+def test_ingest_creates_stores_products_and_prices(db: Session):
+    items = [
+        make_item("Booster A", "StoreOne", 5000),
+        make_item("Booster A", "StoreTwo", 4500),
+        make_item("Booster B", "StoreOne", 7000),
+    ]
+
+    result = ingest_scrapper_items(db, items, chunk_size=2)
+
+    assert result.processed_count == 3
+    assert result.total_items == 3
+    assert result.errors == []
+    assert db.query(Stores).count() == 2
+    assert db.query(Products).count() == 2
+    assert db.query(Prices).count() == 3
+
+    booster_a = db.query(Products).filter(Products.name == "Booster A").one()
+    assert booster_a.min_price == 4500
+    assert booster_a.game == "pokemon"
+    assert booster_a.product_type == "booster"
+
+    store_one = db.query(Stores).filter(Stores.name == "StoreOne").one()
+    assert store_one.website_url == "https://storeone.cl"
+
+def test_ingest_reuses_existing_rows(db: Session):
+    store = Stores(name="StoreOne", website_url="https://storeone.cl")
+    product = Products(
+        name="Booster A",
+        match_key=make_match_key("Booster A", "pokemon", "booster"),
+        game="pokemon",
+        product_type="booster",
+        min_price=3000
+    )
+    db.add(store)
+    db.add(product)
+    db.commit()
+
+    result = ingest_scrapper_items(db, [make_item("Booster A", "StoreOne", 3500)])
+
+    assert result.processed_count == 1
+    assert db.query(Stores).count() == 1
+    assert db.query(Products).count() == 1
+    db.refresh(product)
+    assert product.min_price == 3500
+    assert product.offer_count == 1
+
+def test_ingest_repeated_batch_only_stores_changes(db: Session):
+    ingest_scrapper_items(db, [make_item("Booster A", "StoreOne", 5000), make_item("Booster A", "StoreTwo", 4500)])
+
+    result = ingest_scrapper_items(db, [make_item("Booster A", "StoreOne", 5000), make_item("Booster A", "StoreTwo", 4000)])
+
+    assert result.processed_count == 2
+    assert sorted(price.price for price in db.query(Prices).all()) == [4000, 4500, 5000]
+    assert db.query(Products).one().min_price == 4000
+
+def test_ingest_raises_min_price_when_cheapest_offer_goes_up(db: Session):
+    ingest_scrapper_items(db, [make_item("Booster A", "StoreOne", 5000), make_item("Booster A", "StoreTwo", 4500)])
+
+    ingest_scrapper_items(db, [make_item("Booster A", "StoreTwo", 6000)])
+
+    product = db.query(Products).one()
+    assert product.min_price == 5000
+    assert product.offer_count == 2
+
+def test_ingest_reports_errors_per_item_of_failed_chunk(db: Session, monkeypatch):
+    original_record_price_observations = scrapper_crud.record_price_observations
+
+    def record_price_observations(db, prices):
+        if any(price["price"] == 6000 for price in prices):
+            raise SQLAlchemyError("boom")
+        return original_record_price_observations(db, prices)
+
+    monkeypatch.setattr(scrapper_crud, "record_price_observations", record_price_observations)
+    items = [
+        make_item("Booster A", "StoreOne", 5000),
+        make_item("Booster B", "StoreOne", 6000),
+        make_item("Booster C", "StoreTwo", 7000),
+    ]
+
+    result = ingest_scrapper_items(db, items, chunk_size=2)
+
+    # The failed chunk is retried item by item: only Booster B is lost
+    assert result.processed_count == 2
+    assert result.errors == ["DB error for item 'Booster B': boom"]
+    assert sorted(product.name for product in db.query(Products).all()) == ["Booster A", "Booster C"]
+
+def test_ingest_same_source_again_does_not_append_prices_twice(db: Session, monkeypatch):
+    monkeypatch.setattr(price_crud, "PRICE_STORAGE_MODE", price_crud.APPEND)
+    items = [make_item("Booster A", "StoreOne", 5000), make_item("Booster A", "StoreTwo", 4500)]
+
+    ingest_scrapper_items(db, items, source="job:1:0")
+    # Chunk 0 of job 1 processed again after a lost claim
+    ingest_scrapper_items(db, items, source="job:1:0")
+    ingest_scrapper_items(db, items, source="job:1:1")
+
+    assert db.query(Prices).count() == 4
+    assert db.query(Products).one().offer_count == 2
+
+def test_ingest_returns_pending_images_for_new_products_only(db: Session):
+    db.add(Products(name="Booster A", match_key=make_match_key("Booster A", "pokemon", "booster"), game="pokemon", product_type="booster"))
+    db.commit()
+    items = [
+        make_item("Booster A", "StoreOne", 5000, img_url="https://cdn/a.png"),
+        make_item("Booster B", "StoreOne", 6000, img_url="https://cdn/b.png"),
+        make_item("Booster B", "StoreTwo", 6500, img_url="https://cdn/b.png"),
+        make_item("Booster C", "StoreTwo", 6500),
+    ]
+
+    result = ingest_scrapper_items(db, items)
+
+    booster_b = db.query(Products).filter(Products.name == "Booster B").one()
+    assert booster_b.img_url is None
+    assert [(image.product_id, image.img_url) for image in result.pending_images] == [
+        (booster_b.id, "https://cdn/b.png")
+    ]
+
+def test_ingest_matches_products_by_product_key(db: Session):
+    ingest_scrapper_items(db, [make_item("Pokémon Booster", "StoreOne", 5000, img_url="https://cdn/a.png")])
+
+    result = ingest_scrapper_items(db, [
+        make_item("pokemon booster", "StoreTwo", 4500, img_url="https://cdn/b.png"),
+        make_item("POKEMON: Booster", "StoreThree", 4000),
+    ])
+
+    assert result.errors == []
+    assert result.pending_images == []
+    product = db.query(Products).one()
+    assert (product.name, product.offer_count, product.min_price) == ("Pokémon Booster", 3, 4000)
+
+def test_ingest_matches_products_across_stores_by_match_key(db: Session):
+    ingest_scrapper_items(db, [make_item("Pokémon TCG: Prismatic Evolutions Booster", "StoreOne", 5000)])
+
+    result = ingest_scrapper_items(db, [
+        make_item("pokemon tcg prismatic evolutions booster", "StoreTwo", 4800),
+        make_item("Prismatic Evolution Booster", "StoreThree", 4600),
+        make_item("Pokemon 151 Booster", "StoreOne", 3000),
+        make_item("Pokemon 151 Boosters", "StoreTwo", 3100),
+        make_item("Pokemon 152 Booster", "StoreThree", 3200),
+    ], chunk_size=2)
+
+    assert result.errors == []
+    products = {product.name: (product.offer_count, product.min_price) for product in db.query(Products).all()}
+    assert products == {
+        "Pokémon TCG: Prismatic Evolutions Booster": (3, 4600),
+        "Pokemon 151 Booster": (2, 3000),
+        "Pokemon 152 Booster": (1, 3200),
+    }
+
+def test_ingest_keeps_packaging_apart(db: Session):
+    result = ingest_scrapper_items(db, [
+        make_item("Surging Sparks Booster Box", "StoreOne", 90000),
+        make_item("Surging Sparks Booster", "StoreTwo", 3000),
+        make_item("Prismatic Evolutions Booster Bundle", "StoreOne", 40000),
+        make_item("Prismatic Evolutions Booster", "StoreTwo", 5000),
+        make_item("Charizard ex Super Premium Collection", "StoreOne", 120000),
+        make_item("Charizard ex Premium Collection", "StoreTwo", 50000),
+        make_item("Scarlet Violet Booster Pack", "StoreOne", 4000),
+        make_item("Scarlet Violet Booster", "StoreTwo", 3500),
+    ])
+
+    assert result.errors == []
+    assert db.query(Products).count() == 8
+    assert db.query(ProductMatchCandidates).count() == 0
+
+def test_ingest_keeps_product_types_with_the_same_name_apart(db: Session):
+    result = ingest_scrapper_items(db, [
+        make_item("Surging Sparks", "StoreOne", 100, product_type="booster"),
+        make_item("Surging Sparks", "StoreOne", 900, product_type="bundle", url="https://storeone.cl/products/bundle"),
+    ])
+
+    assert result.errors == []
+    products = {
+        product.product_type: (product.min_price, [price.url for price in product.prices])
+        for product in db.query(Products).all()
+    }
+    assert products == {
+        "booster": (100, ["https://storeone.cl/products/surging-sparks"]),
+        "bundle": (900, ["https://storeone.cl/products/bundle"]),
+    }
+
+def test_ingest_lists_near_duplicates_for_review_instead_of_merging(db: Session):
+    ingest_scrapper_items(db, [make_item("Pokémon TCG: Prismatic Evolutions Booster", "StoreOne", 5000)])
+
+    result = ingest_scrapper_items(db, [
+        make_item("Prismatc Evolutions Booster", "StoreTwo", 4800),
+        make_item("Prismatc Evolutions Booster", "StoreThree", 4700),
+    ])
+    ingest_scrapper_items(db, [make_item("Prismatc Evolutions Booster", "StoreTwo", 4600)])
+
+    assert result.errors == []
+    original = db.query(Products).filter(Products.name == "Pokémon TCG: Prismatic Evolutions Booster").one()
+    typo = db.query(Products).filter(Products.name == "Prismatc Evolutions Booster").one()
+    assert (original.offer_count, typo.offer_count) == (1, 2)
+    [candidate] = get_match_candidates(db)
+    assert candidate[:4] == (typo.id, typo.name, original.id, original.name)
+    assert candidate.score >= 0.8
+
+def test_ingest_reuses_the_matcher_of_the_job(db: Session):
+    matcher = ProductMatcher()
+    ingest_scrapper_items(db, [make_item("Prismatic Evolutions Booster", "StoreOne", 5000)], matcher=matcher)
+    product = db.query(Products).one()
+    # Created by another job after the matcher loaded the scope
+    db.add(Products(name="Surging Sparks Booster", match_key=make_match_key("Surging Sparks Booster", "pokemon", "booster"), game="pokemon", product_type="booster"))
+    db.commit()
+
+    ingest_scrapper_items(db, [
+        make_item("Prismatic Evolutions Booster", "StoreTwo", 4800),
+        make_item("Pokemon Surging Sparks Booster", "StoreTwo", 3000),
+    ], matcher=matcher)
+
+    assert matcher.get(make_match_key("Prismatic Evolutions Booster", "pokemon", "booster")) == product.id
+    assert db.query(Products).count() == 2
+    assert db.query(Prices).count() == 3
@@ -0,0 +1,88 @@
+import pytest
+from app.external_services import image_cache
+from app.external_services.image_cache import ImageCache
+
+
+class FakeS3Service:
+    def __init__(self):
+        self.uploads = []
+        self.metadata = {}
+
+    def upload_from_bytes(self, image_bytes, filename, custom_prefix=None, metadata=None):
+        object_key = f"{custom_prefix}/{filename}"
+        self.uploads.append(object_key)
+        self.metadata[object_key] = metadata or {}
+        return {"success": True, "object_key": object_key}
+
+    def get_image_metadata(self, object_key):
+        return self.metadata.get(object_key)
+
+
+@pytest.fixture
+def origin(monkeypatch):
+    state = {"content": b"image-v1", "etag": '"v1"', "requests": []}
+
+    def fetch_image(url, etag=None, last_modified=None):
+        state["requests"].append(etag)
+        if etag == state["etag"]:
+            return {"status": 304, "content": None, "etag": etag, "last_modified": None}
+        return {"status": 200, "content": state["content"], "etag": state["etag"], "last_modified": None}
+
+    monkeypatch.setattr(image_cache, "fetch_image", fetch_image)
+    return state
+
+def test_unchanged_image_is_revalidated_without_upload(tmp_path, origin):
+    cache = ImageCache(str(tmp_path / "index.sqlite3"))
+    s3_service = FakeS3Service()
+
+    first = cache.upload_img_from_url("https://cdn/a.png", "Booster A", "pokemon", s3_service)
+    second = cache.upload_img_from_url("https://cdn/a.png", "Booster A", "pokemon", s3_service)
+
+    assert first == second
+    assert first.endswith("/pokemon/booster_a.png")
+    assert s3_service.uploads == ["pokemon/booster_a.png"]
+    assert origin["requests"] == [None, '"v1"']
+
+def test_same_content_under_new_etag_is_not_uploaded_again(tmp_path, origin):
+    cache = ImageCache(str(tmp_path / "index.sqlite3"))
+    s3_service = FakeS3Service()
+    cache.upload_img_from_url("https://cdn/a.png", "Booster A", "pokemon", s3_service)
+
+    origin["etag"] = '"v2"'
+    cache.upload_img_from_url("https://cdn/a.png", "Booster A", "pokemon", s3_service)
+    assert s3_service.uploads == ["pokemon/booster_a.png"]
+
+    origin["content"] = b"image-v2"
+    origin["etag"] = '"v3"'
+    cache.upload_img_from_url("https://cdn/a.png", "Booster A", "pokemon", s3_service)
+    assert s3_service.uploads == ["pokemon/booster_a.png", "pokemon/booster_a.png"]
+
+def test_index_survives_restart_and_s3_metadata_is_trusted(tmp_path, origin):
+    s3_service = FakeS3Service()
+    ImageCache(str(tmp_path / "index.sqlite3")).upload_img_from_url(
+        "https://cdn/a.png", "Booster A", "pokemon", s3_service
+    )
+
+    reopened = ImageCache(str(tmp_path / "index.sqlite3"))
+    assert reopened.get("https://cdn/a.png")["etag"] == '"v1"'
+
+    fresh = ImageCache(str(tmp_path / "other.sqlite3"))
+    fresh.upload_img_from_url("https://cdn/a.png", "Booster A", "pokemon", s3_service)
+    assert s3_service.uploads == ["pokemon/booster_a.png"]
+
+def test_least_recently_used_entries_are_evicted_by_size(tmp_path):
+    cache = ImageCache(str(tmp_path / "index.sqlite3"), max_bytes=25)
+    cache.put("https://cdn/a.png", "hash-a", "pokemon/a.png", 10)
+    cache.put("https://cdn/b.png", "hash-b", "pokemon/b.png", 10)
+    cache.touch("https://cdn/a.png")
+    cache.put("https://cdn/c.png", "hash-c", "pokemon/c.png", 10)
+
+    assert cache.get("https://cdn/a.png") is not None
+    assert cache.get("https://cdn/b.png") is None
+    assert cache.get("https://cdn/c.png") is not None
+
+    # One large image can push out several small ones
+    cache.put("https://cdn/d.png", "hash-d", "pokemon/d.png", 20)
+    assert cache.get("https://cdn/a.png") is None
+    assert cache.get("https://cdn/c.png") is None
+    assert cache.get("https://cdn/d.png") is not None
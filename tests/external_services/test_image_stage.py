@@ -0,0 +1,50 @@
+import threading
+import time
+from app.external_services.image_stage import ImageUploadStage
+
+
+def make_job(key: int, host: str) -> dict:
+    return {
+        "key": key,
+        "img_url": f"https://{host}/img/{key}.png",
+        "filename": f"{key}.png",
+        "game_prefix": "pokemon",
+    }
+
+def test_run_yields_every_result():
+    def uploader(url, filename, game_prefix, s3_service):
+        if filename == "3.png":
+            raise Exception("Image not found (404)")
+        return f"https://bucket/{game_prefix}/{filename}"
+
+    stage = ImageUploadStage(s3_service=None, max_workers=4, uploader=uploader)
+    results = list(stage.run([make_job(i, "cdn.example.com") for i in range(5)]))
+
+    assert sorted(result["key"] for result in results) == [0, 1, 2, 3, 4]
+    failed = [result for result in results if not result["success"]]
+    assert failed == [{"key": 3, "success": False, "error": "Image not found (404)"}]
+    assert {"key": 0, "success": True, "url": "https://bucket/pokemon/0.png"} in results
+
+def test_run_bounds_concurrency_per_host():
+    lock = threading.Lock()
+    in_flight = {}
+    peak = {}
+
+    def uploader(url, filename, game_prefix, s3_service):
+        host = url.split("/")[2]
+        with lock:
+            in_flight[host] = in_flight.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), in_flight[host])
+        time.sleep(0.01)
+        with lock:
+            in_flight[host] -= 1
+        return url
+
+    jobs = [make_job(i, "slow.example.com") for i in range(10)]
+    jobs += [make_job(i + 10, "fast.example.com") for i in range(10)]
+    stage = ImageUploadStage(s3_service=None, max_workers=6, max_per_host=2, uploader=uploader)
+
+    results = list(stage.run(jobs))
+
+    assert len(results) == 20
+    assert peak == {"slow.example.com": 2, "fast.example.com": 2}
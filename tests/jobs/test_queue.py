@@ -0,0 +1,124 @@
+import time
+from datetime import timedelta
+from sqlalchemy.orm import Session, sessionmaker
+import pytest
+
+from app.jobs.queue import DatabaseJobQueue, JobLostError, utcnow
+from app.jobs.worker import JobWorkerPool
+from app.models.models import ScrapperJobs, ScrapperJobChunks
+from app.schema.scrapper_schemas import IngestionResult
+
+
+@pytest.fixture
+def queue(db: Session):
+    return DatabaseJobQueue(sessionmaker(bind=db.get_bind()))
+
+def test_only_sealed_jobs_are_claimed(queue: DatabaseJobQueue):
+    receiving = queue.create_job()
+    queue.append_chunk(receiving, [{"name": "a"}])
+    queued = queue.enqueue([{"name": "b"}, {"name": "c"}, {"name": "d"}], chunk_size=2)
+
+    assert queue.claim()[0] == queued
+    assert queue.claim() is None
+
+    queue.seal(receiving)
+    assert queue.claim()[0] == receiving
+
+def test_resumes_from_last_recorded_chunk(queue: DatabaseJobQueue, db: Session):
+    job_id = queue.enqueue([{"name": str(i)} for i in range(5)], chunk_size=2)
+    _, token = queue.claim()
+
+    seq, items = next(queue.iter_pending_chunks(job_id))
+    queue.record_chunk(job_id, token, seq, processed_count=2, errors=["Error for item '1': boom"])
+
+    db.query(ScrapperJobs).filter(ScrapperJobs.id == job_id).update(
+        {ScrapperJobs.heartbeat_at: utcnow() - timedelta(seconds=queue.stale_after + 1)}
+    )
+    db.commit()
+
+    claimed_id, token = queue.claim()
+    assert claimed_id == job_id
+    assert [seq for seq, _ in queue.iter_pending_chunks(job_id)] == [1, 2]
+
+    queue.finish(job_id, token=token)
+    status = queue.get(job_id)
+    assert status["status"] == "done"
+    assert status["processed_count"] == 2
+    assert status["errors"] == ["Error for item '1': boom"]
+    assert db.query(ScrapperJobChunks).count() == 0
+
+def make_stale(db: Session, queue: DatabaseJobQueue, job_id: int) -> None:
+    db.query(ScrapperJobs).filter(ScrapperJobs.id == job_id).update(
+        {ScrapperJobs.heartbeat_at: utcnow() - timedelta(seconds=queue.stale_after + 1)}
+    )
+    db.commit()
+
+def test_reclaimed_job_refuses_the_old_token(queue: DatabaseJobQueue, db: Session):
+    job_id = queue.enqueue([{"name": str(i)} for i in range(4)], chunk_size=2)
+    _, old_token = queue.claim()
+    assert queue.heartbeat(job_id, old_token) is True
+
+    make_stale(db, queue, job_id)
+    _, token = queue.claim()
+
+    assert queue.heartbeat(job_id, old_token) is False
+    with pytest.raises(JobLostError):
+        queue.record_chunk(job_id, old_token, 0, processed_count=2, errors=[])
+    with pytest.raises(JobLostError):
+        queue.finish(job_id, token=old_token)
+    assert db.query(ScrapperJobChunks).count() == 2
+    queue.record_chunk(job_id, token, 0, processed_count=2, errors=[])
+    assert queue.get(job_id)["processed_count"] == 2
+
+def test_worker_drops_a_job_claimed_by_another_worker(queue: DatabaseJobQueue, db: Session):
+    job_id = queue.enqueue([{"name": str(i)} for i in range(4)], chunk_size=2)
+    handled = []
+
+    def handler(items, state):
+        # Another worker takes the job over while this chunk is being processed
+        make_stale(db, queue, job_id)
+        queue.claim()
+        handled.append(items)
+        return IngestionResult(processed_count=len(items))
+
+    workers = JobWorkerPool(queue, handler)
+    assert workers.run_once() is True
+
+    status = queue.get(job_id)
+    assert len(handled) == 1
+    assert (status["status"], status["processed_count"]) == ("running", 0)
+    assert db.query(ScrapperJobChunks).count() == 2
+
+def test_worker_heartbeats_while_a_chunk_runs(queue: DatabaseJobQueue, db: Session):
+    job_id = queue.enqueue([{"name": "a"}], chunk_size=1)
+    beats = []
+
+    def handler(items, state):
+        make_stale(db, queue, job_id)
+        # Long enough for a few heartbeats
+        time.sleep(0.2)
+        beats.append(queue.claim())
+        return IngestionResult(processed_count=len(items))
+
+    workers = JobWorkerPool(queue, handler, heartbeat_interval=0.02)
+    assert workers.run_once() is True
+
+    assert beats == [None]
+    assert queue.get(job_id)["status"] == "done"
+
+def test_stopped_worker_releases_its_job(queue: DatabaseJobQueue, db: Session):
+    job_id = queue.enqueue([{"name": str(i)} for i in range(4)], chunk_size=2)
+
+    def handler(items, state):
+        # The app shuts down while the first chunk runs
+        workers.stop_event.set()
+        return IngestionResult(processed_count=len(items))
+
+    workers = JobWorkerPool(queue, handler)
+    assert workers.run_once() is True
+
+    status = queue.get(job_id)
+    assert (status["status"], status["processed_count"]) == ("queued", 2)
+    claimed_id, _ = queue.claim()
+    assert claimed_id == job_id
+    assert [seq for seq, _ in queue.iter_pending_chunks(job_id)] == [1]
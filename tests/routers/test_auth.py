@@ -1,83 +1,168 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
-from app.main import app
-
-client = TestClient(app)
 
-@pytest.fixture(autouse=True)
-def mock_settings(monkeypatch):
-    monkeypatch.setenv("AUTH0_DOMAIN", "test.auth0.com")
-    monkeypatch.setenv("AUTH0_CLIENT_ID", "test_client_id")
-    monkeypatch.setenv("AUTH0_CLIENT_SECRET", "test_client_secret")
-    monkeypatch.setenv("AUTH0_AUDIENCE", "test_audience")
+from app.external_services.auth0 import Auth0Client, get_auth0_client
+from app.main import app
 
-@patch('requests.post')
-def test_login_user_success(mock_post):
-    mock_response = MagicMock()
-    mock_response.status_code = 200
-    mock_response.json.return_value = {"access_token": "fake_token", "token_type": "bearer"}
-    mock_post.return_value = mock_response
 
+class StubAuth0:
+    """
+    Local OAuth/Management API server answering like Auth0
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.token_status = 200
+        self.token_expires_in = 86400
+        self.user_status = 201
+        self.issued = 0
+        self.valid_tokens = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append((self.path, body))
+                status, payload = stub.answer(self.path, body, self.headers.get("Authorization"))
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def answer(self, path, body, authorization):
+        if path == "/oauth/token" and body["grant_type"] == "client_credentials":
+            if self.token_status != 200:
+                return self.token_status, {"error": "unauthorized_client"}
+            self.issued += 1
+            token = f"mgmt-{self.issued}"
+            self.valid_tokens.add(token)
+            return 200, {"access_token": token, "expires_in": self.token_expires_in, "token_type": "Bearer"}
+        if path == "/oauth/token":
+            if body["password"] != "password":
+                return 403, {"error": "invalid_grant"}
+            return 200, {"access_token": "user_token", "token_type": "bearer"}
+        if path == "/api/v2/users":
+            if authorization.removeprefix("Bearer ") not in self.valid_tokens:
+                return 401, {"error": "invalid_token"}
+            if self.user_status != 201:
+                return self.user_status, {"error": "user_exists"}
+            return 201, {"user_id": "auth0|12345"}
+        return 404, {"error": "not_found"}
+
+    def token_requests(self):
+        return [body for path, body in self.requests if path == "/oauth/token" and body["grant_type"] == "client_credentials"]
+
+
+@pytest.fixture
+def auth0():
+    stub = StubAuth0()
+    stub.thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+@pytest.fixture
+def client(auth0):
+    auth0_client = Auth0Client(auth0.url, "test_client_id", "test_client_secret", audience="test_audience", timeout=2)
+    app.dependency_overrides[get_auth0_client] = lambda: auth0_client
+    yield TestClient(app)
+    del app.dependency_overrides[get_auth0_client]
+
+
+def register(client: TestClient, email: str = "newuser@example.com"):
+    return client.post("/auth/register", json={"email": email, "password": "newpassword"})
+
+
+def test_login_user_success(client: TestClient, auth0):
     response = client.post("/auth/login", json={"email": "test@example.com", "password": "password"})
 
     assert response.status_code == 200
-    assert response.json() == {"access_token": "fake_token", "token_type": "bearer"}
-
-@patch('requests.post')
-def test_login_user_failure(mock_post):
-    mock_response = MagicMock()
-    mock_response.status_code = 400
-    mock_response.json.return_value = {"error": "invalid_grant"}
-    mock_post.return_value = mock_response
+    assert response.json() == {"access_token": "user_token", "token_type": "bearer"}
+    assert auth0.requests[0][1]["audience"] == "test_audience"
 
+def test_login_user_failure(client: TestClient):
     response = client.post("/auth/login", json={"email": "test@example.com", "password": "wrongpassword"})
 
     assert response.status_code == 400
     assert response.json() == {'detail': {'error': 'invalid_grant'}}
 
-@patch('requests.post')
-def test_register_user_success(mock_post):
-    mock_token_response = MagicMock()
-    mock_token_response.status_code = 200
-    mock_token_response.json.return_value = {"access_token": "fake_mgmt_token"}
-
-    mock_user_response = MagicMock()
-    mock_user_response.status_code = 201
-    mock_user_response.json.return_value = {"user_id": "auth0|12345"}
-
-    mock_post.side_effect = [mock_token_response, mock_user_response]
-
-    response = client.post("/auth/register", json={"email": "newuser@example.com", "password": "newpassword"})
+def test_register_user_success(client: TestClient):
+    response = register(client)
 
     assert response.status_code == 200
     assert response.json() == {"message": "User created successfully."}
 
-@patch('requests.post')
-def test_register_user_token_failure(mock_post):
-    mock_token_response = MagicMock()
-    mock_token_response.status_code = 400
-    mock_token_response.json.return_value = {"error": "unauthorized_client"}
-    mock_post.return_value = mock_token_response
+def test_register_user_token_failure(client: TestClient, auth0):
+    auth0.token_status = 401
 
-    response = client.post("/auth/register", json={"email": "newuser@example.com", "password": "newpassword"})
+    response = register(client)
 
     assert response.status_code == 400
     assert response.json() == {'detail': {'error': 'unauthorized_client'}}
 
-@patch('requests.post')
-def test_register_user_creation_failure(mock_post):
-    mock_token_response = MagicMock()
-    mock_token_response.status_code = 200
-    mock_token_response.json.return_value = {"access_token": "fake_mgmt_token"}
-
-    mock_user_response = MagicMock()
-    mock_user_response.status_code = 409
-    mock_user_response.json.return_value = {"error": "user_exists"}
+def test_register_user_creation_failure(client: TestClient, auth0):
+    auth0.user_status = 409
 
-    mock_post.side_effect = [mock_token_response, mock_user_response]
-
-    response = client.post("/auth/register", json={"email": "existinguser@example.com", "password": "password"})
+    response = register(client, "existinguser@example.com")
 
     assert response.status_code == 400
     assert response.json() == {'detail': {'error': 'user_exists'}}
+
+def test_register_reuses_the_management_token(client: TestClient, auth0):
+    for i in range(3):
+        assert register(client, f"user{i}@example.com").status_code == 200
+
+    assert len(auth0.token_requests()) == 1
+
+def test_register_renews_an_expiring_or_revoked_token(client: TestClient, auth0):
+    # Expires within the renewal margin: every registration fetches a new one
+    auth0.token_expires_in = 30
+    register(client)
+    register(client)
+    assert len(auth0.token_requests()) == 2
+
+    auth0.token_expires_in = 86400
+    register(client)
+    auth0.valid_tokens.clear()
+    assert register(client).status_code == 200
+    assert len(auth0.token_requests()) == 4
+
+def test_auth0_unreachable(auth0):
+    auth0.server.shutdown()
+    auth0.server.server_close()
+    auth0_client = Auth0Client(auth0.url, "test_client_id", "test_client_secret", timeout=1)
+    app.dependency_overrides[get_auth0_client] = lambda: auth0_client
+    try:
+        response = TestClient(app).post("/auth/login", json={"email": "test@example.com", "password": "password"})
+    finally:
+        del app.dependency_overrides[get_auth0_client]
+
+    assert response.status_code == 503
+
+def test_client_of_a_previous_loop_is_closed(auth0):
+    auth0_client = Auth0Client(auth0.url, "test_client_id", "test_client_secret", timeout=2)
+
+    asyncio.run(auth0_client.login("test@example.com", "password"))
+    first = auth0_client.client
+    asyncio.run(auth0_client.login("test@example.com", "password"))
+
+    assert first.is_closed
+    assert auth0_client.client is not first
+    asyncio.run(auth0_client.aclose())
@@ -1,23 +1,24 @@
+from datetime import datetime, timedelta, timezone
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 import pytest
 
 from app.main import app
-from app.database import get_db
+from app.database import get_async_db, get_async_read_db
 from app.models.models import Products, Stores, Prices
 
 
 @pytest.fixture
-def client(db: Session):
-    def override_get_db_for_test():
-        try:
-            yield db
-        finally:
-            pass
-
-    app.dependency_overrides[get_db] = override_get_db_for_test
+def client(db: Session, async_session_factory):
+    async def override_get_async_db_for_test():
+        async with async_session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_async_db_for_test
+    app.dependency_overrides[get_async_read_db] = override_get_async_db_for_test
     yield TestClient(app)
-    del app.dependency_overrides[get_db]
+    del app.dependency_overrides[get_async_db]
+    del app.dependency_overrides[get_async_read_db]
 
 
 @pytest.fixture
@@ -64,3 +65,47 @@ def test_create_price_endpoint_store_not_found(client: TestClient, test_product:
 
     assert response.status_code == 404
     assert response.json() == {"detail": "Store not found"}
+
+
+def test_get_prices_by_product_latest_only(client: TestClient, test_product: Products, test_store: Stores):
+    for price in (1500, 1400):
+        client.post("/prices/", json={
+            "product_id": test_product.id,
+            "store_id": test_store.id,
+            "price": price,
+            "url": "https://teststore.com/product/1"
+        })
+
+    history = client.get(f"/prices/product/{test_product.id}")
+    latest = client.get(f"/prices/product/{test_product.id}", params={"latest_only": True})
+
+    assert len(history.json()) == 2
+    assert [price["price"] for price in latest.json()] == [1400]
+    assert latest.json()[0]["store"]["id"] == test_store.id
+
+
+def test_get_price_history_endpoint(client: TestClient, db: Session, test_product: Products, test_store: Stores):
+    scrapped_at = datetime(2025, 7, 7, 6, tzinfo=timezone.utc)
+    db.add(Prices(product_id=test_product.id, store_id=test_store.id, price=1200, url="https://teststore.com/p",
+                  scrapped_at=scrapped_at, last_seen_at=scrapped_at + timedelta(hours=2)))
+    db.commit()
+
+    response = client.get(
+        f"/prices/product/{test_product.id}/history",
+        params={"bucket": "hour", "start": "2025-07-07T00:00:00Z", "end": "2025-07-08T00:00:00Z"}
+    )
+
+    assert response.status_code == 200
+    series = response.json()["series"]
+    assert len(series) == 1
+    assert series[0]["store"]["name"] == "Test Store"
+    assert [point["last_price"] for point in series[0]["points"]] == [1200, 1200, 1200]
+
+
+def test_get_price_history_endpoint_rejects_too_many_buckets(client: TestClient, test_product: Products):
+    response = client.get(
+        f"/prices/product/{test_product.id}/history",
+        params={"bucket": "hour", "start": "2020-01-01T00:00:00Z", "end": "2025-01-01T00:00:00Z"}
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,223 @@
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+import pytest
+
+from app.main import app
+from app.routers import product_router
+from app.cruds.comment_crud import create_comment
+from app.cruds.price_crud import create_price
+from app.cruds.product_crud import bump_catalog_version
+from app.database import get_async_db, get_async_read_db
+from app.models.models import Products, Stores
+from app.search.index import get_search_index
+
+
+@pytest.fixture
+def client(db: Session, async_session_factory):
+    async def override_get_async_db_for_test():
+        async with async_session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_async_db_for_test
+    app.dependency_overrides[get_async_read_db] = override_get_async_db_for_test
+    yield TestClient(app)
+    del app.dependency_overrides[get_async_db]
+    del app.dependency_overrides[get_async_read_db]
+
+
+@pytest.fixture
+def test_products(db: Session):
+    products = [
+        Products(name=f"Product {i}", game="pokemon", product_type="booster", min_price=price)
+        for i, price in enumerate([500, 100, 300, 200, 400])
+    ]
+    db.add_all(products)
+    db.commit()
+    return products
+
+
+def test_get_products_follows_next_cursor(client: TestClient, test_products):
+    prices = []
+    params = {"sort": "price_desc", "limit": 2}
+    while True:
+        response = client.get("/products/", params=params)
+        assert response.status_code == 200
+        prices += [product["min_price"] for product in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert prices == [500, 400, 300, 200, 100]
+
+
+def test_get_products_skip_still_works(client: TestClient, test_products):
+    response = client.get("/products/", params={"skip": 1, "limit": 2})
+
+    assert response.status_code == 200
+    assert [product["name"] for product in response.json()] == ["Product 1", "Product 2"]
+
+
+def test_get_products_invalid_cursor(client: TestClient, test_products):
+    response = client.get("/products/", params={"sort": "name", "cursor": "bogus"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+@pytest.fixture
+def search_index():
+    get_search_index.cache_clear()
+    yield get_search_index()
+    get_search_index.cache_clear()
+
+
+def test_search_products(client: TestClient, db: Session, search_index):
+    db.add(Products(name="Pokémon Booster Escarlata", game="pokemon", product_type="booster"))
+    db.commit()
+
+    response = client.get("/products/search", params={"q": "pokemon escarlata"})
+    assert [product["name"] for product in response.json()] == ["Pokémon Booster Escarlata"]
+
+    created = client.post("/products/", json={"name": "Pokémon Booster Púrpura", "game": "pokemon"})
+    assert created.status_code == 201
+
+    response = client.get("/products/search", params={"q": "purpura"})
+    assert [product["name"] for product in response.json()] == ["Pokémon Booster Púrpura"]
+
+
+def test_product_detail_is_cached_until_a_comment_lands(client: TestClient, db: Session, test_products):
+    product_id = test_products[0].id
+
+    assert client.get(f"/products/{product_id}").headers["X-Cache"] == "MISS"
+    assert client.get(f"/products/{product_id}").headers["X-Cache"] == "HIT"
+
+    create_comment(db, user="ash", product_id=product_id, text="Nice")
+
+    response = client.get(f"/products/{product_id}")
+    assert response.headers["X-Cache"] == "MISS"
+    assert [comment["text"] for comment in response.json()["comments"]] == ["Nice"]
+
+
+def test_price_invalidates_only_the_listings_it_affects(client: TestClient, db: Session, test_products, response_cache, monkeypatch):
+    # As with Redis: an unshared cache also drops its hits whenever the catalog version moves
+    monkeypatch.setattr(response_cache.backend, "shared", True)
+    store = Stores(name="Cache Store", website_url="https://cachestore.cl")
+    db.add(store)
+    db.commit()
+    first_page = {"sort": "name", "limit": 2}
+    last_page = {"sort": "name", "skip": 4, "limit": 2}
+    by_price = {"sort": "price_asc", "limit": 2}
+    for params in (first_page, last_page, by_price):
+        client.get("/products/", params=params)
+
+    # Product 4 is only on the last name-sorted page
+    create_price(db, product_id=test_products[4].id, store_id=store.id, price=50, url="https://cachestore.cl/p/4")
+
+    assert client.get("/products/", params=first_page).headers["X-Cache"] == "HIT"
+    assert client.get("/products/", params=last_page).headers["X-Cache"] == "MISS"
+    response = client.get("/products/", params=by_price)
+    assert response.headers["X-Cache"] == "MISS"
+    assert [product["min_price"] for product in response.json()] == [50, 100]
+
+
+def test_memory_cache_does_not_serve_what_another_worker_changed(client: TestClient, db: Session, test_products):
+    product = test_products[0]
+    client.get("/products/", params={"sort": "name"})
+    client.get(f"/products/{product.id}")
+
+    # Written by another worker, whose invalidations don't reach this process
+    product.name = "Renamed"
+    product.updated_at = datetime.now(timezone.utc)
+    bump_catalog_version(db)
+    db.commit()
+
+    listing = client.get("/products/", params={"sort": "name"})
+    assert listing.headers["X-Cache"] == "MISS"
+    assert "Renamed" in [item["name"] for item in listing.json()]
+    detail = client.get(f"/products/{product.id}")
+    assert detail.headers["X-Cache"] == "MISS"
+    assert detail.json()["name"] == "Renamed"
+    assert client.get(f"/products/{product.id}").headers["X-Cache"] == "HIT"
+
+
+def test_created_product_invalidates_listings(client: TestClient, test_products, response_cache):
+    client.get("/products/", params={"sort": "name"})
+
+    client.post("/products/", json={"name": "Product 5", "game": "pokemon"})
+
+    response = client.get("/products/", params={"sort": "name"})
+    assert response.headers["X-Cache"] == "MISS"
+    assert len(response.json()) == 6
+    assert response_cache.stats()["hits"] == 0
+
+
+def test_create_all_returns_the_products_or_only_their_ids(client: TestClient, db: Session):
+    catalog = [
+        {"name": "Pokémon Booster", "game": "pokemon", "product_type": "booster"},
+        {"name": "Magic Bundle", "game": "magic-the-gathering", "product_type": "bundle", "edition": "BLB"},
+    ]
+
+    response = client.post("/products/createAll", json=catalog)
+    assert response.status_code == 201
+    products = response.json()
+    assert [(product["name"], product["edition"]) for product in products] == [("Pokémon Booster", None), ("Magic Bundle", "BLB")]
+    assert None not in [product["id"] for product in products]
+
+    response = client.post("/products/createAll", params={"ids_only": True}, json=catalog)
+    assert response.status_code == 201
+    assert response.json() == {"count": 2, "ids": [product["id"] for product in products]}
+    assert db.query(Products).count() == 2
+
+
+def test_product_detail_conditional_get(client: TestClient, db: Session, test_products, response_cache):
+    product_id = test_products[0].id
+    etag = client.get(f"/products/{product_id}").headers["ETag"]
+
+    cached = client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    # Same answer when the ETag is computed from the database instead of the cache
+    response_cache.backend.clear()
+    assert client.get(f"/products/{product_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    create_comment(db, user="ash", product_id=product_id, text="Nice")
+
+    response = client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_product_listing_conditional_get(client: TestClient, test_products, response_cache):
+    etag = client.get("/products/", params={"sort": "name"}).headers["ETag"]
+    response_cache.backend.clear()
+
+    assert client.get("/products/", params={"sort": "name"}, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/products/", params={"sort": "id"}, headers={"If-None-Match": etag}).status_code == 200
+
+    client.post("/products/", json={"name": "Product 5", "game": "pokemon"})
+
+    response = client.get("/products/", params={"sort": "name"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 6
+
+
+def test_product_detail_embeds_the_newest_comments(client: TestClient, db: Session, test_products, monkeypatch):
+    monkeypatch.setattr(product_router, "DETAIL_COMMENTS", 2)
+    product_id = test_products[0].id
+    for i in range(5):
+        create_comment(db, user=f"user{i}", product_id=product_id, text=f"Comment {i}")
+
+    detail = client.get(f"/products/{product_id}").json()
+    assert [comment["text"] for comment in detail["comments"]] == ["Comment 4", "Comment 3"]
+    assert detail["comment_count"] == 5
+
+    texts = []
+    cursor = detail["next_comments_cursor"]
+    while cursor:
+        response = client.get(f"/comments/{product_id}", params={"limit": 2, "cursor": cursor})
+        texts += [comment["text"] for comment in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+    assert texts == ["Comment 2", "Comment 1", "Comment 0"]
+    assert client.get(f"/comments/{product_id}", params={"cursor": "not-a-cursor"}).status_code == 400
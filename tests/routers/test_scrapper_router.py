@@ -0,0 +1,192 @@
+import gzip
+import json
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+import pytest
+
+from app.main import app
+from app.jobs.queue import DatabaseJobQueue
+from app.jobs.worker import JobWorkerPool
+from app.database import get_async_read_db
+from app.models.models import Products, Prices, ProductMatchCandidates
+from app.routers import scrapper_router
+
+
+@pytest.fixture
+def session_factory(db: Session):
+    return sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+
+@pytest.fixture
+def queue(session_factory):
+    return DatabaseJobQueue(session_factory)
+
+@pytest.fixture
+def client(queue: DatabaseJobQueue):
+    app.dependency_overrides[scrapper_router.get_job_queue] = lambda: queue
+    yield TestClient(app)
+    del app.dependency_overrides[scrapper_router.get_job_queue]
+
+def make_item(name: str, store: str, price: int) -> dict:
+    return {
+        "price": price,
+        "name": name,
+        "url": f"https://{store.lower()}.cl/products/{price}",
+        "game": "pokemon",
+        "timestamp": "2025-07-01T00:00:00",
+        "store": store,
+        "product_type": "booster",
+        "min_price": price,
+    }
+
+def test_bulk_enqueues_job_and_reports_progress(
+    client: TestClient,
+    queue: DatabaseJobQueue,
+    session_factory,
+    db: Session,
+    monkeypatch
+):
+    monkeypatch.setattr(scrapper_router, "SCRAPPER_CHUNK_SIZE", 2)
+    monkeypatch.setattr(scrapper_router, "SessionLocal", session_factory)
+    items = [
+        make_item("Booster A", "StoreOne", 5000),
+        make_item("Booster A", "StoreTwo", 4500),
+        make_item("Booster B", "StoreOne", 7000),
+    ]
+
+    response = client.post("/scrapper/bulk", json=items)
+
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.json() == {
+        "job_id": job_id,
+        "status": "queued",
+        "total_items": 3,
+        "rejected_count": 0,
+        "errors": []
+    }
+    assert db.query(Prices).count() == 0
+
+    queued = client.get(f"/scrapper/jobs/{job_id}").json()
+    assert queued["status"] == "queued"
+    assert queued["progress"] == 0.0
+
+    workers = JobWorkerPool(queue, scrapper_router.process_job_chunk)
+    assert workers.run_once() is True
+    assert workers.run_once() is False
+
+    done = client.get(f"/scrapper/jobs/{job_id}").json()
+    assert done["status"] == "done"
+    assert done["processed_count"] == 3
+    assert done["error_count"] == 0
+    assert done["progress"] == 1.0
+    assert done["items_per_second"] is not None
+    assert db.query(Products).count() == 2
+    assert db.query(Prices).count() == 3
+
+def test_get_unknown_job(client: TestClient):
+    response = client.get("/scrapper/jobs/999")
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Job not found"}
+
+def test_stream_queues_ndjson_in_chunks(client: TestClient, queue: DatabaseJobQueue, monkeypatch):
+    monkeypatch.setattr(scrapper_router, "SCRAPPER_CHUNK_SIZE", 2)
+    lines = [json.dumps(make_item(f"Booster {i}", "StoreOne", 1000 + i)) for i in range(5)]
+    lines.insert(2, '{"name": "broken"}')
+    body = gzip.compress(("\n".join(lines) + "\n").encode())
+
+    response = client.post(
+        "/scrapper/stream",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+    )
+
+    assert response.status_code == 202
+    data = response.json()
+    assert data["total_items"] == 5
+    assert data["rejected_count"] == 1
+    assert data["errors"][0].startswith("Invalid item on line 3:")
+
+    job_id = data["job_id"]
+    assert queue.claim()[0] == job_id
+    chunks = [items for _, items in queue.iter_pending_chunks(job_id)]
+    assert [len(items) for items in chunks] == [2, 2, 1]
+    assert chunks[2][0]["name"] == "Booster 4"
+
+def test_stream_rejects_invalid_gzip(client: TestClient):
+    response = client.post(
+        "/scrapper/stream",
+        content=b"not gzip",
+        headers={"Content-Encoding": "gzip"}
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid gzip body"}
+
+def test_stream_rejects_lines_and_bodies_over_the_limits(client: TestClient, queue: DatabaseJobQueue, monkeypatch):
+    monkeypatch.setattr(scrapper_router, "SCRAPPER_MAX_LINE_BYTES", 1000)
+    line = json.dumps(make_item("Booster A", "StoreOne", 1000))
+
+    response = client.post("/scrapper/stream", content=line + "\n" + "x" * 1001 + "\n")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Line is over 1000 bytes"}
+    # The job is closed, not left for the workers
+    assert queue.claim() is None
+
+    # The body limit applies after decompression
+    monkeypatch.setattr(scrapper_router, "SCRAPPER_MAX_BODY_BYTES", 10 * len(line))
+    response = client.post(
+        "/scrapper/stream",
+        content=gzip.compress(((line + "\n") * 20).encode()),
+        headers={"Content-Encoding": "gzip"}
+    )
+    assert response.status_code == 400
+    assert response.json() == {"detail": f"Body is over {10 * len(line)} bytes"}
+
+def test_match_candidates_lists_near_duplicates(client: TestClient, db: Session, async_session_factory):
+    async def override_get_async_db_for_test():
+        async with async_session_factory() as session:
+            yield session
+
+    original = Products(name="Prismatic Evolutions Booster", game="pokemon", product_type="booster")
+    typo = Products(name="Prismatc Evolutions Booster", game="pokemon", product_type="booster")
+    db.add_all([original, typo])
+    db.flush()
+    db.add(ProductMatchCandidates(product_id=typo.id, candidate_id=original.id, score=0.83))
+    db.commit()
+    app.dependency_overrides[get_async_read_db] = override_get_async_db_for_test
+    try:
+        response = client.get("/scrapper/match-candidates")
+    finally:
+        del app.dependency_overrides[get_async_read_db]
+
+    assert response.status_code == 200
+    [candidate] = response.json()
+    assert (candidate["product_name"], candidate["candidate_name"], candidate["score"]) == (
+        "Prismatc Evolutions Booster", "Prismatic Evolutions Booster", 0.83
+    )
+
+def test_job_chunks_hand_images_to_the_image_executor(session_factory, db: Session, monkeypatch):
+    monkeypatch.setattr(scrapper_router, "SessionLocal", session_factory)
+    uploaded = []
+    monkeypatch.setattr(scrapper_router, "store_product_images", lambda db, images: uploaded.extend(images))
+    item = dict(make_item("Booster A", "StoreOne", 5000), img_url="https://cdn/a.png")
+
+    result = scrapper_router.process_job_chunk([item], {"job_id": 1, "seq": 0})
+    # Runs after the uploads queued before it
+    scrapper_router.get_image_executor().submit(lambda: None).result()
+
+    assert result.processed_count == 1
+    assert [image.img_url for image in uploaded] == ["https://cdn/a.png"]
+
+def test_image_cache_is_disabled_when_its_path_is_not_writable(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrapper_router, "IMAGE_CACHE_PATH", str(tmp_path / "missing" / "index.sqlite3"))
+    scrapper_router.get_image_cache.cache_clear()
+    try:
+        assert scrapper_router.get_image_cache() is None
+
+        monkeypatch.setattr(scrapper_router, "IMAGE_CACHE_PATH", str(tmp_path / "index.sqlite3"))
+        scrapper_router.get_image_cache.cache_clear()
+        assert scrapper_router.get_image_cache() is not None
+    finally:
+        scrapper_router.get_image_cache.cache_clear()
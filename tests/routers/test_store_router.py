@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+import pytest
+
+from app.main import app
+from app.database import get_async_db, get_async_read_db
+from app.models.models import Stores
+
+
+@pytest.fixture
+def client(db: Session, async_session_factory):
+    async def override_get_async_db_for_test():
+        async with async_session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_async_db_for_test
+    app.dependency_overrides[get_async_read_db] = override_get_async_db_for_test
+    yield TestClient(app)
+    del app.dependency_overrides[get_async_db]
+    del app.dependency_overrides[get_async_read_db]
+
+
+@pytest.fixture
+def test_store(db: Session):
+    store = Stores(name="Test Store", website_url="https://teststore.com")
+    db.add(store)
+    db.commit()
+    db.refresh(store)
+    return store
+
+
+def test_store_rating_follows_review_upserts(client: TestClient, test_store: Stores):
+    rating_url = f"/stores/{test_store.id}/rating"
+    assert client.get(rating_url).json() == {
+        "store_id": test_store.id, "rating_count": 0, "rating_sum": 0, "average_rating": None
+    }
+
+    assert client.post("/reviews/", json={"user": "ana", "store_id": test_store.id, "rating": 5}).status_code == 201
+    assert client.post("/reviews/", json={"user": "bruno", "store_id": test_store.id, "rating": 4}).status_code == 201
+    update = client.post("/reviews/", json={"user": "ana", "store_id": test_store.id, "rating": 2})
+    assert update.status_code == 200
+    assert update.json()["rating"] == 2
+
+    assert client.get(rating_url).json() == {
+        "store_id": test_store.id, "rating_count": 2, "rating_sum": 6, "average_rating": 3.0
+    }
+    assert len(client.get(f"/reviews/{test_store.id}").json()) == 2
+
+def test_review_validation_and_missing_store(client: TestClient, test_store: Stores):
+    assert client.post("/reviews/", json={"user": "ana", "store_id": test_store.id, "rating": 6}).status_code == 422
+    assert client.post("/reviews/", json={"user": "ana", "store_id": 999, "rating": 3}).status_code == 404
+    assert client.get("/stores/999/rating").status_code == 404
@@ -0,0 +1,108 @@
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models.models import Products
+from app.search.index import ProductSearchIndex
+
+
+def make_index(db: Session, *products: Products) -> ProductSearchIndex:
+    db.add_all(products)
+    db.commit()
+    index = ProductSearchIndex()
+    index.sync(db)
+    return index
+
+
+def names(db: Session, hits):
+    return [db.get(Products, product_id).name for product_id, _ in hits]
+
+
+def test_search_folds_accents_and_tolerates_typos(db: Session):
+    index = make_index(
+        db,
+        Products(name="Pokémon Escarlata y Púrpura Booster", game="pokemon", product_type="booster"),
+        Products(name="Yu-Gi-Oh! Dragón Blanco de Ojos Azules", game="yu-gi-oh", product_type="singles"),
+    )
+
+    assert names(db, index.search("pokemon purpura")) == ["Pokémon Escarlata y Púrpura Booster"]
+    assert names(db, index.search("dragon blanko")) == ["Yu-Gi-Oh! Dragón Blanco de Ojos Azules"]
+    assert index.search("magic") == []
+
+
+def test_search_ranks_name_above_description(db: Session):
+    index = make_index(
+        db,
+        Products(name="Sleeves", description="Fundas para cartas Charizard", game="other", product_type="other"),
+        Products(name="Charizard VMAX", game="pokemon", product_type="singles"),
+        Products(name="Charizard ex Premium Collection", game="pokemon", product_type="bundle"),
+    )
+
+    assert names(db, index.search("charizard vmax")) == ["Charizard VMAX", "Charizard ex Premium Collection", "Sleeves"]
+
+
+def test_sync_and_add_are_incremental(db: Session):
+    index = ProductSearchIndex()
+    product = Products(name="Lugia V", game="pokemon", product_type="singles")
+    index.add([product])
+    assert len(index) == 0
+
+    index = make_index(db, product)
+    later = Products(name="Lugia Legend", game="pokemon", product_type="singles")
+    db.add(later)
+    db.commit()
+    assert [product_id for product_id, _ in index.search("lugia")] == [product.id]
+
+    assert index.sync(db) == 1
+    assert sorted(product_id for product_id, _ in index.search("lugia")) == [product.id, later.id]
+
+    product.name = "Mewtwo GX"
+    index.add([product])
+    index.remove([later.id])
+    assert index.search("lugia") == []
+    assert [product_id for product_id, _ in index.search("mewtwo")] == [product.id]
+
+
+def test_sync_reindexes_products_changed_elsewhere(db: Session):
+    product = Products(name="Lugia V", edition="Silver Tempest", game="pokemon", product_type="singles")
+    index = make_index(db, product)
+    assert index.sync(db) == 0
+
+    # An upsert from another process: same id, new texts and updated_at
+    product.edition = "Crown Zenith"
+    product.updated_at = datetime.now(timezone.utc)
+    db.commit()
+
+    assert index.sync(db) == 1
+    assert index.search("tempest") == []
+    assert [product_id for product_id, _ in index.search("zenith")] == [product.id]
+
+
+def test_full_sync_catches_a_commit_later_than_the_overlap(db: Session):
+    first = Products(name="Lugia V", game="pokemon", product_type="singles")
+    index = make_index(db, first)
+    # Updated before the newest product the index saw, committed after the sync
+    late = Products(name="Mewtwo GX", game="pokemon", product_type="singles", updated_at=index.synced_at - timedelta(minutes=5))
+    db.add(late)
+    db.commit()
+
+    assert index.sync(db) == 0
+    assert index.sync(db, full=True) == 1
+    assert [product_id for product_id, _ in index.search("mewtwo")] == [late.id]
+
+
+def test_background_thread_syncs_the_index(db: Session):
+    index = make_index(db, Products(name="Lugia V", game="pokemon", product_type="singles"))
+    index.start(sessionmaker(bind=db.get_bind()), interval=0.01)
+    try:
+        product = Products(name="Mewtwo GX", game="pokemon", product_type="singles")
+        db.add(product)
+        db.commit()
+        deadline = time.monotonic() + 2
+        while not index.search("mewtwo") and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        index.stop()
+
+    assert [product_id for product_id, _ in index.search("mewtwo")] == [product.id]
+    assert index.thread is None
@@ -0,0 +1,70 @@
+import pytest
+
+from app.search.matching import ProductMatcher
+from app.utils.parsing import make_match_key
+
+
+def test_match_key_ignores_accents_punctuation_game_names_and_plurals():
+    assert make_match_key("Pokémon TCG: Prismatic Evolutions  Booster", "pokemon", "booster") == "pokemon/booster:booster evolution prismatic"
+    assert make_match_key("pokemon tcg booster prismatic evolution", "pokemon", "booster") == "pokemon/booster:booster evolution prismatic"
+    assert make_match_key("Booster", "pokemon", "booster", "Scarlet & Violet") == "pokemon/booster:booster scarlet violet"
+    assert make_match_key("ETB Temporal Forces", "pokemon", "bundle") == "pokemon/bundle:box elite force temporal trainer"
+    assert make_match_key("Pokemon Booster", "other", "other") == "other/other:booster pokemon"
+
+
+def test_match_key_keeps_product_types_apart():
+    assert make_match_key("Prismatic Evolutions", "pokemon", "booster") != make_match_key("Prismatic Evolutions", "pokemon", "bundle")
+
+
+def test_matcher_finds_near_duplicates_within_their_block():
+    matcher = ProductMatcher()
+    matcher.add("pokemon/booster:booster evolution prismatic", 1)
+    matcher.add("pokemon/booster:booster force temporal", 2)
+    matcher.add("magic-the-gathering/booster:booster evolution prismatic", 3)
+    matcher.add("pokemon/bundle:booster evolution prismatic", 4)
+
+    assert matcher.find_similar("pokemon/booster:booster evolution prismatc")[0] == "pokemon/booster:booster evolution prismatic"
+    assert matcher.find_similar("pokemon/booster:booster evolution prismatic") is None
+    assert matcher.find_similar("pokemon/booster:box elite evolution prismatic trainer") is None
+    assert matcher.find_similar("yu-gi-oh/booster:booster evolution prismatic") is None
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Surging Sparks Booster Box", "Surging Sparks Booster"),
+    ("Prismatic Evolutions Booster Bundle", "Prismatic Evolutions Booster"),
+    ("Charizard ex Super Premium Collection", "Charizard ex Premium Collection"),
+    ("Scarlet Violet Booster Pack", "Scarlet Violet Booster"),
+])
+def test_matcher_keeps_packaging_apart(first, second):
+    matcher = ProductMatcher()
+    matcher.add(make_match_key(first, "pokemon", "booster"), 1)
+
+    assert matcher.find_similar(make_match_key(second, "pokemon", "booster")) is None
+
+
+def test_matcher_requires_equal_codes():
+    matcher = ProductMatcher()
+    matcher.add("pokemon/booster:151 booster", 1)
+    matcher.add("pokemon/booster:booster ex scarlet violet", 2)
+
+    assert matcher.find_similar("pokemon/booster:152 booster") is None
+    assert matcher.find_similar("pokemon/booster:booster scarlet violet") is None
+
+
+def test_matcher_skips_oversized_blocks():
+    matcher = ProductMatcher(max_block_size=2)
+    for product_id, name in enumerate(["charizard", "pikachu", "mewtwo"], start=1):
+        matcher.add(f"pokemon/booster:booster {name}", product_id)
+
+    assert matcher.find_similar("pokemon/booster:booster charizardd")[0] == "pokemon/booster:booster charizard"
+    assert matcher.find_similar("pokemon/booster:booster") is None
+
+
+def test_matcher_keeps_the_first_product_id():
+    matcher = ProductMatcher()
+    matcher.add("pokemon/booster:booster")
+    matcher.add("pokemon/booster:booster", 4)
+    matcher.add("pokemon/booster:booster", 5)
+
+    assert matcher.get("pokemon/booster:booster") == 4
+    assert len(matcher) == 1
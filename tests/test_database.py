@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel
+
+from app.database import ReadOnlySession, get_async_db, get_async_read_db
+from app.main import app
+from app.models.models import Products
+
+
+@pytest.fixture
+def replica_session_factory(db: Session):
+    # Second database standing in for a replica that has not caught up
+    _, path = tempfile.mkstemp(suffix=".sqlite3")
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as session:
+        session.add(Products(name="Replica Product", game="pokemon", product_type="booster"))
+        session.commit()
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    yield async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False, sync_session_class=ReadOnlySession)
+    engine.dispose()
+    os.remove(path)
+
+
+@pytest.fixture
+def client(async_session_factory, replica_session_factory):
+    async def override_get_async_db_for_test():
+        async with async_session_factory() as session:
+            yield session
+
+    async def override_get_async_read_db_for_test():
+        async with replica_session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_async_db_for_test
+    app.dependency_overrides[get_async_read_db] = override_get_async_read_db_for_test
+    yield TestClient(app)
+    del app.dependency_overrides[get_async_db]
+    del app.dependency_overrides[get_async_read_db]
+
+
+def test_writes_go_to_the_primary_and_reads_to_the_replica(client: TestClient, db: Session):
+    response = client.post("/products/", json={"name": "Primary Product", "game": "pokemon", "product_type": "booster"})
+
+    assert response.status_code == 201
+    # The write request reads its own write back from the primary
+    assert response.json()["name"] == "Primary Product"
+    assert [product.name for product in db.query(Products).all()] == ["Primary Product"]
+    assert [product["name"] for product in client.get("/products/").json()] == ["Replica Product"]
+
+
+def test_read_session_refuses_writes(db: Session):
+    session = ReadOnlySession(bind=db.get_bind())
+    session.add(Products(name="Misrouted Product", game="pokemon", product_type="booster"))
+
+    with pytest.raises(RuntimeError):
+        session.flush()
+    session.close()
@@ -1,3 +1,7 @@
+import os
+import subprocess
+import sys
+
 from fastapi.testclient import TestClient
 
 from app.main import app
@@ -8,4 +12,17 @@ client = TestClient(app)
 def test_read_main():
     response = client.get("/")
     assert response.status_code == 200
-    assert response.json() == {"msg": "Hello World"}
\ No newline at end of file
+    assert response.json() == {"msg": "Hello World"}
+
+def test_import_needs_no_cloud_credentials(tmp_path):
+    # Heavy clients are built on first use, so the app imports (and cold
+    # starts) without AWS or Auth0 settings and without loading boto3
+    env = {key: value for key, value in os.environ.items() if not key.startswith(("AWS_", "AUTH0_"))}
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, app.main; print('boto3' in sys.modules, 'werkzeug' in sys.modules)"],
+        env={**env, "DATABASE_URL": f"sqlite:///{tmp_path}/app.db"},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["False", "False"]
@@ -0,0 +1,61 @@
+import json
+from datetime import datetime, timezone
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from app.cruds.price_crud import create_price, get_latest_prices_by_product, get_price_rows_with_stores, get_prices_with_stores
+from app.cruds.product_crud import create_product, get_products
+from app.models.models import GameEnum, ProductTypeEnum, Stores
+from app.schema.product_schemas import (
+    PRODUCT_RESPONSE_FIELDS,
+    PriceHistoryPoint,
+    PriceWithStore,
+    ProductResponse,
+    price_with_store_dicts
+)
+from app.utils.fast_json import dumps, rows_to_dicts
+
+
+def pydantic_json(model, objects) -> bytes:
+    adapter = TypeAdapter(List[model])
+    return adapter.dump_json(adapter.validate_python(objects, from_attributes=True))
+
+
+def test_product_rows_serialize_like_the_models(db: Session):
+    create_product(db, name="Booster A", game=GameEnum.POKEMON, product_type=ProductTypeEnum.BOOSTER, min_price=5000)
+    create_product(db, name="Deck ñ", game="Otro juego", product_type=ProductTypeEnum.OTHER, description="a\n\"b\"")
+
+    rows = rows_to_dicts(get_products(db, as_rows=True), PRODUCT_RESPONSE_FIELDS)
+
+    assert dumps(rows) == pydantic_json(ProductResponse, get_products(db))
+    assert dumps(rows_to_dicts([], PRODUCT_RESPONSE_FIELDS)) == b"[]"
+
+def test_price_rows_serialize_like_the_models(db: Session):
+    product = create_product(db, name="Booster A", game=GameEnum.POKEMON, product_type=ProductTypeEnum.BOOSTER)
+    store = Stores(name="StoreOne", website_url="https://storeone.cl")
+    db.add(store)
+    db.commit()
+    create_price(db, product.id, store.id, 5000, "https://storeone.cl/a")
+    create_price(db, product.id, store.id, 4500, "https://storeone.cl/a")
+
+    for latest_only, get_prices in ((True, get_latest_prices_by_product), (False, get_prices_with_stores)):
+        fast = dumps(price_with_store_dicts(get_price_rows_with_stores(db, product.id, latest_only=latest_only)))
+        models = [
+            {**price.__dict__, "id": price.price_id if latest_only else price.id, "store": store}
+            for price, store in get_prices(db, product.id)
+        ]
+        assert json.loads(fast) == json.loads(pydantic_json(PriceWithStore, models))
+
+def test_dumps_encodes_datetimes_and_models_like_pydantic():
+    point = PriceHistoryPoint(
+        bucket_start=datetime(2025, 7, 1, 12, 30, 0, 1500, tzinfo=timezone.utc),
+        min_price=1,
+        max_price=2,
+        avg_price=1.5,
+        last_price=2
+    )
+
+    assert dumps([point]) == TypeAdapter(List[PriceHistoryPoint]).dump_json([point])
+    assert dumps({"at": point.bucket_start}) == b'{"at":"2025-07-01T12:30:00.001500Z"}'
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.security import HTTPAuthorizationCredentials, SecurityScopes
+
+from app.config import get_settings
+from app.utils.jwks import JWKSKeyStore, VerifiedTokenCache
+from app.utils.utils import UnauthorizedException, VerifyToken
+
+
+class StubJWKS:
+    def __init__(self):
+        self.private_keys = {}
+        self.fetches = 0
+
+    def add_key(self, kid: str):
+        self.private_keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def __call__(self):
+        self.fetches += 1
+        keys = []
+        for kid, private_key in self.private_keys.items():
+            jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+            keys.append({**jwk, "kid": kid, "use": "sig", "alg": "RS256"})
+        return {"keys": keys}
+
+    def token(self, kid: str, **claims) -> str:
+        settings = get_settings()
+        payload = {
+            "sub": "auth0|1",
+            "aud": settings.auth0_api_audience,
+            "iss": settings.auth0_issuer,
+            "exp": int(time.time()) + 3600,
+            **claims,
+        }
+        return jwt.encode(payload, self.private_keys[kid], algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def jwks():
+    stub = StubJWKS()
+    stub.add_key("k1")
+    return stub
+
+
+def verify(verifier: VerifyToken, token: str):
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return verifier.verify(SecurityScopes(), credentials)
+
+
+def test_verified_tokens_skip_the_signature_check(jwks, monkeypatch):
+    key_store = JWKSKeyStore("https://test/.well-known/jwks.json", fetch_jwks=jwks)
+    key_store.refresh()
+    verifier = VerifyToken(key_store=key_store)
+    token = jwks.token("k1")
+
+    assert asyncio.run(verify(verifier, token))["sub"] == "auth0|1"
+
+    def decode(*args, **kwargs):
+        raise AssertionError("signature checked again")
+
+    monkeypatch.setattr(jwt, "decode", decode)
+    assert asyncio.run(verify(verifier, token))["sub"] == "auth0|1"
+    assert jwks.fetches == 1
+
+
+def test_unknown_kid_refreshes_once_for_concurrent_requests(jwks):
+    key_store = JWKSKeyStore("https://test/.well-known/jwks.json", fetch_jwks=jwks, min_refresh_gap=0)
+    key_store.refresh()
+    verifier = VerifyToken(key_store=key_store)
+    jwks.add_key("k2")
+    tokens = [jwks.token("k2", sub=f"auth0|{i}") for i in range(10)]
+
+    async def verify_all():
+        return await asyncio.gather(*(verify(verifier, token) for token in tokens))
+
+    assert [payload["sub"] for payload in asyncio.run(verify_all())] == [f"auth0|{i}" for i in range(10)]
+    assert jwks.fetches == 2
+
+
+def test_unknown_kid_refresh_is_rate_limited(jwks):
+    key_store = JWKSKeyStore("https://test/.well-known/jwks.json", fetch_jwks=jwks, min_refresh_gap=60)
+    key_store.refresh()
+    verifier = VerifyToken(key_store=key_store)
+    jwks.add_key("k2")
+
+    with pytest.raises(UnauthorizedException):
+        asyncio.run(verify(verifier, jwks.token("k2")))
+    assert jwks.fetches == 1
+
+
+def test_token_cache_honours_exp_and_size():
+    cache = VerifiedTokenCache(max_entries=2, max_age=60)
+    cache.put("expired", {"exp": time.time() - 1})
+    for token in ("a", "b", "c"):
+        cache.put(token, {"exp": time.time() + 60})
+
+    assert cache.get("expired") is None
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+    assert len(cache) == 2